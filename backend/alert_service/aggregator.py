@@ -0,0 +1,152 @@
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+from shared.redis_client import redis_client
+from .notifications import email_notifier, telegram_notifier
+
+logger = logging.getLogger(__name__)
+
+WINDOW_PREFIX = "alert:window:"
+SUPPRESSED_PREFIX = "alert:suppressed:"
+DIGEST_KEY = "alert:digest"
+
+# KEYS: window, suppressed hash, digest zset
+# ARGV: window_ms, now, digest_due, fingerprint, hash_ttl, field/value pairs...
+# Returns 1 when the alert opens a new window and must be sent now.
+SUBMIT_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[2], 'NX', 'PX', ARGV[1]) then
+    return 1
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[1])
+redis.call('HINCRBY', KEYS[2], 'count', 1)
+redis.call('HSETNX', KEYS[2], 'first_seen', ARGV[2])
+redis.call('HSET', KEYS[2], 'last_seen', ARGV[2], unpack(ARGV, 6))
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+redis.call('ZADD', KEYS[3], 'NX', ARGV[3], ARGV[4])
+return 0
+"""
+
+# Only the replica whose ZREM succeeds gets the suppressed events.
+CLAIM_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return nil
+end
+local data = redis.call('HGETALL', KEYS[2])
+redis.call('DEL', KEYS[2])
+return data
+"""
+
+def fingerprint(user_id: str, event_type: str, provider: str, channel: str, recipient: Optional[str]) -> str:
+    raw = f"{user_id}|{event_type}|{provider}|{channel}|{recipient or ''}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def _format_time(timestamp: str) -> str:
+    return datetime.fromtimestamp(float(timestamp), tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+class AlertAggregator:
+    """Drops repeats of an alert while its sliding window is open and sends them later as one digest.
+
+    The channel and recipient are part of the fingerprint so an alert fanned
+    out to email and Telegram, or to several addresses, is delivered once to each.
+    """
+
+    def __init__(self):
+        self.window = float(os.getenv("ALERT_DEDUP_WINDOW", "300"))
+        self.digest_interval = float(os.getenv("ALERT_DIGEST_INTERVAL", "600"))
+        self.poll_interval = float(os.getenv("ALERT_DIGEST_POLL", "15"))
+        self.batch_size = int(os.getenv("ALERT_DIGEST_BATCH", "100"))
+        self._submit = None
+        self._claim = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def deliver(self, channel: str, recipient: str, subject: str, message: str) -> bool:
+        if channel == "email":
+            return await email_notifier.send_email(recipient, subject, message)
+        return await telegram_notifier.send_message(f"{subject}\n{message}" if subject else message, recipient)
+
+    async def submit(
+        self,
+        user_id: str,
+        event_type: str,
+        provider: str,
+        channel: str,
+        recipient: Optional[str],
+        subject: str,
+        message: str
+    ) -> str:
+        """Return "sent", "failed" or "suppressed" for one incoming alert"""
+        fp = fingerprint(user_id, event_type, provider, channel, recipient)
+        redis = redis_client.pool
+        if redis is not None:
+            if self._submit is None:
+                self._submit = redis.register_script(SUBMIT_SCRIPT)
+            now = time.time()
+            try:
+                opened = await self._submit(
+                    keys=[WINDOW_PREFIX + fp, SUPPRESSED_PREFIX + fp, DIGEST_KEY],
+                    args=[
+                        int(self.window * 1000), now, now + self.digest_interval, fp,
+                        int(self.window + self.digest_interval * 10),
+                        "user_id", user_id, "event_type", event_type, "provider", provider,
+                        "channel", channel, "recipient", recipient or "", "subject", subject,
+                        "last_message", message
+                    ]
+                )
+                if not opened:
+                    return "suppressed"
+            except Exception as e:
+                logger.error(f"Alert dedup unavailable, sending directly: {e}")
+
+        success = await self.deliver(channel, recipient, subject, message)
+        return "sent" if success else "failed"
+
+    async def flush_digests(self) -> int:
+        redis = redis_client.pool
+        if self._claim is None:
+            self._claim = redis.register_script(CLAIM_SCRIPT)
+        due = await redis.zrangebyscore(DIGEST_KEY, "-inf", time.time(), start=0, num=self.batch_size)
+        sent = 0
+        for fp in due:
+            data = await self._claim(keys=[DIGEST_KEY, SUPPRESSED_PREFIX + fp], args=[fp])
+            if not data:
+                continue
+            entry = dict(zip(data[::2], data[1::2]))
+            if "count" not in entry:
+                continue
+            subject = f"[Digest] {entry['count']} suppressed {entry['event_type']} alerts ({entry['provider']})"
+            body = (
+                f"{entry['count']} more '{entry['event_type']}' alerts for provider {entry['provider']} "
+                f"were suppressed between {_format_time(entry['first_seen'])} and "
+                f"{_format_time(entry['last_seen'])} UTC.\nLast: {entry['last_message']}"
+            )
+            if await self.deliver(entry["channel"], entry["recipient"] or None, subject, body):
+                sent += 1
+            else:
+                logger.error(f"Failed to deliver alert digest {fp}")
+        return sent
+
+    async def _run(self):
+        while True:
+            try:
+                await self.flush_digests()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Alert digest flush error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None and redis_client.pool is not None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+alert_aggregator = AlertAggregator()
@@ -0,0 +1,28 @@
+import logging
+
+from shared.event_bus import Event, EventConsumer, BACKUP_EVENTS, FILE_FAILED
+from .aggregator import alert_aggregator
+from .notifications import telegram_notifier
+
+logger = logging.getLogger(__name__)
+
+async def handle_backup_event(event: Event):
+    if event.type != FILE_FAILED:
+        return
+    payload = event.payload
+    operation = payload.get("operation", "upload")
+    subject = f"Backup {operation} failed"
+    message = f"{operation.capitalize()} of '{payload.get('filename')}' to {payload.get('provider')} failed: {payload.get('error')}"
+    common = {
+        "user_id": payload.get("user_id", ""),
+        "event_type": f"{operation}_failed",
+        "provider": payload.get("provider", ""),
+        "subject": subject,
+        "message": message
+    }
+    if payload.get("email"):
+        await alert_aggregator.submit(channel="email", recipient=payload["email"], **common)
+    if telegram_notifier.chat_id:
+        await alert_aggregator.submit(channel="telegram", recipient=None, **common)
+
+backup_events_consumer = EventConsumer(BACKUP_EVENTS, "alert_service", handle_backup_event)
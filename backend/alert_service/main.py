@@ -1,14 +1,20 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from auth_service.dependencies import get_current_user
+from shared.dependencies import get_current_user
+from shared.redis_client import connect_to_redis, close_redis_connection
+from shared.log_handler import install_log_handler
+from shared.instrumentation import instrument_app
 from .notifications import email_notifier, telegram_notifier
-from .schemas import EmailAlert, TelegramAlert, AlertResponse
+from .aggregator import alert_aggregator
+from .event_handlers import backup_events_consumer
+from .schemas import (
+    EmailAlert, EmailBatchAlert, EmailBatchResponse, EmailDeliveryResult, TelegramAlert, AlertResponse,
+    AlertEvent, AlertEventResponse
+)
 
 app = FastAPI(title="Alert Service", version="1.0.0")
+instrument_app(app, "alert_service")
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +24,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_event():
+    install_log_handler("alert_service")
+    await connect_to_redis()
+    email_notifier.start()
+    telegram_notifier.start()
+    alert_aggregator.start()
+    backup_events_consumer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await backup_events_consumer.stop()
+    await alert_aggregator.stop()
+    await email_notifier.stop()
+    await telegram_notifier.stop()
+    await close_redis_connection()
+
 @app.get("/")
 async def root():
     return {"service": "Alert Service", "status": "running"}
@@ -27,13 +50,25 @@ async def send_email_alert(
     alert: EmailAlert,
     current_user: dict = Depends(get_current_user)
 ):
-    success = email_notifier.send_email(alert.to_email, alert.subject, alert.body)
+    success = await email_notifier.send_email(alert.to_email, alert.subject, alert.body)
     
     if not success:
         raise HTTPException(status_code=500, detail="Failed to send email")
     
     return AlertResponse(success=True, message="Email sent successfully")
 
+@app.post("/send-email/batch", response_model=EmailBatchResponse)
+async def send_email_batch(
+    batch: EmailBatchAlert,
+    current_user: dict = Depends(get_current_user)
+):
+    messages = [email_notifier.build_message(a.to_email, a.subject, a.body) for a in batch.messages]
+    results = await email_notifier.deliver(messages)
+    return EmailBatchResponse(results=[
+        EmailDeliveryResult(to_email=alert.to_email, success=success, error=error)
+        for alert, (success, error) in zip(batch.messages, results)
+    ])
+
 @app.post("/send-telegram", response_model=AlertResponse)
 async def send_telegram_alert(
     alert: TelegramAlert,
@@ -46,6 +81,25 @@ async def send_telegram_alert(
     
     return AlertResponse(success=True, message="Telegram message sent successfully")
 
+@app.post("/alerts", response_model=AlertEventResponse)
+async def submit_alert(
+    alert: AlertEvent,
+    current_user: dict = Depends(get_current_user)
+):
+    if alert.channel == "email" and not alert.to_email:
+        raise HTTPException(status_code=400, detail="to_email is required for email alerts")
+
+    status = await alert_aggregator.submit(
+        user_id=current_user["user_id"],
+        event_type=alert.event_type,
+        provider=alert.provider,
+        channel=alert.channel,
+        recipient=alert.to_email if alert.channel == "email" else alert.chat_id,
+        subject=alert.subject,
+        message=alert.message
+    )
+    return AlertEventResponse(status=status)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8004)
@@ -1,93 +1,150 @@
-import aiosmtplib
 from email.message import EmailMessage
+from typing import List, Optional, Tuple
+import asyncio
 import os
-import httpx
-from typing import Optional
 import logging
 
+from .smtp_pool import SMTPConnectionPool
+from .telegram_dispatcher import TelegramDispatcher, PRIORITY_NORMAL
+
 logger = logging.getLogger(__name__)
 
 class EmailNotifier:
+    """Queues outgoing email and delivers it in batches over pooled SMTP sessions"""
+
     def __init__(self):
         self.smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
         self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
         self.smtp_user = os.getenv("SMTP_USER")
         self.smtp_password = os.getenv("SMTP_PASSWORD")
-    
+        self.use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+        self.pool_size = int(os.getenv("SMTP_POOL_SIZE", "4"))
+        self.batch_size = int(os.getenv("SMTP_BATCH_SIZE", "20"))
+        self.queue_size = int(os.getenv("SMTP_QUEUE_SIZE", "1000"))
+        self.pool = SMTPConnectionPool(
+            hostname=self.smtp_host,
+            port=self.smtp_port,
+            username=self.smtp_user,
+            password=self.smtp_password,
+            use_tls=self.use_tls,
+            start_tls=False if self.use_tls else None,
+            size=self.pool_size
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def build_message(self, to_email: str, subject: str, body: str) -> EmailMessage:
+        msg = EmailMessage()
+        msg['From'] = self.smtp_user
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.set_content(body, subtype='html')
+        return msg
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                results = await self.pool.send_batch([message for message, _ in batch])
+            except asyncio.CancelledError:
+                self._abandon(batch)
+                raise
+            except Exception as e:
+                logger.error(f"SMTP connection error: {e}")
+                results = [(False, str(e))] * len(batch)
+            for (message, future), (success, error) in zip(batch, results):
+                if success:
+                    logger.info(f"Email sent successfully to {message['To']}")
+                else:
+                    logger.error(f"Email send error to {message['To']}: {error}")
+                if not future.done():
+                    future.set_result((success, error))
+                self._queue.task_done()
+
+    def start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.pool_size)]
+
+    @staticmethod
+    def _abandon(batch):
+        for _, future in batch:
+            if not future.done():
+                future.set_result((False, "shutdown"))
+
+    async def stop(self):
+        """Cancel the workers and resolve every queued or in-flight message as not sent"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._queue is not None:
+            pending = []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            self._abandon(pending)
+            self._queue = None
+        await self.pool.close()
+
+    async def deliver(self, messages: List[EmailMessage]) -> List[Tuple[bool, Optional[str]]]:
+        """Queue messages and wait for a per-message (success, error) result"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for message in messages:
+            future = loop.create_future()
+            try:
+                self._queue.put_nowait((message, future))
+            except asyncio.QueueFull:
+                future.set_result((False, "Send queue is full"))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
     async def send_email(self, to_email: str, subject: str, body: str) -> bool:
-        """Send email using async SMTP client"""
-        try:
-            msg = EmailMessage()
-            msg['From'] = self.smtp_user
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.set_content(body, subtype='html')
-            
-            await aiosmtplib.send(
-                msg,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                username=self.smtp_user,
-                password=self.smtp_password,
-                use_tls=True
-            )
-            
-            logger.info(f"Email sent successfully to {to_email}")
-            return True
-            
-        except aiosmtplib.SMTPAuthenticationError as e:
-            logger.error(f"SMTP authentication error: {e}")
-            return False
-        except aiosmtplib.SMTPException as e:
-            logger.error(f"SMTP error: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Email send error: {e}")
-            return False
+        """Send email using pooled SMTP connections"""
+        [(success, _)] = await self.deliver([self.build_message(to_email, subject, body)])
+        return success
 
 class TelegramNotifier:
     def __init__(self):
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
         self.chat_id = os.getenv("TELEGRAM_CHAT_ID")
+        self.api_url = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
         if self.bot_token:
-            self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
+            self.base_url = f"{self.api_url}/bot{self.bot_token}"
+            self.dispatcher = TelegramDispatcher(
+                self.base_url,
+                per_chat_rate=float(os.getenv("TELEGRAM_PER_CHAT_RATE", "1")),
+                global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", "30")),
+                workers=int(os.getenv("TELEGRAM_WORKERS", "8")),
+                max_retries=int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))
+            )
         else:
             self.base_url = None
-    
-    async def send_message(self, message: str, chat_id: Optional[str] = None) -> bool:
-        """Send Telegram message with proper timeout and error handling"""
+            self.dispatcher = None
+
+    def start(self):
+        if self.dispatcher:
+            self.dispatcher.start()
+
+    async def stop(self):
+        if self.dispatcher:
+            await self.dispatcher.stop()
+
+    async def send_message(self, message: str, chat_id: Optional[str] = None, priority: int = PRIORITY_NORMAL) -> bool:
+        """Queue a Telegram message and wait until it is delivered or given up on"""
         if not self.bot_token:
             logger.error("Telegram bot token not configured")
             return False
-            
-        try:
-            target_chat_id = chat_id or self.chat_id
-            if not target_chat_id:
-                logger.error("Telegram chat_id not provided")
-                return False
-                
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/sendMessage",
-                    json={"chat_id": target_chat_id, "text": message}
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"Telegram message sent successfully to {target_chat_id}")
-                    return True
-                else:
-                    logger.error(f"Telegram API error: {response.status_code} - {response.text}")
-                    return False
-                    
-        except httpx.TimeoutException as e:
-            logger.error(f"Telegram timeout error: {e}")
-            return False
-        except httpx.HTTPError as e:
-            logger.error(f"Telegram HTTP error: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Telegram send error: {e}")
+
+        target_chat_id = chat_id or self.chat_id
+        if not target_chat_id:
+            logger.error("Telegram chat_id not provided")
             return False
 
+        return await self.dispatcher.send(target_chat_id, message, priority)
+
 email_notifier = EmailNotifier()
 telegram_notifier = TelegramNotifier()
\ No newline at end of file
@@ -1,15 +1,38 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Literal, Optional
 
 class EmailAlert(BaseModel):
     to_email: EmailStr
     subject: str
     body: str
 
+class EmailBatchAlert(BaseModel):
+    messages: List[EmailAlert] = Field(..., max_length=500)
+
+class EmailDeliveryResult(BaseModel):
+    to_email: EmailStr
+    success: bool
+    error: Optional[str] = None
+
+class EmailBatchResponse(BaseModel):
+    results: List[EmailDeliveryResult]
+
 class TelegramAlert(BaseModel):
     message: str
     chat_id: Optional[str] = None
 
+class AlertEvent(BaseModel):
+    event_type: str
+    provider: str
+    channel: Literal["email", "telegram"]
+    to_email: Optional[EmailStr] = None
+    chat_id: Optional[str] = None
+    subject: str = ""
+    message: str
+
+class AlertEventResponse(BaseModel):
+    status: Literal["sent", "suppressed", "failed"]
+
 class AlertResponse(BaseModel):
     success: bool
     message: str
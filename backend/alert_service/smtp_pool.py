@@ -0,0 +1,125 @@
+from email.message import EmailMessage
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+class PooledConnection:
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+
+class SMTPConnectionPool:
+    """Keeps authenticated SMTP sessions open and reuses them across messages"""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str],
+        password: Optional[str],
+        use_tls: bool,
+        start_tls: Optional[bool],
+        size: int,
+        health_check_after: float = 30.0,
+        timeout: float = 30.0
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.size = size
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self._idle: asyncio.LifoQueue = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self) -> PooledConnection:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+        await smtp.connect()
+        if self.username and self.password:
+            await smtp.login(self.username, self.password)
+        return PooledConnection(smtp)
+
+    async def _is_healthy(self, connection: PooledConnection) -> bool:
+        if not connection.smtp.is_connected:
+            return False
+        if time.monotonic() - connection.last_used < self.health_check_after:
+            return True
+        try:
+            await connection.smtp.noop()
+            return True
+        except (aiosmtplib.SMTPException, OSError):
+            return False
+
+    async def acquire(self) -> PooledConnection:
+        await self._slots.acquire()
+        try:
+            while not self._idle.empty():
+                connection = self._idle.get_nowait()
+                if await self._is_healthy(connection):
+                    return connection
+                await self._discard(connection)
+            return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, connection: PooledConnection, broken: bool = False):
+        if broken:
+            await self._discard(connection)
+        else:
+            connection.last_used = time.monotonic()
+            self._idle.put_nowait(connection)
+        self._slots.release()
+
+    async def _discard(self, connection: PooledConnection):
+        try:
+            await connection.smtp.quit()
+        except Exception:
+            connection.smtp.close()
+
+    async def send_batch(self, messages: List[EmailMessage]) -> List[Tuple[bool, Optional[str]]]:
+        """Send messages over one pooled session, reconnecting once if it drops"""
+        results = []
+        connection = await self.acquire()
+        broken = False
+        try:
+            for message in messages:
+                error = None
+                for _ in range(2):
+                    try:
+                        if broken:
+                            connection.smtp.close()
+                            connection = await self._connect()
+                            broken = False
+                        await connection.smtp.send_message(message)
+                        error = None
+                        break
+                    except aiosmtplib.SMTPServerDisconnected as e:
+                        broken = True
+                        error = str(e)
+                    except (aiosmtplib.SMTPException, OSError) as e:
+                        broken = not connection.smtp.is_connected
+                        error = str(e)
+                        break
+                results.append((error is None, error))
+        finally:
+            await self.release(connection, broken=broken)
+        return results
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
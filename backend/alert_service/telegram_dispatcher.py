@@ -0,0 +1,176 @@
+from prometheus_client import Counter, Gauge, Histogram
+from typing import Dict, List, Optional
+import asyncio
+import itertools
+import logging
+import random
+import time
+
+import httpx
+
+from shared.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+queue_depth = Gauge('telegram_queue_depth', 'Telegram messages waiting to be sent')
+delivery_latency = Histogram(
+    'telegram_delivery_seconds',
+    'Time from enqueue to delivery of a Telegram message',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+messages_total = Counter('telegram_messages_total', 'Telegram messages by outcome', ['status'])
+
+class _Job:
+    __slots__ = ("chat_id", "text", "future", "enqueued_at", "attempt")
+
+    def __init__(self, chat_id: str, text: str, future: asyncio.Future):
+        self.chat_id = chat_id
+        self.text = text
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.attempt = 0
+
+class TelegramDispatcher:
+    """Single pooled client plus a priority queue paced per chat and globally.
+
+    Jobs that are not allowed to go yet are parked with call_later instead of
+    blocking a worker, so one busy chat cannot starve the others.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        per_chat_rate: float = 1.0,
+        global_rate: float = 30.0,
+        workers: int = 8,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = base_url
+        self.per_chat_rate = per_chat_rate
+        self.worker_count = workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.transport = transport
+        self.global_bucket = TokenBucket(rate=global_rate, capacity=global_rate)
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._blocked_until: Dict[str, float] = {}
+        self._sequence = itertools.count()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._workers: List[asyncio.Task] = []
+
+    def start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=self.worker_count, max_keepalive_connections=self.worker_count),
+            transport=self.transport
+        )
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        queue, self._queue = self._queue, None
+        while queue is not None and not queue.empty():
+            _, _, job = queue.get_nowait()
+            self._finish(job, False, "dropped")
+        queue_depth.set(0)
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                self._chat_buckets = {k: b for k, b in self._chat_buckets.items() if not b.idle}
+            bucket = TokenBucket(rate=self.per_chat_rate, capacity=1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _put(self, priority: int, job: _Job):
+        if self._queue is None:
+            self._finish(job, False, "dropped")
+            return
+        self._queue.put_nowait((priority, next(self._sequence), job))
+        queue_depth.set(self._queue.qsize())
+
+    def _requeue_later(self, delay: float, priority: int, job: _Job):
+        asyncio.get_running_loop().call_later(delay, self._put, priority, job)
+
+    def _finish(self, job: _Job, success: bool, status: str):
+        messages_total.labels(status=status).inc()
+        if success:
+            delivery_latency.observe(time.monotonic() - job.enqueued_at)
+        if not job.future.done():
+            job.future.set_result(success)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _worker(self):
+        while True:
+            priority, _, job = await self._queue.get()
+            queue_depth.set(self._queue.qsize())
+            blocked = self._blocked_until.get(job.chat_id, 0) - time.monotonic()
+            if blocked > 0:
+                self._requeue_later(blocked, priority, job)
+                continue
+            wait = self._chat_bucket(job.chat_id).try_consume()
+            if wait > 0:
+                self._requeue_later(wait, priority, job)
+                continue
+            await self.global_bucket.consume()
+            await self._deliver(priority, job)
+
+    async def _deliver(self, priority: int, job: _Job):
+        try:
+            response = await self._client.post("/sendMessage", json={"chat_id": job.chat_id, "text": job.text})
+        except httpx.HTTPError as e:
+            logger.error(f"Telegram HTTP error: {e}")
+            self._retry(priority, job, self._backoff(job.attempt))
+            return
+
+        if response.status_code == 200:
+            logger.info(f"Telegram message sent successfully to {job.chat_id}")
+            self._finish(job, True, "sent")
+        elif response.status_code == 429:
+            try:
+                retry_after = float(response.json().get("parameters", {}).get("retry_after", 1))
+            except ValueError:
+                retry_after = 1.0
+            self._blocked_until[job.chat_id] = time.monotonic() + retry_after
+            messages_total.labels(status="throttled").inc()
+            self._retry(priority, job, retry_after + self._backoff(0))
+        elif response.status_code >= 500:
+            logger.error(f"Telegram API error: {response.status_code} - {response.text}")
+            self._retry(priority, job, self._backoff(job.attempt))
+        else:
+            logger.error(f"Telegram API error: {response.status_code} - {response.text}")
+            self._finish(job, False, "rejected")
+
+    def _retry(self, priority: int, job: _Job, delay: float):
+        job.attempt += 1
+        if job.attempt > self.max_retries:
+            self._finish(job, False, "failed")
+            return
+        self._requeue_later(delay, priority, job)
+
+    async def send(self, chat_id: str, text: str, priority: int = PRIORITY_NORMAL) -> bool:
+        self.start()
+        job = _Job(chat_id, text, asyncio.get_running_loop().create_future())
+        self._put(priority, job)
+        return await job.future
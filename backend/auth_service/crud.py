@@ -1,10 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import Optional
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from shared.auth_utils import get_password_hash, verify_password
+from shared.password_hashing import password_hasher
 from .schemas import UserCreate
 from bson import ObjectId
 
@@ -12,9 +8,10 @@ async def create_user(db: AsyncIOMotorClient, user: UserCreate) -> dict:
     user_dict = {
         "email": user.email,
         "username": user.username,
-        "hashed_password": get_password_hash(user.password),
+        "hashed_password": await password_hasher.hash(user.password),
         "is_active": True,
-        "is_superuser": False
+        "is_superuser": False,
+        "plan": "free"
     }
     result = await db.backup_db.users.insert_one(user_dict)
     user_dict["_id"] = str(result.inserted_id)
@@ -30,7 +27,11 @@ async def authenticate_user(db: AsyncIOMotorClient, email: str, password: str) -
     user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user["hashed_password"]):
+    verified, new_hash = await password_hasher.verify_and_update(password, user["hashed_password"])
+    if not verified:
         return None
+    if new_hash:
+        await db.backup_db.users.update_one({"_id": ObjectId(user["_id"])}, {"$set": {"hashed_password": new_hash}})
+        user["hashed_password"] = new_hash
     return user
 
@@ -1,21 +1,23 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from datetime import timedelta
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-import sys
 import os
 import re
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from shared.database import connect_to_mongo, close_mongo_connection, get_database
-from shared.redis_client import connect_to_redis, close_redis_connection
+from shared.redis_client import connect_to_redis, close_redis_connection, get_redis
+from shared.rate_limiter import RateLimiter
+from shared.password_hashing import password_hasher, HasherOverloaded
 from shared.auth_utils import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from auth_service.schemas import UserCreate, UserLogin, Token, UserResponse
+from shared.dependencies import get_current_user
+from shared.log_handler import install_log_handler
+from shared.instrumentation import instrument_app
+from shared.cache import response_cache, USER_TAG
+from shared.event_bus import publish, AUTH_EVENTS, USER_REGISTERED, USER_LOGGED_IN
+from auth_service.schemas import UserCreate, UserLogin, Token, UserResponse, RefreshRequest
+from auth_service.refresh_tokens import issue_refresh_token, rotate_refresh_token, revoke_refresh_token
 from auth_service.crud import create_user, authenticate_user, get_user_by_email
-from auth_service.dependencies import get_current_user
 
 REQUIRED_ENV_VARS = ["SECRET_KEY", "MONGODB_URL"]
 for var in REQUIRED_ENV_VARS:
@@ -23,10 +25,9 @@ for var in REQUIRED_ENV_VARS:
         raise ValueError(f"Переменная окружения {var} не установлена")
 
 app = FastAPI(title="Auth Service", version="1.0.0")
+instrument_app(app, "auth_service")
 
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+limiter = RateLimiter("auth")
 
 app.add_middleware(
     CORSMiddleware,
@@ -55,14 +56,25 @@ def validate_username(username: str):
 
 @app.on_event("startup")
 async def startup_event():
+    install_log_handler("auth_service")
     await connect_to_mongo()
     await connect_to_redis()
+    password_hasher.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    password_hasher.shutdown()
     await close_mongo_connection()
     await close_redis_connection()
 
+@app.exception_handler(HasherOverloaded)
+async def hasher_overloaded_handler(request: Request, exc: HasherOverloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Сервис перегружен, повторите попытку позже"},
+        headers={"Retry-After": "1"}
+    )
+
 @app.get("/")
 async def root():
     return {"service": "Auth Service", "status": "running"}
@@ -82,6 +94,7 @@ async def register(request: Request, user: UserCreate, db = Depends(get_database
         raise HTTPException(status_code=400, detail="Этот email уже зарегистрирован")
 
     new_user = await create_user(db, user)
+    await publish(AUTH_EVENTS, USER_REGISTERED, {"user_id": str(new_user["_id"])})
     return UserResponse(
         id=str(new_user["_id"]),
         email=new_user["email"],
@@ -89,32 +102,70 @@ async def register(request: Request, user: UserCreate, db = Depends(get_database
         is_active=new_user["is_active"]
     )
 
+def issue_access_token(claims: dict) -> str:
+    return create_access_token(
+        data={
+            "sub": claims["sub"],
+            "email": claims["email"],
+            "plan": claims.get("plan", "free"),
+            "is_superuser": bool(claims.get("is_superuser"))
+        },
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
 @app.post("/login", response_model=Token)
 @limiter.limit("5/minute")
-async def login(request: Request, credentials: UserLogin, db = Depends(get_database)):
+async def login(request: Request, credentials: UserLogin, db = Depends(get_database), redis = Depends(get_redis)):
     user = await authenticate_user(db, credentials.email, credentials.password)
     if not user:
         raise HTTPException(status_code=401, detail="Неверный email или пароль")
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user["_id"]), "email": user["email"]},
-        expires_delta=access_token_expires
+    claims = {
+        "sub": str(user["_id"]),
+        "email": user["email"],
+        "plan": user.get("plan", "free"),
+        "is_superuser": bool(user.get("is_superuser"))
+    }
+    await publish(AUTH_EVENTS, USER_LOGGED_IN, {"user_id": claims["sub"]})
+    return Token(
+        access_token=issue_access_token(claims),
+        refresh_token=await issue_refresh_token(redis, claims)
     )
-    return Token(access_token=access_token)
+
+@app.post("/refresh", response_model=Token)
+@limiter.limit("30/minute")
+async def refresh(request: Request, body: RefreshRequest, redis = Depends(get_redis)):
+    rotated = await rotate_refresh_token(redis, body.refresh_token)
+    if rotated is None:
+        raise HTTPException(status_code=401, detail="Недействительный refresh токен")
+    claims, refresh_token = rotated
+    return Token(access_token=issue_access_token(claims), refresh_token=refresh_token)
+
+@app.post("/logout")
+async def logout(body: RefreshRequest, redis = Depends(get_redis)):
+    await revoke_refresh_token(redis, body.refresh_token)
+    return {"message": "Сессия завершена"}
+
+@response_cache.cached("users.me", key=("user_id",), tags=(USER_TAG,))
+async def get_profile(db, user_id: str):
+    """Only the public profile fields are cached, never the password hash"""
+    user = await db.backup_db.users.find_one({"_id": user_id})
+    if not user:
+        return None
+    return {
+        "id": str(user["_id"]),
+        "email": user["email"],
+        "username": user["username"],
+        "is_active": user["is_active"]
+    }
 
 @app.get("/me", response_model=UserResponse)
 async def get_me(current_user: dict = Depends(get_current_user), db = Depends(get_database)):
-    user = await db.backup_db.users.find_one({"_id": current_user["user_id"]})
-    if not user:
+    profile = await get_profile(db, current_user["user_id"])
+    if not profile:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
-    return UserResponse(
-        id=str(user["_id"]),
-        email=user["email"],
-        username=user["username"],
-        is_active=user["is_active"]
-    )
+    return UserResponse(**profile)
 
 if __name__ == "__main__":
     import uvicorn
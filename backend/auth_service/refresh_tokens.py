@@ -0,0 +1,54 @@
+from typing import Optional, Tuple
+import hashlib
+import json
+import os
+import secrets
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REFRESH_TOKEN_TTL = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def issue_refresh_token(redis, claims: dict, family: Optional[str] = None) -> str:
+    """Store an opaque refresh token; tokens rotated from one login share a family"""
+    token = secrets.token_urlsafe(48)
+    data = {
+        "sub": claims["sub"],
+        "email": claims.get("email"),
+        "plan": claims.get("plan", "free"),
+        "is_superuser": bool(claims.get("is_superuser")),
+        "family": family or secrets.token_urlsafe(16),
+    }
+    await redis.set(f"refresh:{_digest(token)}", json.dumps(data), ex=REFRESH_TOKEN_TTL)
+    return token
+
+async def revoke_family(redis, family: str):
+    await redis.set(f"refresh_denylist:{family}", 1, ex=REFRESH_TOKEN_TTL)
+
+async def rotate_refresh_token(redis, token: str) -> Optional[Tuple[dict, str]]:
+    """Consume a refresh token and issue its successor.
+
+    Presenting an already rotated token means it leaked, so the whole family
+    is put on the denylist.
+    """
+    digest = _digest(token)
+    raw = await redis.getdel(f"refresh:{digest}")
+    if raw is None:
+        family = await redis.get(f"refresh_used:{digest}")
+        if family:
+            await revoke_family(redis, family)
+        return None
+    claims = json.loads(raw)
+    if await redis.exists(f"refresh_denylist:{claims['family']}"):
+        return None
+    await redis.set(f"refresh_used:{digest}", claims["family"], ex=REFRESH_TOKEN_TTL)
+    new_token = await issue_refresh_token(redis, claims, claims["family"])
+    return claims, new_token
+
+async def revoke_refresh_token(redis, token: str) -> bool:
+    raw = await redis.getdel(f"refresh:{_digest(token)}")
+    if raw is None:
+        return False
+    await revoke_family(redis, json.loads(raw)["family"])
+    return True
@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class AccessTracker:
+    """Accumulates download counters in memory and flushes them in one bulk write"""
+
+    def __init__(self):
+        self.flush_interval = float(os.getenv("ACCESS_FLUSH_INTERVAL", "30"))
+        self.max_pending = int(os.getenv("ACCESS_MAX_PENDING", "5000"))
+        self._pending: Dict[object, Tuple[int, datetime]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._db = None
+
+    def record(self, file_id):
+        count, _ = self._pending.get(file_id, (0, None))
+        self._pending[file_id] = (count + 1, datetime.now(timezone.utc))
+        if len(self._pending) >= self.max_pending and self._db is not None:
+            asyncio.create_task(self.flush())
+
+    async def flush(self):
+        if not self._pending or self._db is None:
+            return
+        pending, self._pending = self._pending, {}
+        operations = [
+            UpdateOne(
+                {"_id": file_id},
+                {"$inc": {"access_count": count}, "$max": {"last_accessed_at": accessed_at}}
+            )
+            for file_id, (count, accessed_at) in pending.items()
+        ]
+        try:
+            await self._db.backup_db.files.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения статистики доступа: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self, db):
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+access_tracker = AccessTracker()
@@ -1,13 +1,39 @@
-import boto3
-from azure.storage.blob import BlobServiceClient
-from google.cloud import storage
+import asyncio
+import importlib
 import os
-from typing import BinaryIO
+import time
+from collections import deque
+from importlib.metadata import entry_points
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, List, Optional, Type
 import logging
 
+from shared.metrics import timed_provider_operation
+
 logger = logging.getLogger(__name__)
 
+RANGED_DOWNLOAD_PART_SIZE = int(os.getenv("RANGED_DOWNLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+RANGED_DOWNLOAD_CONCURRENCY = int(os.getenv("RANGED_DOWNLOAD_CONCURRENCY", "4"))
+
+TIMED_OPERATIONS = {
+    "upload_file": "upload",
+    "download_file": "download",
+    "delete_file": "delete",
+    "list_files": "list",
+    "get_size": "head",
+    "read_range": "read_range",
+    "set_storage_class": "set_storage_class",
+}
+
 class CloudStorageProvider:
+    name = "base"
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for method, operation in TIMED_OPERATIONS.items():
+            if method in cls.__dict__:
+                setattr(cls, method, timed_provider_operation(operation)(cls.__dict__[method]))
+
     def upload_file(self, file: BinaryIO, filename: str) -> str:
         raise NotImplementedError
     
@@ -20,156 +46,173 @@ class CloudStorageProvider:
     def list_files(self) -> list:
         raise NotImplementedError
 
-class S3Provider(CloudStorageProvider):
-    def __init__(self):
-        self.aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
-        self.aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        self.bucket_name = os.getenv('AWS_BUCKET_NAME')
-        self.region = os.getenv('AWS_REGION', 'us-east-1')
-        
-        if not all([self.aws_access_key, self.aws_secret_key, self.bucket_name]):
-            raise ValueError("AWS ключи не настроены. Установите AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY и AWS_BUCKET_NAME")
-        
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=self.aws_access_key,
-            aws_secret_access_key=self.aws_secret_key,
-            region_name=self.region
-        )
-    
-    def upload_file(self, file: BinaryIO, filename: str) -> str:
-        try:
-            self.s3_client.upload_fileobj(file, self.bucket_name, filename)
-            return f"s3://{self.bucket_name}/{filename}"
-        except Exception as e:
-            logger.error(f"Ошибка загрузки в S3: {e}")
-            raise Exception("Ошибка при загрузке в облако S3")
-    
-    def download_file(self, filename: str) -> bytes:
-        try:
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=filename)
-            return response['Body'].read()
-        except Exception as e:
-            logger.error(f"Ошибка скачивания из S3: {e}")
-            raise Exception("Ошибка при скачивании из облака S3")
-    
-    def delete_file(self, filename: str) -> bool:
-        try:
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=filename)
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка удаления из S3: {e}")
-            raise Exception("Ошибка при удалении из облака S3")
-    
-    def list_files(self) -> list:
-        try:
-            response = self.s3_client.list_objects_v2(Bucket=self.bucket_name)
-            return [obj['Key'] for obj in response.get('Contents', [])]
-        except Exception as e:
-            logger.error(f"Ошибка получения списка из S3: {e}")
-            raise Exception("Ошибка при получении списка из облака S3")
-
-class AzureBlobProvider(CloudStorageProvider):
-    def __init__(self):
-        self.connection_string = os.getenv('AZURE_CONNECTION_STRING')
-        self.container_name = os.getenv('AZURE_CONTAINER_NAME')
-        
-        if not all([self.connection_string, self.container_name]):
-            raise ValueError("Параметры Azure не настроены. Установите AZURE_CONNECTION_STRING и AZURE_CONTAINER_NAME")
-        
-        self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
-        self.container_client = self.blob_service_client.get_container_client(self.container_name)
-    
-    def upload_file(self, file: BinaryIO, filename: str) -> str:
-        try:
-            blob_client = self.container_client.get_blob_client(filename)
-            blob_client.upload_blob(file, overwrite=True)
-            return f"azure://{self.container_name}/{filename}"
-        except Exception as e:
-            logger.error(f"Ошибка загрузки в Azure: {e}")
-            raise Exception("Ошибка при загрузке в облако Azure")
-    
-    def download_file(self, filename: str) -> bytes:
-        try:
-            blob_client = self.container_client.get_blob_client(filename)
-            return blob_client.download_blob().readall()
-        except Exception as e:
-            logger.error(f"Ошибка скачивания из Azure: {e}")
-            raise Exception("Ошибка при скачивании из облака Azure")
-    
-    def delete_file(self, filename: str) -> bool:
-        try:
-            blob_client = self.container_client.get_blob_client(filename)
-            blob_client.delete_blob()
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка удаления из Azure: {e}")
-            raise Exception("Ошибка при удалении из облака Azure")
-    
-    def list_files(self) -> list:
+    def storage_path(self, filename: str) -> str:
+        raise NotImplementedError
+
+    def iter_files(self, prefix: Optional[str] = None) -> AsyncIterator[dict]:
+        """Yield {"name", "size"} for every object in lexicographic order, page by page"""
+        raise NotImplementedError
+
+    async def _iter_pages(self, pages) -> AsyncIterator[list]:
+        pages = iter(pages)
+
+        def fetch_page():
+            page = next(pages, None)
+            return None if page is None else list(page)
+
+        while (page := await asyncio.to_thread(fetch_page)) is not None:
+            yield page
+
+    @classmethod
+    def prewarm(cls):
+        """Pay one-off setup costs (SDK models, credential chains) before the first request"""
+
+    def get_size(self, filename: str) -> int:
+        raise NotImplementedError
+
+    def read_range(self, filename: str, start: int, end: int) -> bytes:
+        """Read bytes start..end of an object, both ends inclusive"""
+        raise NotImplementedError
+
+    def set_storage_class(self, filename: str, storage_class: str) -> bool:
+        raise NotImplementedError
+
+    async def download_ranges(
+        self,
+        filename: str,
+        size: Optional[int] = None,
+        part_size: int = RANGED_DOWNLOAD_PART_SIZE,
+        concurrency: int = RANGED_DOWNLOAD_CONCURRENCY
+    ) -> AsyncIterator[bytes]:
+        """Fetch an object as parallel byte ranges and yield them in order.
+
+        At most `concurrency` parts are in flight or buffered at any time.
+        """
+        if size is None:
+            size = await asyncio.to_thread(self.get_size, filename)
+        ranges = iter([(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)])
+        pending = deque()
+
+        def schedule():
+            part = next(ranges, None)
+            if part is not None:
+                pending.append(asyncio.create_task(asyncio.to_thread(self.read_range, filename, *part)))
+
         try:
-            return [blob.name for blob in self.container_client.list_blobs()]
-        except Exception as e:
-            logger.error(f"Ошибка получения списка из Azure: {e}")
-            raise Exception("Ошибка при получении списка из облака Azure")
-
-class GCSProvider(CloudStorageProvider):
-    def __init__(self):
-        self.credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH')
-        self.bucket_name = os.getenv('GOOGLE_BUCKET_NAME')
-        
-        if not self.bucket_name:
-            raise ValueError("Параметры GCS не настроены. Установите GOOGLE_BUCKET_NAME и GOOGLE_CREDENTIALS_PATH")
-        
-        if self.credentials_path:
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = self.credentials_path
-        
-        self.storage_client = storage.Client()
-        self.bucket = self.storage_client.bucket(self.bucket_name)
-    
+            for _ in range(max(1, concurrency)):
+                schedule()
+            while pending:
+                data = await pending.popleft()
+                schedule()
+                yield data
+        finally:
+            for task in pending:
+                task.cancel()
+
+class LocalProvider(CloudStorageProvider):
+    name = "local"
+
+    def __init__(self, config: Optional[dict] = None):
+        if not config or not config.get('local_path'):
+            raise ValueError("Не указан каталог локального хранилища")
+        self.root = Path(config['local_path'])
+        self.root.mkdir(exist_ok=True, parents=True)
+
     def upload_file(self, file: BinaryIO, filename: str) -> str:
-        try:
-            blob = self.bucket.blob(filename)
-            blob.upload_from_file(file)
-            return f"gs://{self.bucket_name}/{filename}"
-        except Exception as e:
-            logger.error(f"Ошибка загрузки в GCS: {e}")
-            raise Exception("Ошибка при загрузке в облако GCS")
-    
+        file_path = self.root / filename
+        with open(file_path, "wb") as f:
+            while chunk := file.read(1024 * 1024):
+                f.write(chunk)
+        return self.storage_path(filename)
+
     def download_file(self, filename: str) -> bytes:
-        try:
-            blob = self.bucket.blob(filename)
-            return blob.download_as_bytes()
-        except Exception as e:
-            logger.error(f"Ошибка скачивания из GCS: {e}")
-            raise Exception("Ошибка при скачивании из облака GCS")
-    
+        with open(self.root / filename, "rb") as f:
+            return f.read()
+
     def delete_file(self, filename: str) -> bool:
-        try:
-            blob = self.bucket.blob(filename)
-            blob.delete()
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка удаления из GCS: {e}")
-            raise Exception("Ошибка при удалении из облака GCS")
-    
+        file_path = self.root / filename
+        if file_path.exists():
+            file_path.unlink()
+        return True
+
     def list_files(self) -> list:
-        try:
-            blobs = self.storage_client.list_blobs(self.bucket_name)
-            return [blob.name for blob in blobs]
-        except Exception as e:
-            logger.error(f"Ошибка получения списка из GCS: {e}")
-            raise Exception("Ошибка при получении списка из облака GCS")
-
-def get_provider(provider_type: str) -> CloudStorageProvider:
-    providers = {
-        "s3": S3Provider,
-        "azure": AzureBlobProvider,
-        "gcs": GCSProvider
-    }
-    
-    provider_class = providers.get(provider_type.lower())
-    if not provider_class:
-        raise ValueError(f"Неизвестный провайдер: {provider_type}")
-    
-    return provider_class()
+        # dot files are partial uploads; secure_filename never produces such names
+        return sorted(p.name for p in self.root.iterdir() if p.is_file() and not p.name.startswith("."))
+
+    def storage_path(self, filename: str) -> str:
+        return str(self.root / filename)
+
+    async def iter_files(self, prefix: Optional[str] = None) -> AsyncIterator[dict]:
+        for name in await asyncio.to_thread(self.list_files):
+            if prefix and not name.startswith(prefix):
+                continue
+            yield {"name": name, "size": (self.root / name).stat().st_size}
+
+    def get_size(self, filename: str) -> int:
+        return (self.root / filename).stat().st_size
+
+    def read_range(self, filename: str, start: int, end: int) -> bytes:
+        with open(self.root / filename, "rb") as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+PROVIDER_ENTRY_POINT_GROUP = "backup_service.providers"
+
+# The built-in providers ship inside the service image, not in the installed
+# backup-shared distribution, so they are registered here rather than as entry points
+BUILTIN_PROVIDERS = {
+    "local": "backup_service.cloud_providers:LocalProvider",
+    "s3": "backup_service.providers.s3:S3Provider",
+    "azure": "backup_service.providers.azure:AzureBlobProvider",
+    "gcs": "backup_service.providers.gcs:GCSProvider",
+}
+
+class ProviderRegistry:
+    """Maps provider names to classes, importing a provider module (and its SDK) on first use.
+
+    Built-in providers come from BUILTIN_PROVIDERS; installed distributions
+    can add or override providers through the `backup_service.providers`
+    entry point group. A deployment only pays for the SDKs it actually uses.
+    """
+
+    def __init__(self, group: str = PROVIDER_ENTRY_POINT_GROUP):
+        self.group = group
+        self._targets: Optional[Dict[str, str]] = None
+        self._classes: Dict[str, Type[CloudStorageProvider]] = {}
+
+    def targets(self) -> Dict[str, str]:
+        if self._targets is None:
+            targets = dict(BUILTIN_PROVIDERS)
+            for entry_point in entry_points(group=self.group):
+                targets[entry_point.name] = entry_point.value
+            self._targets = targets
+        return self._targets
+
+    def names(self) -> List[str]:
+        return sorted(self.targets())
+
+    def load(self, name: str) -> Type[CloudStorageProvider]:
+        name = name.lower()
+        provider_class = self._classes.get(name)
+        if provider_class is None:
+            target = self.targets().get(name)
+            if target is None:
+                raise ValueError(f"Неизвестный провайдер: {name}")
+            started = time.perf_counter()
+            module_name, _, attribute = target.partition(":")
+            provider_class = getattr(importlib.import_module(module_name), attribute)
+            self._classes[name] = provider_class
+            logger.info(f"Провайдер {name} загружен за {(time.perf_counter() - started) * 1000:.0f} мс")
+        return provider_class
+
+    def prewarm(self, names: Iterable[str]):
+        for name in names:
+            try:
+                self.load(name).prewarm()
+            except Exception as e:
+                logger.warning(f"Не удалось заранее загрузить провайдер {name}: {e}")
+
+provider_registry = ProviderRegistry()
+
+def get_provider(provider_type: str, config: Optional[dict] = None) -> CloudStorageProvider:
+    return provider_registry.load(provider_type)(config)
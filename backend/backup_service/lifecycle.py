@@ -0,0 +1,216 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+import asyncio
+import io
+import logging
+import os
+
+from shared.event_bus import publish, BACKUP_EVENTS, FILE_TIERED
+from shared.token_bucket import TokenBucket
+from .cloud_providers import CloudStorageProvider, get_provider
+from .reconciliation import storage_query
+
+logger = logging.getLogger(__name__)
+
+CLOUD_PROVIDERS = ("s3", "azure", "gcs")
+
+COLD_STORAGE_CLASSES = {
+    "s3": "STANDARD_IA",
+    "azure": "Cool",
+    "gcs": "NEARLINE",
+}
+
+CLAIM_TIMEOUT = timedelta(minutes=15)
+
+class LifecyclePolicy:
+    def __init__(self):
+        self.enabled = os.getenv("LIFECYCLE_ENABLED", "false").lower() == "true"
+        self.interval = float(os.getenv("LIFECYCLE_INTERVAL", "3600"))
+        self.cold_after = timedelta(days=int(os.getenv("LIFECYCLE_COLD_AFTER_DAYS", "30")))
+        self.archive_after = timedelta(days=int(os.getenv("LIFECYCLE_ARCHIVE_AFTER_DAYS", "90")))
+        self.target_provider = os.getenv("LIFECYCLE_TARGET_PROVIDER", "")
+        self.bytes_per_sec = int(os.getenv("LIFECYCLE_BYTES_PER_SEC", str(5 * 1024 * 1024)))
+        self.batch_size = int(os.getenv("LIFECYCLE_BATCH_SIZE", "100"))
+
+def not_accessed_since(cutoff: datetime) -> dict:
+    return {"$or": [
+        {"last_accessed_at": {"$lt": cutoff}},
+        {"last_accessed_at": {"$exists": False}, "uploaded_at": {"$lt": cutoff}},
+    ]}
+
+async def name_taken(db, user_id: str, storage_provider: str, filename: str, exclude: Optional[dict] = None) -> bool:
+    """Whether a catalog entry of the user already keeps an object named `filename` in storage_provider"""
+    query = {"$and": [storage_query(user_id, storage_provider), {"filename": filename}]}
+    if exclude:
+        query["$and"].append(exclude)
+    return await db.backup_db.files.find_one(query, {"_id": 1}) is not None
+
+def file_identity(path: Path) -> Optional[tuple]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+async def object_exists(provider: CloudStorageProvider, filename: str) -> bool:
+    # an exact match sorts before every longer name sharing the prefix
+    async for obj in provider.iter_files(prefix=filename):
+        return obj["name"] == filename
+    return False
+
+class LifecycleEngine:
+    """Moves cold files to cheaper storage while keeping a single catalog entry.
+
+    The `provider` field stays what the user chose at upload time; the actual
+    location lives in `storage_provider`, `storage_path` and `storage_class`.
+    """
+
+    def __init__(self, policy: Optional[LifecyclePolicy] = None):
+        self.policy = policy or LifecyclePolicy()
+        self.bucket = TokenBucket(rate=self.policy.bytes_per_sec, capacity=self.policy.bytes_per_sec)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _claim(self, db, query: dict) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        query = {"$and": [query, {"$or": [
+            {"tiering_claimed_until": {"$exists": False}},
+            {"tiering_claimed_until": {"$lt": now}},
+        ]}]}
+        return await db.backup_db.files.find_one_and_update(
+            query,
+            {"$set": {"tiering_claimed_until": now + CLAIM_TIMEOUT}},
+            return_document=True
+        )
+
+    async def _migrate_local(self, db, file_doc: dict, local_root: Path, get_config) -> bool:
+        """Copy a cold local file to the cloud; True only when the catalog entry was moved.
+
+        A re-upload of the same name may race with the copy. The catalog is
+        switched only if the entry is still the one that was claimed, and the
+        local file is deleted only if it is still the file that was copied;
+        otherwise the cloud copy is removed and the upload wins.
+        """
+        user_config = await get_config(file_doc["user_id"])
+        if not user_config:
+            return False
+        target = self.policy.target_provider or user_config.get("default_provider")
+        if target not in CLOUD_PROVIDERS:
+            return False
+        source_path = local_root / file_doc["user_id"] / file_doc["filename"]
+        source = get_provider("local", {"local_path": str(source_path.parent)})
+        destination = get_provider(target, user_config)
+        # Never overwrite an object of another entry: the claim is kept and the file retried after CLAIM_TIMEOUT
+        if await name_taken(db, file_doc["user_id"], target, file_doc["filename"]) \
+                or await object_exists(destination, file_doc["filename"]):
+            logger.warning(f"Файл {file_doc['filename']} не перенесен: в {target} уже есть объект с таким именем")
+            return False
+        await self.bucket.consume(file_doc.get("size", 0))
+        identity = await asyncio.to_thread(file_identity, source_path)
+        content = await asyncio.to_thread(source.download_file, file_doc["filename"])
+        storage_path = await asyncio.to_thread(destination.upload_file, io.BytesIO(content), file_doc["filename"])
+        storage_class = COLD_STORAGE_CLASSES[target]
+        await asyncio.to_thread(destination.set_storage_class, file_doc["filename"], storage_class)
+        result = await db.backup_db.files.update_one(
+            {
+                "_id": file_doc["_id"],
+                "storage_provider": "local",
+                "uploaded_at": file_doc.get("uploaded_at"),
+                "size": file_doc.get("size"),
+                "tiering_claimed_until": file_doc["tiering_claimed_until"],
+            },
+            {
+                "$set": {
+                    "storage_provider": target,
+                    "storage_path": storage_path,
+                    "storage_class": storage_class,
+                    "tiered_at": datetime.now(timezone.utc),
+                },
+                "$unset": {"tiering_claimed_until": ""},
+            }
+        )
+        if result.modified_count != 1:
+            await asyncio.to_thread(destination.delete_file, file_doc["filename"])
+            logger.warning(f"Файл {file_doc['filename']} изменен во время переноса, копия в {target} удалена")
+            return False
+        if await asyncio.to_thread(file_identity, source_path) == identity:
+            await asyncio.to_thread(source.delete_file, file_doc["filename"])
+        await publish(BACKUP_EVENTS, FILE_TIERED, {
+            "user_id": file_doc["user_id"],
+            "filename": file_doc["filename"],
+            "provider": file_doc["provider"],
+            "storage_provider": target,
+            "previous_storage_provider": "local",
+            "size": file_doc.get("size", 0)
+        })
+        logger.info(f"Файл {file_doc['filename']} перенесен из local в {target}")
+        return True
+
+    async def _change_class(self, db, file_doc: dict, get_config) -> bool:
+        storage_provider = file_doc.get("storage_provider", file_doc["provider"])
+        user_config = await get_config(file_doc["user_id"])
+        if not user_config:
+            return False
+        storage_class = COLD_STORAGE_CLASSES[storage_provider]
+        await self.bucket.consume(file_doc.get("size", 0))
+        provider = get_provider(storage_provider, user_config)
+        await asyncio.to_thread(provider.set_storage_class, file_doc["filename"], storage_class)
+        await db.backup_db.files.update_one(
+            {"_id": file_doc["_id"]},
+            {
+                "$set": {"storage_class": storage_class, "tiered_at": datetime.now(timezone.utc)},
+                "$unset": {"tiering_claimed_until": ""},
+            }
+        )
+        return True
+
+    async def run_once(self, db, local_root: Path, get_config: Callable[[str], Awaitable[Optional[dict]]]) -> int:
+        now = datetime.now(timezone.utc)
+        local_query = {"$and": [
+            {"$or": [
+                {"storage_provider": "local"},
+                {"storage_provider": {"$exists": False}, "provider": "local"},
+            ]},
+            not_accessed_since(now - self.policy.cold_after),
+        ]}
+        cloud_query = {"$and": [
+            {"$or": [
+                {"storage_provider": {"$in": list(CLOUD_PROVIDERS)}},
+                {"storage_provider": {"$exists": False}, "provider": {"$in": list(CLOUD_PROVIDERS)}},
+            ]},
+            {"storage_class": {"$exists": False}},
+            not_accessed_since(now - self.policy.archive_after),
+        ]}
+        processed = 0
+        for query, action in (
+            (local_query, lambda doc: self._migrate_local(db, doc, local_root, get_config)),
+            (cloud_query, lambda doc: self._change_class(db, doc, get_config)),
+        ):
+            for _ in range(self.policy.batch_size):
+                file_doc = await self._claim(db, query)
+                if not file_doc:
+                    break
+                try:
+                    processed += bool(await action(file_doc))
+                except Exception as e:
+                    logger.error(f"Ошибка переноса файла {file_doc['filename']}: {e}")
+        return processed
+
+    async def _run(self, db, local_root: Path, get_config):
+        while True:
+            try:
+                await self.run_once(db, local_root, get_config)
+            except Exception as e:
+                logger.error(f"Ошибка цикла управления жизненным циклом: {e}")
+            await asyncio.sleep(self.policy.interval)
+
+    def start(self, db, local_root: Path, get_config):
+        if self.policy.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(db, local_root, get_config))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+lifecycle_engine = LifecycleEngine()
@@ -1,25 +1,39 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query, Request
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from starlette.background import BackgroundTask
+from pymongo import ReturnDocument
 from datetime import datetime, timezone
 from pathlib import Path
-import sys
+from typing import AsyncIterator, BinaryIO, Optional
+import asyncio
 import os
 import io
 import re
+import uuid
 import httpx
-import boto3
-from azure.storage.blob import BlobServiceClient
-from google.cloud import storage as gcs_storage
-
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from shared.database import connect_to_mongo, close_mongo_connection, get_database
-from auth_service.dependencies import get_current_user
-from .schemas import FileUploadResponse, FileListResponse
+from shared.redis_client import connect_to_redis, close_redis_connection
+from shared.rate_limiter import RateLimiter
+from shared.dependencies import get_current_user, trusted_identity, INTERNAL_SERVICE_TOKEN
+from shared.auth_utils import verify_token
+from shared.config_events import ConfigCache
+from shared.event_bus import publish, BACKUP_EVENTS, FILE_UPLOADED, FILE_DOWNLOADED, FILE_DELETED, FILE_FAILED
+from shared.log_handler import install_log_handler
+from shared.metrics import provider_operation
+from shared.tracing import span, set_attributes
+from shared.instrumentation import instrument_app
+from shared.responses import negotiate
+from shared.cache import response_cache, FILES_TAG
+from .schemas import FileUploadResponse, FileListResponse, ReconciliationResponse
+from .transfer_governor import transfer_governor, Transfer, UploadShapingMiddleware
+from .cloud_providers import (
+    CloudStorageProvider, get_provider, provider_registry, RANGED_DOWNLOAD_PART_SIZE, RANGED_DOWNLOAD_CONCURRENCY
+)
+from .access_tracker import access_tracker
+from .lifecycle import lifecycle_engine, name_taken
+from .reconciliation import reconcile, backfill_storage_provider
 
 REQUIRED_ENV_VARS = ["MONGODB_URL"]
 for var in REQUIRED_ENV_VARS:
@@ -27,10 +41,9 @@ for var in REQUIRED_ENV_VARS:
         raise ValueError(f"Переменная окружения {var} не установлена")
 
 app = FastAPI(title="Backup Service", version="1.0.0")
+instrument_app(app, "backup_service")
 
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+limiter = RateLimiter("backup")
 
 app.add_middleware(
     CORSMiddleware,
@@ -51,6 +64,9 @@ ALLOWED_MIME_TYPES = {
     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 }
 
+TRANSFER_CHUNK_SIZE = 64 * 1024
+RANGED_DOWNLOAD_THRESHOLD = int(os.getenv("RANGED_DOWNLOAD_THRESHOLD", str(16 * 1024 * 1024)))
+
 LOCAL_STORAGE_PATH = Path("/app/local_storage")
 LOCAL_STORAGE_PATH.mkdir(exist_ok=True, parents=True)
 
@@ -75,27 +91,108 @@ def validate_file(filename: str, content: bytes, content_type: str):
             detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE / 1024 / 1024}МБ"
         )
 
-async def get_user_config(user_id: str):
-    config_url = "http://config_service:8003/config"
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                config_url,
-                headers={"X-User-ID": user_id}
+def upload_owner(request: Request) -> Optional[str]:
+    """The uploading user, resolved before the body is read"""
+    user = trusted_identity(request)
+    if user is not None:
+        return user["user_id"]
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = verify_token(token)
+    return payload.get("sub") if payload else None
+
+app.add_middleware(UploadShapingMiddleware, paths={"/upload"}, identify=upload_owner, max_size=MAX_FILE_SIZE)
+
+async def read_upload(file: UploadFile) -> bytes:
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(TRANSFER_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE / 1024 / 1024}МБ"
             )
-            if response.status_code == 200:
-                return response.json()
+    return bytes(buffer)
+
+async def iter_content(content: bytes):
+    yield content
+
+async def iter_file(file: BinaryIO) -> AsyncIterator[bytes]:
+    """Read an open file chunk by chunk off the event loop, closing it when done"""
+    try:
+        while chunk := await asyncio.to_thread(file.read, TRANSFER_CHUNK_SIZE):
+            yield chunk
+    finally:
+        await asyncio.to_thread(file.close)
+
+async def stream_download(parts: AsyncIterator[bytes], transfer: Transfer):
+    try:
+        async for part in parts:
+            view = memoryview(part)
+            for offset in range(0, len(view), TRANSFER_CHUNK_SIZE):
+                chunk = view[offset:offset + TRANSFER_CHUNK_SIZE]
+                await transfer.throttle(len(chunk))
+                yield bytes(chunk)
+    finally:
+        transfer.release()
+
+CONFIG_SERVICE_URL = os.getenv("CONFIG_SERVICE_URL", "http://config_service:8003")
+PREWARM_PROVIDERS = [name for name in os.getenv("STORAGE_PROVIDERS_PREWARM", "").split(",") if name]
+
+async def fetch_user_config(user_id: str):
+    try:
+        with span("config.fetch", {"enduser.id": user_id}):
+            async with httpx.AsyncClient() as client:
+                response = await client.post(
+                    f"{CONFIG_SERVICE_URL}/configs/batch",
+                    json={"user_ids": [user_id]},
+                    headers={"X-Internal-Token": INTERNAL_SERVICE_TOKEN}
+                )
+                if response.status_code == 200:
+                    configs = response.json()["configs"]
+                    return configs[0] if configs else None
     except Exception as e:
         print(f"Ошибка получения конфигурации: {e}")
     return None
 
+config_cache = ConfigCache(fetch_user_config)
+
+async def get_user_config(user_id: str):
+    return await config_cache.get(user_id)
+
+def open_cloud_provider(provider: str, user_config: dict) -> CloudStorageProvider:
+    if provider == "local" or provider not in provider_registry.names():
+        raise HTTPException(status_code=400, detail="Неподдерживаемый провайдер")
+    try:
+        return get_provider(provider, user_config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.on_event("startup")
 async def startup_event():
+    install_log_handler("backup_service")
     await connect_to_mongo()
+    await connect_to_redis()
+    db = await get_database()
+    await db.backup_db.files.create_index([("user_id", 1), ("provider", 1), ("filename", 1)])
+    await db.backup_db.files.create_index([("user_id", 1), ("storage_provider", 1), ("filename", 1)])
+    await backfill_storage_provider(db)
+    await asyncio.to_thread(provider_registry.prewarm, PREWARM_PROVIDERS)
+    config_cache.start()
+    access_tracker.start(db)
+    lifecycle_engine.start(db, LOCAL_STORAGE_PATH, get_user_config)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await lifecycle_engine.stop()
+    await access_tracker.stop()
+    await config_cache.stop()
     await close_mongo_connection()
+    await close_redis_connection()
 
 @app.get("/")
 async def root():
@@ -105,6 +202,18 @@ async def root():
 async def health_check():
     return {"status": "здоровый", "service": "backup_service"}
 
+async def remove_superseded_copy(user_id: str, storage_provider: str, filename: str):
+    """Delete the tiered cloud copy that a re-upload of the same name replaced"""
+    try:
+        user_config = await get_user_config(user_id)
+        if not user_config:
+            raise ValueError("конфигурация не найдена")
+        cloud_provider = get_provider(storage_provider, user_config)
+        await asyncio.to_thread(cloud_provider.delete_file, filename)
+    except Exception as e:
+        # left for reconciliation to report as an orphan
+        print(f"Не удалось удалить замененную копию {filename} в {storage_provider}: {e}")
+
 @app.post("/upload", response_model=FileUploadResponse)
 @limiter.limit("10/minute")
 async def upload_file(
@@ -114,20 +223,30 @@ async def upload_file(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_database)
 ):
+    # admitted and throttled by UploadShapingMiddleware while the body was received
+    transfer = getattr(request.state, "transfer", None) \
+        or transfer_governor.admit(current_user["user_id"], "upload", MAX_FILE_SIZE)
+    set_attributes({"backup.provider": provider})
     try:
-        file_content = await file.read()
+        with span("upload.read_body"):
+            file_content = await read_upload(file)
         safe_filename = secure_filename(file.filename)
-        validate_file(safe_filename, file_content, file.content_type)
+        with span("upload.validate"):
+            validate_file(safe_filename, file_content, file.content_type)
         
         file_size = len(file_content)
+        set_attributes({"backup.filename": safe_filename, "backup.file_size": file_size})
         file_stream = io.BytesIO(file_content)
         
         if provider == "local":
             user_folder = LOCAL_STORAGE_PATH / current_user["user_id"]
             user_folder.mkdir(exist_ok=True, parents=True)
             file_path = user_folder / safe_filename
-            with open(file_path, "wb") as f:
+            # written aside and renamed, so a lifecycle migration copying the old file never deletes this one
+            partial_path = user_folder / f".{safe_filename}.{uuid.uuid4().hex}"
+            with provider_operation("local", "upload"), open(partial_path, "wb") as f:
                 f.write(file_content)
+            os.replace(partial_path, file_path)
             storage_path = str(file_path)
         else:
             user_config = await get_user_config(current_user["user_id"])
@@ -136,49 +255,45 @@ async def upload_file(
                     status_code=400, 
                     detail="Пожалуйста, настройте параметры облачного хранилища в разделе Настройки"
                 )
-            if provider == "s3":
-                if not all([user_config.get("aws_access_key"), user_config.get("aws_secret_key"), user_config.get("aws_bucket")]):
-                    raise HTTPException(status_code=400, detail="AWS ключи не настроены")
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=user_config["aws_access_key"],
-                    aws_secret_access_key=user_config["aws_secret_key"],
-                    region_name=user_config.get("aws_region", "us-east-1")
-                )
-                s3_client.upload_fileobj(file_stream, user_config["aws_bucket"], safe_filename)
-                storage_path = f"s3://{user_config['aws_bucket']}/{safe_filename}"
-            elif provider == "azure":
-                if not all([user_config.get("azure_connection_string"), user_config.get("azure_container")]):
-                    raise HTTPException(status_code=400, detail="Azure параметры не настроены")
-                blob_service = BlobServiceClient.from_connection_string(user_config["azure_connection_string"])
-                blob_client = blob_service.get_blob_client(
-                    container=user_config["azure_container"],
-                    blob=safe_filename
+            # a file moved here by the lifecycle engine keeps its original provider in the catalog
+            if await name_taken(db, current_user["user_id"], provider, safe_filename, {"provider": {"$ne": provider}}):
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Имя {safe_filename} уже занято перенесенным файлом в {provider}"
                 )
-                file_stream.seek(0)
-                blob_client.upload_blob(file_stream, overwrite=True)
-                storage_path = f"azure://{user_config['azure_container']}/{safe_filename}"
-            elif provider == "gcs":
-                if not all([user_config.get("gcs_project_id"), user_config.get("gcs_bucket")]):
-                    raise HTTPException(status_code=400, detail="Google Cloud параметры не настроены")
-                client = gcs_storage.Client(project=user_config["gcs_project_id"])
-                bucket = client.bucket(user_config["gcs_bucket"])
-                blob = bucket.blob(safe_filename)
-                file_stream.seek(0)
-                blob.upload_from_file(file_stream)
-                storage_path = f"gs://{user_config['gcs_bucket']}/{safe_filename}"
-            else:
-                raise HTTPException(status_code=400, detail="Неподдерживаемый провайдер")
+            cloud_provider = open_cloud_provider(provider, user_config)
+            storage_path = await asyncio.to_thread(cloud_provider.upload_file, file_stream, safe_filename)
         
         file_metadata = {
             "filename": safe_filename,
             "size": file_size,
             "storage_path": storage_path,
             "provider": provider,
+            "storage_provider": provider,
             "user_id": current_user["user_id"],
             "uploaded_at": datetime.now(timezone.utc)
         }
-        await db.backup_db.files.insert_one(file_metadata)
+        with span("catalog.write"):
+            previous = await db.backup_db.files.find_one_and_update(
+                {"filename": safe_filename, "user_id": current_user["user_id"], "provider": provider},
+                {"$set": file_metadata, "$unset": {"storage_class": "", "tiered_at": "", "tiering_claimed_until": ""}},
+                projection={"size": 1, "storage_provider": 1},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        if previous and previous.get("storage_provider", provider) != provider:
+            await remove_superseded_copy(current_user["user_id"], previous["storage_provider"], safe_filename)
+        await response_cache.invalidate(FILES_TAG.format(user_id=current_user["user_id"]))
+        await publish(BACKUP_EVENTS, FILE_UPLOADED, {
+            "user_id": current_user["user_id"],
+            "email": current_user.get("email"),
+            "filename": safe_filename,
+            "provider": provider,
+            "storage_provider": provider,
+            "size": file_size,
+            "previous_size": previous.get("size", 0) if previous else 0,
+            "previous_storage_provider": previous.get("storage_provider", provider) if previous else provider
+        })
         
         return FileUploadResponse(
             filename=safe_filename,
@@ -190,7 +305,17 @@ async def upload_file(
     except HTTPException:
         raise
     except Exception as e:
+        await publish(BACKUP_EVENTS, FILE_FAILED, {
+            "user_id": current_user["user_id"],
+            "email": current_user.get("email"),
+            "filename": file.filename,
+            "provider": provider,
+            "operation": "upload",
+            "error": str(e)
+        })
         raise HTTPException(status_code=500, detail=f"Ошибка загрузки: {str(e)}")
+    finally:
+        transfer.release()
 
 @app.get("/download/{filename}")
 @limiter.limit("20/minute")
@@ -203,55 +328,78 @@ async def download_file(
 ):
     try:
         safe_filename = secure_filename(filename)
-        file_doc = await db.backup_db.files.find_one({
-            "filename": safe_filename,
-            "user_id": current_user["user_id"],
-            "provider": provider
-        })
+        with span("catalog.lookup"):
+            file_doc = await db.backup_db.files.find_one({
+                "filename": safe_filename,
+                "user_id": current_user["user_id"],
+                "provider": provider
+            })
         if not file_doc:
             raise HTTPException(status_code=404, detail="Файл не найден или доступ запрещен")
-        if provider == "local":
+        file_size = file_doc.get("size", 0)
+        storage_provider = file_doc.get("storage_provider", provider)
+        ranged = storage_provider != "local" and file_size >= RANGED_DOWNLOAD_THRESHOLD
+        if ranged:
+            reserved = min(file_size, RANGED_DOWNLOAD_PART_SIZE * (RANGED_DOWNLOAD_CONCURRENCY + 1))
+        elif storage_provider == "local":
+            # streamed from disk, one chunk in memory at a time
+            reserved = min(file_size, TRANSFER_CHUNK_SIZE)
+        else:
+            reserved = file_size
+        set_attributes({
+            "backup.provider": storage_provider,
+            "backup.filename": safe_filename,
+            "backup.file_size": file_size,
+            "backup.ranged": ranged
+        })
+        transfer = transfer_governor.admit(current_user["user_id"], "download", reserved)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка скачивания: {str(e)}")
+    try:
+        if storage_provider == "local":
             user_folder = LOCAL_STORAGE_PATH / current_user["user_id"]
             file_path = user_folder / safe_filename
-            if not file_path.exists():
+            try:
+                parts = iter_file(await asyncio.to_thread(open, file_path, "rb"))
+            except FileNotFoundError:
                 raise HTTPException(status_code=404, detail="Файл не найден на диске")
-            with open(file_path, "rb") as f:
-                file_content = f.read()
         else:
             user_config = await get_user_config(current_user["user_id"])
             if not user_config:
                 raise HTTPException(status_code=400, detail="Конфигурация не найдена")
-            if provider == "s3":
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=user_config["aws_access_key"],
-                    aws_secret_access_key=user_config["aws_secret_key"],
-                    region_name=user_config.get("aws_region", "us-east-1")
-                )
-                response = s3_client.get_object(Bucket=user_config["aws_bucket"], Key=safe_filename)
-                file_content = response['Body'].read()
-            elif provider == "azure":
-                blob_service = BlobServiceClient.from_connection_string(user_config["azure_connection_string"])
-                blob_client = blob_service.get_blob_client(
-                    container=user_config["azure_container"],
-                    blob=safe_filename
-                )
-                file_content = blob_client.download_blob().readall()
-            elif provider == "gcs":
-                client = gcs_storage.Client(project=user_config["gcs_project_id"])
-                bucket = client.bucket(user_config["gcs_bucket"])
-                blob = bucket.blob(safe_filename)
-                file_content = blob.download_as_bytes()
+            cloud_provider = open_cloud_provider(storage_provider, user_config)
+            if ranged:
+                parts = cloud_provider.download_ranges(safe_filename, file_size)
             else:
-                raise HTTPException(status_code=400, detail="Неподдерживаемый провайдер")
+                parts = iter_content(await asyncio.to_thread(cloud_provider.download_file, safe_filename))
+        access_tracker.record(file_doc["_id"])
+        await publish(BACKUP_EVENTS, FILE_DOWNLOADED, {
+            "user_id": current_user["user_id"],
+            "filename": safe_filename,
+            "provider": storage_provider,
+            "size": file_size
+        })
         return StreamingResponse(
-            io.BytesIO(file_content),
+            stream_download(parts, transfer),
             media_type="application/octet-stream",
-            headers={"Content-Disposition": f"attachment; filename={safe_filename}"}
+            headers={"Content-Disposition": f"attachment; filename={safe_filename}"},
+            background=BackgroundTask(transfer.release)
         )
     except HTTPException:
+        transfer.release()
         raise
     except Exception as e:
+        transfer.release()
+        await publish(BACKUP_EVENTS, FILE_FAILED, {
+            "user_id": current_user["user_id"],
+            "email": current_user.get("email"),
+            "filename": safe_filename,
+            "provider": storage_provider,
+            "operation": "download",
+            "error": str(e)
+        })
         raise HTTPException(status_code=500, detail=f"Ошибка скачивания: {str(e)}")
 
 @app.delete("/delete/{filename}")
@@ -272,7 +420,8 @@ async def delete_file(
         })
         if not file_doc:
             raise HTTPException(status_code=404, detail="Файл не найден или доступ запрещен")
-        if provider == "local":
+        storage_provider = file_doc.get("storage_provider", provider)
+        if storage_provider == "local":
             user_folder = LOCAL_STORAGE_PATH / current_user["user_id"]
             file_path = user_folder / safe_filename
             if file_path.exists():
@@ -281,36 +430,39 @@ async def delete_file(
             user_config = await get_user_config(current_user["user_id"])
             if not user_config:
                 raise HTTPException(status_code=400, detail="Конфигурация не найдена")
-            if provider == "s3":
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=user_config["aws_access_key"],
-                    aws_secret_access_key=user_config["aws_secret_key"],
-                    region_name=user_config.get("aws_region", "us-east-1")
-                )
-                s3_client.delete_object(Bucket=user_config["aws_bucket"], Key=safe_filename)
-            elif provider == "azure":
-                blob_service = BlobServiceClient.from_connection_string(user_config["azure_connection_string"])
-                blob_client = blob_service.get_blob_client(
-                    container=user_config["azure_container"],
-                    blob=safe_filename
-                )
-                blob_client.delete_blob()
-            elif provider == "gcs":
-                client = gcs_storage.Client(project=user_config["gcs_project_id"])
-                bucket = client.bucket(user_config["gcs_bucket"])
-                blob = bucket.blob(safe_filename)
-                blob.delete()
-        await db.backup_db.files.delete_one({
+            cloud_provider = open_cloud_provider(storage_provider, user_config)
+            await asyncio.to_thread(cloud_provider.delete_file, safe_filename)
+        await db.backup_db.files.delete_one({"_id": file_doc["_id"]})
+        await response_cache.invalidate(FILES_TAG.format(user_id=current_user["user_id"]))
+        await publish(BACKUP_EVENTS, FILE_DELETED, {
+            "user_id": current_user["user_id"],
             "filename": safe_filename,
-            "user_id": current_user["user_id"]
+            "provider": provider,
+            "storage_provider": storage_provider,
+            "size": file_doc.get("size", 0)
         })
         return {"message": f"Файл {safe_filename} успешно удален"}
     except HTTPException:
         raise
     except Exception as e:
+        await publish(BACKUP_EVENTS, FILE_FAILED, {
+            "user_id": current_user["user_id"],
+            "email": current_user.get("email"),
+            "filename": filename,
+            "provider": provider,
+            "operation": "delete",
+            "error": str(e)
+        })
         raise HTTPException(status_code=500, detail=f"Ошибка удаления: {str(e)}")
 
+@response_cache.cached("files.list", key=("user_id", "provider"), tags=(FILES_TAG,))
+async def list_filenames(db, user_id: str, provider: str) -> list:
+    user_files = await db.backup_db.files.find(
+        {"user_id": user_id, "provider": provider},
+        {"filename": 1, "_id": 0}
+    ).to_list(length=1000)
+    return [f["filename"] for f in user_files]
+
 @app.get("/list", response_model=FileListResponse)
 @limiter.limit("30/minute")
 async def list_files(
@@ -320,15 +472,39 @@ async def list_files(
     db = Depends(get_database)
 ):
     try:
-        user_files = await db.backup_db.files.find({
-            "user_id": current_user["user_id"],
-            "provider": provider
-        }).to_list(length=1000)
-        filenames = [f["filename"] for f in user_files]
-        return FileListResponse(files=filenames, count=len(filenames))
+        filenames = await list_filenames(db, current_user["user_id"], provider)
+        return negotiate(request, {"files": filenames, "count": len(filenames)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения списка: {str(e)}")
 
+@app.post("/reconcile", response_model=ReconciliationResponse)
+@limiter.limit("2/minute")
+async def reconcile_files(
+    request: Request,
+    provider: str = Query("local", description="Провайдер хранилища: local, s3, azure, gcs"),
+    repair: bool = Query(False, description="Исправить найденные расхождения"),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    try:
+        if provider == "local":
+            storage = get_provider("local", {"local_path": str(LOCAL_STORAGE_PATH / current_user["user_id"])})
+        else:
+            user_config = await get_user_config(current_user["user_id"])
+            if not user_config:
+                raise HTTPException(status_code=400, detail="Конфигурация не найдена")
+            storage = get_provider(provider, user_config)
+        report = await reconcile(db, current_user["user_id"], provider, storage, repair=repair)
+        if repair:
+            await response_cache.invalidate(FILES_TAG.format(user_id=current_user["user_id"]))
+        return report
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка сверки: {str(e)}")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
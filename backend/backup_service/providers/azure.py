@@ -0,0 +1,96 @@
+from azure.storage.blob import BlobServiceClient
+from typing import AsyncIterator, BinaryIO, Optional
+import logging
+import os
+
+from ..cloud_providers import CloudStorageProvider
+
+logger = logging.getLogger(__name__)
+
+class AzureBlobProvider(CloudStorageProvider):
+    name = "azure"
+
+    def __init__(self, config: Optional[dict] = None):
+        if config:
+            self.connection_string = config.get('azure_connection_string')
+            self.container_name = config.get('azure_container')
+        else:
+            self.connection_string = os.getenv('AZURE_CONNECTION_STRING')
+            self.container_name = os.getenv('AZURE_CONTAINER_NAME')
+        
+        if not all([self.connection_string, self.container_name]):
+            raise ValueError("Параметры Azure не настроены. Установите AZURE_CONNECTION_STRING и AZURE_CONTAINER_NAME")
+        
+        self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
+        self.container_client = self.blob_service_client.get_container_client(self.container_name)
+    
+    def upload_file(self, file: BinaryIO, filename: str) -> str:
+        try:
+            blob_client = self.container_client.get_blob_client(filename)
+            blob_client.upload_blob(file, overwrite=True)
+            return self.storage_path(filename)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки в Azure: {e}")
+            raise Exception("Ошибка при загрузке в облако Azure")
+    
+    def download_file(self, filename: str) -> bytes:
+        try:
+            blob_client = self.container_client.get_blob_client(filename)
+            return blob_client.download_blob().readall()
+        except Exception as e:
+            logger.error(f"Ошибка скачивания из Azure: {e}")
+            raise Exception("Ошибка при скачивании из облака Azure")
+
+    def get_size(self, filename: str) -> int:
+        try:
+            blob_client = self.container_client.get_blob_client(filename)
+            return blob_client.get_blob_properties().size
+        except Exception as e:
+            logger.error(f"Ошибка получения размера объекта Azure: {e}")
+            raise Exception("Ошибка при получении размера объекта в облаке Azure")
+
+    def read_range(self, filename: str, start: int, end: int) -> bytes:
+        try:
+            blob_client = self.container_client.get_blob_client(filename)
+            return blob_client.download_blob(offset=start, length=end - start + 1).readall()
+        except Exception as e:
+            logger.error(f"Ошибка скачивания диапазона из Azure: {e}")
+            raise Exception("Ошибка при скачивании из облака Azure")
+    
+    def delete_file(self, filename: str) -> bool:
+        try:
+            blob_client = self.container_client.get_blob_client(filename)
+            blob_client.delete_blob()
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка удаления из Azure: {e}")
+            raise Exception("Ошибка при удалении из облака Azure")
+    
+    def set_storage_class(self, filename: str, storage_class: str) -> bool:
+        try:
+            blob_client = self.container_client.get_blob_client(filename)
+            blob_client.set_standard_blob_tier(storage_class)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка смены уровня доступа Azure: {e}")
+            raise Exception("Ошибка при смене класса хранения в облаке Azure")
+
+    def list_files(self) -> list:
+        try:
+            return [blob.name for blob in self.container_client.list_blobs()]
+        except Exception as e:
+            logger.error(f"Ошибка получения списка из Azure: {e}")
+            raise Exception("Ошибка при получении списка из облака Azure")
+
+    def storage_path(self, filename: str) -> str:
+        return f"azure://{self.container_name}/{filename}"
+
+    async def iter_files(self, prefix: Optional[str] = None) -> AsyncIterator[dict]:
+        try:
+            pages = self.container_client.list_blobs(name_starts_with=prefix).by_page()
+            async for page in self._iter_pages(pages):
+                for blob in page:
+                    yield {"name": blob.name, "size": blob.size}
+        except Exception as e:
+            logger.error(f"Ошибка получения списка из Azure: {e}")
+            raise Exception("Ошибка при получении списка из облака Azure")
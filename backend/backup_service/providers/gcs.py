@@ -0,0 +1,107 @@
+from google.cloud import storage
+from typing import AsyncIterator, BinaryIO, Optional
+import logging
+import os
+
+from ..cloud_providers import CloudStorageProvider
+
+logger = logging.getLogger(__name__)
+
+class GCSProvider(CloudStorageProvider):
+    name = "gcs"
+
+    def __init__(self, config: Optional[dict] = None):
+        if config:
+            self.project_id = config.get('gcs_project_id')
+            self.credentials_path = config.get('gcs_credentials_path')
+            self.bucket_name = config.get('gcs_bucket')
+        else:
+            self.project_id = None
+            self.credentials_path = os.getenv('GOOGLE_CREDENTIALS_PATH')
+            self.bucket_name = os.getenv('GOOGLE_BUCKET_NAME')
+        
+        if not self.bucket_name:
+            raise ValueError("Параметры GCS не настроены. Установите GOOGLE_BUCKET_NAME и GOOGLE_CREDENTIALS_PATH")
+        
+        # per-user credentials stay on this client; the process environment is shared by all requests
+        if self.credentials_path:
+            # without an explicit project the one in the key file is used
+            project = {"project": self.project_id} if self.project_id else {}
+            self.storage_client = storage.Client.from_service_account_json(self.credentials_path, **project)
+        else:
+            self.storage_client = storage.Client(project=self.project_id)
+        self.bucket = self.storage_client.bucket(self.bucket_name)
+    
+    def upload_file(self, file: BinaryIO, filename: str) -> str:
+        try:
+            blob = self.bucket.blob(filename)
+            blob.upload_from_file(file)
+            return self.storage_path(filename)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки в GCS: {e}")
+            raise Exception("Ошибка при загрузке в облако GCS")
+    
+    def download_file(self, filename: str) -> bytes:
+        try:
+            blob = self.bucket.blob(filename)
+            return blob.download_as_bytes()
+        except Exception as e:
+            logger.error(f"Ошибка скачивания из GCS: {e}")
+            raise Exception("Ошибка при скачивании из облака GCS")
+
+    def get_size(self, filename: str) -> int:
+        try:
+            blob = self.bucket.get_blob(filename)
+            if blob is None:
+                raise FileNotFoundError(filename)
+            return blob.size
+        except Exception as e:
+            logger.error(f"Ошибка получения размера объекта GCS: {e}")
+            raise Exception("Ошибка при получении размера объекта в облаке GCS")
+
+    def read_range(self, filename: str, start: int, end: int) -> bytes:
+        try:
+            blob = self.bucket.blob(filename)
+            return blob.download_as_bytes(start=start, end=end)
+        except Exception as e:
+            logger.error(f"Ошибка скачивания диапазона из GCS: {e}")
+            raise Exception("Ошибка при скачивании из облака GCS")
+    
+    def delete_file(self, filename: str) -> bool:
+        try:
+            blob = self.bucket.blob(filename)
+            blob.delete()
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка удаления из GCS: {e}")
+            raise Exception("Ошибка при удалении из облака GCS")
+    
+    def set_storage_class(self, filename: str, storage_class: str) -> bool:
+        try:
+            blob = self.bucket.blob(filename)
+            blob.update_storage_class(storage_class)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка смены класса хранения GCS: {e}")
+            raise Exception("Ошибка при смене класса хранения в облаке GCS")
+
+    def list_files(self) -> list:
+        try:
+            blobs = self.storage_client.list_blobs(self.bucket_name)
+            return [blob.name for blob in blobs]
+        except Exception as e:
+            logger.error(f"Ошибка получения списка из GCS: {e}")
+            raise Exception("Ошибка при получении списка из облака GCS")
+
+    def storage_path(self, filename: str) -> str:
+        return f"gs://{self.bucket_name}/{filename}"
+
+    async def iter_files(self, prefix: Optional[str] = None) -> AsyncIterator[dict]:
+        try:
+            pages = self.storage_client.list_blobs(self.bucket_name, prefix=prefix).pages
+            async for page in self._iter_pages(pages):
+                for blob in page:
+                    yield {"name": blob.name, "size": blob.size}
+        except Exception as e:
+            logger.error(f"Ошибка получения списка из GCS: {e}")
+            raise Exception("Ошибка при получении списка из облака GCS")
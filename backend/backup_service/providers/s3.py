@@ -0,0 +1,121 @@
+import boto3
+from typing import AsyncIterator, BinaryIO, Optional
+import logging
+import os
+
+from ..cloud_providers import CloudStorageProvider
+
+logger = logging.getLogger(__name__)
+
+class S3Provider(CloudStorageProvider):
+    name = "s3"
+
+    def __init__(self, config: Optional[dict] = None):
+        if config:
+            self.aws_access_key = config.get('aws_access_key')
+            self.aws_secret_key = config.get('aws_secret_key')
+            self.bucket_name = config.get('aws_bucket')
+            self.region = config.get('aws_region') or 'us-east-1'
+        else:
+            self.aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
+            self.aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+            self.bucket_name = os.getenv('AWS_BUCKET_NAME')
+            self.region = os.getenv('AWS_REGION', 'us-east-1')
+        
+        if not all([self.aws_access_key, self.aws_secret_key, self.bucket_name]):
+            raise ValueError("AWS ключи не настроены. Установите AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY и AWS_BUCKET_NAME")
+        
+        self.s3_client = boto3.client(
+            's3',
+            aws_access_key_id=self.aws_access_key,
+            aws_secret_access_key=self.aws_secret_key,
+            region_name=self.region
+        )
+    
+    @classmethod
+    def prewarm(cls):
+        # loads and caches the S3 service model and endpoint rules in the default session
+        boto3.client('s3', region_name='us-east-1', aws_access_key_id='prewarm', aws_secret_access_key='prewarm')
+
+    def upload_file(self, file: BinaryIO, filename: str) -> str:
+        try:
+            self.s3_client.upload_fileobj(file, self.bucket_name, filename)
+            return self.storage_path(filename)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки в S3: {e}")
+            raise Exception("Ошибка при загрузке в облако S3")
+    
+    def download_file(self, filename: str) -> bytes:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=filename)
+            return response['Body'].read()
+        except Exception as e:
+            logger.error(f"Ошибка скачивания из S3: {e}")
+            raise Exception("Ошибка при скачивании из облака S3")
+
+    def get_size(self, filename: str) -> int:
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=filename)
+            return response['ContentLength']
+        except Exception as e:
+            logger.error(f"Ошибка получения размера объекта S3: {e}")
+            raise Exception("Ошибка при получении размера объекта в облаке S3")
+
+    def read_range(self, filename: str, start: int, end: int) -> bytes:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=filename, Range=f"bytes={start}-{end}")
+            return response['Body'].read()
+        except Exception as e:
+            logger.error(f"Ошибка скачивания диапазона из S3: {e}")
+            raise Exception("Ошибка при скачивании из облака S3")
+    
+    def delete_file(self, filename: str) -> bool:
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=filename)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка удаления из S3: {e}")
+            raise Exception("Ошибка при удалении из облака S3")
+    
+    def set_storage_class(self, filename: str, storage_class: str) -> bool:
+        try:
+            self.s3_client.copy_object(
+                Bucket=self.bucket_name,
+                Key=filename,
+                CopySource={'Bucket': self.bucket_name, 'Key': filename},
+                StorageClass=storage_class,
+                MetadataDirective='COPY'
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка смены класса хранения S3: {e}")
+            raise Exception("Ошибка при смене класса хранения в облаке S3")
+
+    def list_files(self) -> list:
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            return [
+                obj['Key']
+                for page in paginator.paginate(Bucket=self.bucket_name)
+                for obj in page.get('Contents', [])
+            ]
+        except Exception as e:
+            logger.error(f"Ошибка получения списка из S3: {e}")
+            raise Exception("Ошибка при получении списка из облака S3")
+
+    def storage_path(self, filename: str) -> str:
+        return f"s3://{self.bucket_name}/{filename}"
+
+    async def iter_files(self, prefix: Optional[str] = None) -> AsyncIterator[dict]:
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        params = {"Bucket": self.bucket_name}
+        if prefix:
+            params["Prefix"] = prefix
+        try:
+            pages = (response.get('Contents', []) for response in paginator.paginate(**params))
+            async for page in self._iter_pages(pages):
+                for obj in page:
+                    yield {"name": obj['Key'], "size": obj['Size']}
+        except Exception as e:
+            logger.error(f"Ошибка получения списка из S3: {e}")
+            raise Exception("Ошибка при получении списка из облака S3")
@@ -0,0 +1,116 @@
+from datetime import datetime, timezone
+from typing import Optional
+import logging
+
+from .cloud_providers import CloudStorageProvider
+
+logger = logging.getLogger(__name__)
+
+def storage_query(user_id: str, provider_name: str) -> dict:
+    """Entries stored in provider_name; served by the (user_id, storage_provider, filename) index"""
+    return {"user_id": user_id, "storage_provider": provider_name}
+
+async def backfill_storage_provider(db) -> int:
+    """Give entries written before storage_provider existed the provider they were uploaded to"""
+    result = await db.backup_db.files.update_many(
+        {"storage_provider": {"$exists": False}},
+        [{"$set": {"storage_provider": "$provider"}}]
+    )
+    if result.modified_count:
+        logger.info(f"Заполнено поле storage_provider у {result.modified_count} записей каталога")
+    return result.modified_count
+
+class ReconciliationReport:
+    def __init__(self, sample_limit: int):
+        self.sample_limit = sample_limit
+        self.checked = 0
+        self.orphans = 0
+        self.missing = 0
+        self.duplicates = 0
+        self.repaired = 0
+        self.samples = {"orphans": [], "missing": [], "duplicates": []}
+
+    def add(self, kind: str, filename: str):
+        setattr(self, kind, getattr(self, kind) + 1)
+        if len(self.samples[kind]) < self.sample_limit:
+            self.samples[kind].append(filename)
+
+    def to_dict(self) -> dict:
+        return {
+            "checked": self.checked,
+            "orphans": self.orphans,
+            "missing": self.missing,
+            "duplicates": self.duplicates,
+            "repaired": self.repaired,
+            "samples": self.samples,
+        }
+
+async def reconcile(
+    db,
+    user_id: str,
+    provider_name: str,
+    provider: CloudStorageProvider,
+    repair: bool = False,
+    sample_limit: int = 100
+) -> dict:
+    """Merge-join the provider listing against the catalog sorted by filename.
+
+    Both sides are consumed as streams, so memory stays constant regardless of
+    bucket size: orphans exist only in storage, missing entries only in the
+    catalog, duplicates are repeated catalog entries for the same object.
+    """
+    files = db.backup_db.files
+    report = ReconciliationReport(sample_limit)
+    cursor = files.find(
+        storage_query(user_id, provider_name),
+        {"filename": 1, "size": 1}
+    ).sort("filename", 1)
+    catalog = cursor.__aiter__()
+    storage = provider.iter_files().__aiter__()
+
+    async def next_or_none(iterator) -> Optional[dict]:
+        try:
+            return await iterator.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    entry = await next_or_none(catalog)
+    obj = await next_or_none(storage)
+    last_matched = None
+    while entry is not None or obj is not None:
+        report.checked += 1
+        if entry is not None and entry["filename"] == last_matched:
+            report.add("duplicates", entry["filename"])
+            if repair:
+                await files.delete_one({"_id": entry["_id"]})
+                report.repaired += 1
+            entry = await next_or_none(catalog)
+        elif entry is not None and (obj is None or entry["filename"] < obj["name"]):
+            report.add("missing", entry["filename"])
+            if repair:
+                await files.delete_one({"_id": entry["_id"]})
+                report.repaired += 1
+            entry = await next_or_none(catalog)
+        elif entry is None or obj["name"] < entry["filename"]:
+            report.add("orphans", obj["name"])
+            if repair:
+                await files.insert_one({
+                    "filename": obj["name"],
+                    "size": obj["size"],
+                    "storage_path": provider.storage_path(obj["name"]),
+                    "provider": provider_name,
+                    "storage_provider": provider_name,
+                    "user_id": user_id,
+                    "uploaded_at": datetime.now(timezone.utc),
+                    "reconciled": True
+                })
+                report.repaired += 1
+            obj = await next_or_none(storage)
+        else:
+            last_matched = entry["filename"]
+            entry = await next_or_none(catalog)
+            obj = await next_or_none(storage)
+
+    result = report.to_dict()
+    logger.info(f"Сверка каталога {user_id}/{provider_name}: {result}")
+    return result
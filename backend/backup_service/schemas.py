@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, List
 from datetime import datetime
 
 class FileUploadResponse(BaseModel):
@@ -19,3 +19,11 @@ class FileInfo(BaseModel):
     provider: str
     uploaded_at: datetime
     user_id: str
+
+class ReconciliationResponse(BaseModel):
+    checked: int
+    orphans: int
+    missing: int
+    duplicates: int
+    repaired: int
+    samples: Dict[str, List[str]]
@@ -0,0 +1,125 @@
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter, Gauge
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import os
+
+from shared.token_bucket import TokenBucket
+
+inflight_bytes = Gauge('transfer_inflight_bytes', 'Байты в активных передачах')
+active_transfers = Gauge('transfer_active', 'Количество активных передач', ['direction'])
+rejected_transfers = Counter('transfer_rejected_total', 'Передачи, отклоненные из-за нехватки бюджета', ['direction'])
+
+class Transfer:
+    def __init__(self, governor: "TransferGovernor", bucket: TokenBucket, direction: str, reserved: int):
+        self.governor = governor
+        self.bucket = bucket
+        self.direction = direction
+        self.reserved = reserved
+        self.released = False
+
+    async def throttle(self, nbytes: int):
+        await self.bucket.consume(nbytes)
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.governor._release(self)
+
+class TransferGovernor:
+    def __init__(self):
+        self.user_bytes_per_sec = int(os.getenv("TRANSFER_USER_BYTES_PER_SEC", str(10 * 1024 * 1024)))
+        self.max_inflight_bytes = int(os.getenv("TRANSFER_MAX_INFLIGHT_BYTES", str(512 * 1024 * 1024)))
+        self.max_concurrent = int(os.getenv("TRANSFER_MAX_CONCURRENT", "32"))
+        self.retry_after = int(os.getenv("TRANSFER_RETRY_AFTER", "5"))
+        self.inflight_bytes = 0
+        self.active = 0
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def _bucket(self, user_id: str, direction: str) -> TokenBucket:
+        key = (user_id, direction)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) > 10000:
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.idle}
+            bucket = TokenBucket(rate=self.user_bytes_per_sec, capacity=self.user_bytes_per_sec)
+            self._buckets[key] = bucket
+        return bucket
+
+    def admit(self, user_id: str, direction: str, size: int) -> Transfer:
+        if self.active >= self.max_concurrent or self.inflight_bytes + size > self.max_inflight_bytes:
+            rejected_transfers.labels(direction=direction).inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Сервер перегружен передачами файлов, повторите попытку позже",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        self.active += 1
+        self.inflight_bytes += size
+        active_transfers.labels(direction=direction).inc()
+        inflight_bytes.set(self.inflight_bytes)
+        return Transfer(self, self._bucket(user_id, direction), direction, size)
+
+    def _release(self, transfer: Transfer):
+        self.active -= 1
+        self.inflight_bytes -= transfer.reserved
+        active_transfers.labels(direction=transfer.direction).dec()
+        inflight_bytes.set(self.inflight_bytes)
+
+transfer_governor = TransferGovernor()
+
+class UploadShapingMiddleware:
+    """Admits uploads on Content-Length and throttles them while the body is received.
+
+    FastAPI reads the whole multipart body before the endpoint or its
+    dependencies run, so this has to happen at the ASGI layer: every body
+    message passes the user's upload bucket before the server reads more from
+    the socket. The transfer is left in `request.state.transfer` and released
+    when the response is done. Requests without a known user are passed
+    through and rejected by the endpoint as before.
+    """
+
+    def __init__(
+        self,
+        app,
+        paths: Iterable[str],
+        identify: Callable[[Request], Optional[str]],
+        max_size: int,
+        governor: TransferGovernor = transfer_governor
+    ):
+        self.app = app
+        self.paths = set(paths)
+        self.identify = identify
+        self.max_size = max_size
+        self.governor = governor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        user_id = self.identify(request)
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+        length = request.headers.get("content-length")
+        reserved = min(int(length) if length and length.isdigit() else self.max_size, self.max_size)
+        try:
+            transfer = self.governor.admit(user_id, "upload", reserved)
+        except HTTPException as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            await response(scope, receive, send)
+            return
+
+        async def throttled_receive():
+            message = await receive()
+            if message["type"] == "http.request" and message.get("body"):
+                await transfer.throttle(len(message["body"]))
+            return message
+
+        request.state.transfer = transfer
+        try:
+            await self.app(scope, throttled_receive, send)
+        finally:
+            transfer.release()
@@ -0,0 +1,56 @@
+"""Per-request auth overhead: raw JWT decoding versus the cached shared path.
+
+    python -m benchmarks.bench_auth --iterations 100000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("GATEWAY_TOKEN", "benchmark-gateway-token")
+
+import jwt
+from starlette.requests import Request
+
+from shared.auth_utils import ALGORITHM, SECRET_KEY, create_access_token, token_cache, verify_token
+from shared.dependencies import GATEWAY_TOKEN, get_current_user
+
+def measure(name: str, func, iterations: int):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<32} {elapsed / iterations * 1e6:8.2f} мкс/запрос")
+
+def main(iterations: int):
+    token = create_access_token({"sub": "benchmark-user", "email": "bench@example.com"})
+
+    try:
+        from jose import jwt as jose_jwt
+        measure("python-jose decode", lambda: jose_jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), iterations)
+    except ImportError:
+        print("python-jose не установлен, базовая линия пропущена")
+
+    measure("PyJWT decode", lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), iterations)
+
+    def uncached():
+        token_cache._entries.clear()
+        verify_token(token)
+
+    measure("verify_token без кеша", uncached, iterations)
+    measure("verify_token из кеша", lambda: verify_token(token), iterations)
+
+    direct = Request({"type": "http", "headers": []})
+    via_gateway = Request({"type": "http", "headers": [
+        (b"x-gateway-token", GATEWAY_TOKEN.encode()), (b"x-user-id", b"benchmark-user")
+    ]})
+    loop = asyncio.new_event_loop()
+    measure("get_current_user из кеша", lambda: loop.run_until_complete(get_current_user(direct, token)), iterations // 10)
+    measure("get_current_user за шлюзом", lambda: loop.run_until_complete(get_current_user(via_gateway, token)), iterations // 10)
+    loop.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000)
+    main(parser.parse_args().iterations)
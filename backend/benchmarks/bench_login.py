@@ -0,0 +1,65 @@
+"""Login throughput and latency under concurrent load.
+
+Run against a live auth_service started with RATE_LIMIT_ENABLED=false:
+
+    python -m benchmarks.bench_login --url http://localhost:8001 --concurrency 50 --requests 1000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+async def ensure_user(client: httpx.AsyncClient, email: str, password: str):
+    response = await client.post("/register", json={
+        "email": email,
+        "username": f"bench_{uuid.uuid4().hex[:8]}",
+        "password": password
+    })
+    if response.status_code not in (201, 400):
+        response.raise_for_status()
+
+async def run(url: str, concurrency: int, total: int):
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    password = "BenchPassw0rd"
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0) as client:
+        await ensure_user(client, email, password)
+        latencies = []
+        statuses = {}
+        queue = asyncio.Queue()
+        for _ in range(total):
+            queue.put_nowait(None)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post("/login", json={"email": email, "password": password})
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(f"запросов: {total}, параллельно: {concurrency}, статусы: {statuses}")
+    print(f"пропускная способность: {total / elapsed:.1f} запросов/с")
+    print(f"p50: {percentile(latencies, 0.50) * 1000:.1f} мс")
+    print(f"p99: {percentile(latencies, 0.99) * 1000:.1f} мс")
+    print(f"среднее: {statistics.mean(latencies) * 1000:.1f} мс")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.concurrency, args.requests))
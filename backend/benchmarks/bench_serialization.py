@@ -0,0 +1,96 @@
+"""Serialization cost per 10,000 rows: FastAPI's default path versus shared.responses.
+
+"before" reproduces what FastAPI does for each endpoint: build the response
+model (or take the plain dict), run serialize_response / jsonable_encoder and
+render with json.dumps. "orjson" and "msgpack" render the same rows through
+FastJSONResponse and MsgPackResponse without constructing models.
+
+    python -m benchmarks.bench_serialization --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from backup_service.schemas import FileListResponse
+from monitor_service.schemas import MetricsHistoryResponse
+from shared.responses import FastJSONResponse, MsgPackResponse
+
+def log_rows(count: int) -> dict:
+    started = datetime(2024, 1, 1)
+    logs = [{
+        "_id": f"65a0c0ffee{index:014x}",
+        "timestamp": started + timedelta(milliseconds=index * 137),
+        "service": "backup_service",
+        "level": "INFO",
+        "message": f"Файл report-{index}.pdf загружен пользователем",
+        "metadata": {"user_id": f"user-{index % 97}", "provider": "s3", "size": index * 1024}
+    } for index in range(count)]
+    return {"logs": logs, "count": count, "next_cursor": None}
+
+def history_rows(count: int) -> dict:
+    started = datetime(2024, 1, 1)
+    points = [{
+        "timestamp": started + timedelta(minutes=index),
+        "operations": index * 11, "uploads": index * 3, "downloads": index * 5, "deletions": index,
+        "upload_failures": index // 50, "download_failures": index // 70, "logins": index * 2,
+        "active_users": 1200 + index // 10, "bytes_uploaded": index * 3 * 2 ** 20,
+        "bytes_downloaded": index * 5 * 2 ** 20,
+        "storage_usage": {"local": index * 2 ** 20, "s3": index * 3 * 2 ** 20, "azure": 0, "gcs": 0}
+    } for index in range(count)]
+    return {"resolution": "metrics_1m", "points": points}
+
+def file_rows(count: int) -> dict:
+    files = [f"backup-{index:06d}.zip" for index in range(count)]
+    return {"files": files, "count": count}
+
+def fastapi_default(model, content: dict):
+    """What the endpoint cost before: model construction, validation, jsonable_encoder and json.dumps"""
+    field = create_response_field(name="response", type_=model, mode="serialization") if model else None
+
+    def run():
+        response_content = model(**content) if model else content
+        encoded = asyncio.run(serialize_response(field=field, response_content=response_content))
+        return JSONResponse(encoded).body
+
+    return run
+
+def measure(func, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(body)
+
+def main(rows: int, repeat: int):
+    scenarios = [
+        ("/logs", None, log_rows(rows)),
+        ("/metrics/history", MetricsHistoryResponse, history_rows(rows)),
+        ("/list", FileListResponse, file_rows(rows)),
+    ]
+    per = 10000 / rows
+    print(f"{'endpoint':<18} {'вариант':<8} {'мс/10k':>9} {'байт':>10} {'ускорение':>10}")
+    for name, model, content in scenarios:
+        variants = [
+            ("before", fastapi_default(model, content)),
+            ("orjson", lambda: FastJSONResponse(content).body),
+            ("msgpack", lambda: MsgPackResponse(content).body),
+        ]
+        baseline = None
+        for variant, func in variants:
+            seconds, size = measure(func, repeat)
+            baseline = baseline or seconds
+            print(f"{name:<18} {variant:<8} {seconds * per * 1000:>9.1f} {size:>10} {baseline / seconds:>9.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
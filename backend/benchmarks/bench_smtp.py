@@ -0,0 +1,73 @@
+"""Email delivery throughput: one SMTP session per message versus the pooled notifier.
+
+Uses aiosmtpd as a local SMTP stand-in, no external server is needed:
+
+    python -m benchmarks.bench_smtp --messages 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("SMTP_HOST", "127.0.0.1")
+os.environ.setdefault("SMTP_PORT", "8025")
+os.environ.setdefault("SMTP_USER", "bench@example.com")
+os.environ.setdefault("SMTP_USE_TLS", "false")
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from alert_service.notifications import EmailNotifier
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+async def send_unpooled(notifier: EmailNotifier, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_one(i: int):
+        async with semaphore:
+            message = notifier.build_message(f"user{i}@example.com", "bench", "<p>bench</p>")
+            await aiosmtplib.send(message, hostname=notifier.smtp_host, port=notifier.smtp_port)
+
+    await asyncio.gather(*(send_one(i) for i in range(total)))
+
+async def send_pooled(notifier: EmailNotifier, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_one(i: int):
+        async with semaphore:
+            return await notifier.send_email(f"user{i}@example.com", "bench", "<p>bench</p>")
+
+    results = await asyncio.gather(*(send_one(i) for i in range(total)))
+    failed = results.count(False)
+    if failed:
+        print(f"  не доставлено: {failed}")
+
+async def main(total: int, concurrency: int):
+    handler = CountingHandler()
+    controller = Controller(handler, hostname=os.environ["SMTP_HOST"], port=int(os.environ["SMTP_PORT"]))
+    controller.start()
+    notifier = EmailNotifier()
+    try:
+        for name, scenario in (("без пула", send_unpooled), ("пул соединений", send_pooled)):
+            received_before = handler.received
+            started = time.perf_counter()
+            await scenario(notifier, total, concurrency)
+            elapsed = time.perf_counter() - started
+            print(f"{name:<16} {total / elapsed:8.1f} писем/с, получено {handler.received - received_before}")
+    finally:
+        await notifier.stop()
+        controller.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.concurrency))
@@ -0,0 +1,83 @@
+"""Cold-start cost of backup_service: import time and resident memory.
+
+Each scenario runs in a fresh interpreter, repeated --runs times (median shown):
+
+- lazy: import backup_service.main only, as a deployment that serves local files;
+- one row per provider: lazy import, then that provider's first load (module + SDK);
+- eager: all providers loaded up front, which is what every start used to pay.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import json, sys, time
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096
+
+started = time.perf_counter()
+import backup_service.main
+from backup_service.cloud_providers import provider_registry
+import_seconds = time.perf_counter() - started
+import_rss = rss()
+started = time.perf_counter()
+provider_registry.prewarm(json.loads(sys.argv[1]))
+print(json.dumps({
+    "import_seconds": import_seconds,
+    "load_seconds": time.perf_counter() - started,
+    "rss": rss(),
+    "import_rss": import_rss,
+    "sdks": sorted(name for name in ("boto3", "azure.storage.blob", "google.cloud.storage") if name in sys.modules)
+}))
+"""
+
+def run_child(providers: list) -> dict:
+    env = {key: value for key, value in os.environ.items() if not key.startswith("OTEL_")}
+    env.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    env.setdefault("SECRET_KEY", "bench-startup-secret-key-0123456789abcdef")
+    child = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps(providers)],
+        cwd=BACKEND, env=env, capture_output=True, text=True
+    )
+    if child.returncode != 0:
+        raise RuntimeError(child.stderr)
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+def measure(providers: list, runs: int) -> dict:
+    samples = [run_child(providers) for _ in range(runs)]
+    return {
+        "seconds": statistics.median(s["import_seconds"] + s["load_seconds"] for s in samples),
+        "rss": statistics.median(s["rss"] for s in samples),
+        "sdks": samples[-1]["sdks"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--providers", default="s3,azure,gcs")
+    args = parser.parse_args()
+    cloud = args.providers.split(",")
+
+    scenarios = [("lazy", [])] + [(name, [name]) for name in cloud] + [("eager", cloud)]
+    results = {name: measure(providers, args.runs) for name, providers in scenarios}
+    lazy = results["lazy"]
+    print(f"{'сценарий':<10} {'старт мс':>9} {'RSS МиБ':>8} {'+мс':>7} {'+МиБ':>6}  SDK")
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['seconds'] * 1000:>9.0f} {result['rss'] / 2 ** 20:>8.1f} "
+            f"{(result['seconds'] - lazy['seconds']) * 1000:>7.0f} {(result['rss'] - lazy['rss']) / 2 ** 20:>6.1f}  "
+            f"{', '.join(result['sdks']) or '-'}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Telegram dispatcher against a local fake of the Bot API.
+
+The fake enforces Telegram's limits (1 msg/s per chat, 30 msg/s overall) and
+answers violations with 429 and parameters.retry_after, so the run shows whether
+the dispatcher paces itself and recovers from throttling:
+
+    python -m benchmarks.bench_telegram --messages 300 --chats 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict, deque
+
+import httpx
+
+from alert_service.telegram_dispatcher import TelegramDispatcher
+
+class FakeBotAPI:
+    def __init__(self, per_chat_interval: float = 1.0, global_per_sec: int = 30, error_rate: float = 0.0):
+        self.per_chat_interval = per_chat_interval
+        self.global_per_sec = global_per_sec
+        self.error_rate = error_rate
+        self.last_by_chat = defaultdict(float)
+        self.recent = deque()
+        self.delivered = 0
+        self.throttled = 0
+
+    def _too_many(self, retry_after: int) -> httpx.Response:
+        self.throttled += 1
+        return httpx.Response(429, json={
+            "ok": False,
+            "error_code": 429,
+            "description": f"Too Many Requests: retry after {retry_after}",
+            "parameters": {"retry_after": retry_after}
+        })
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/sendMessage"):
+            return httpx.Response(404, json={"ok": False, "description": "Not Found"})
+        if random.random() < self.error_rate:
+            return httpx.Response(502, json={"ok": False, "description": "Bad Gateway"})
+
+        chat_id = json.loads(request.content)["chat_id"]
+        now = time.monotonic()
+        while self.recent and now - self.recent[0] > 1.0:
+            self.recent.popleft()
+        if len(self.recent) >= self.global_per_sec:
+            return self._too_many(1)
+        if now - self.last_by_chat[chat_id] < self.per_chat_interval:
+            return self._too_many(1)
+
+        self.last_by_chat[chat_id] = now
+        self.recent.append(now)
+        self.delivered += 1
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": self.delivered}})
+
+async def run(args):
+    fake = FakeBotAPI(error_rate=args.error_rate)
+    dispatcher = TelegramDispatcher(
+        "http://fake-telegram/botTOKEN",
+        per_chat_rate=args.per_chat_rate,
+        global_rate=args.global_rate,
+        transport=httpx.MockTransport(fake.handler)
+    )
+    dispatcher.start()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        dispatcher.send(str(i % args.chats), f"alert {i}") for i in range(args.messages)
+    ))
+    elapsed = time.perf_counter() - started
+    await dispatcher.stop()
+
+    ideal = max(args.messages / args.global_rate, (args.messages / args.chats - 1) / args.per_chat_rate)
+    print(f"Сообщений: {args.messages}, чатов: {args.chats}")
+    print(f"  доставлено: {results.count(True)}, не доставлено: {results.count(False)}")
+    print(f"  ответов 429 от API: {fake.throttled}")
+    print(f"  время: {elapsed:.1f} с (нижняя граница по лимитам: {ideal:.1f} с)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--per-chat-rate", type=float, default=1.0)
+    parser.add_argument("--global-rate", type=float, default=30.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import List, Optional
 from .schemas import ConfigCreate, ConfigUpdate
 from datetime import datetime
 
-async def create_config(db: AsyncIOMotorClient, user_id: str, config: ConfigCreate) -> dict:
+async def create_config(db: AsyncIOMotorClient, user_id: str, config: ConfigCreate) -> Optional[dict]:
     config_dict = config.dict()
     config_dict["user_id"] = user_id
+    config_dict["version"] = 1
     config_dict["created_at"] = datetime.utcnow()
-    config_dict["updated_at"] = datetime.utcnow()
-    result = await db.backup_db.configs.insert_one(config_dict)
+    config_dict["updated_at"] = config_dict["created_at"]
+    try:
+        result = await db.backup_db.configs.insert_one(config_dict)
+    except DuplicateKeyError:
+        return None
     config_dict["_id"] = str(result.inserted_id)
     return config_dict
 
@@ -18,14 +24,24 @@ async def get_config_by_user(db: AsyncIOMotorClient, user_id: str) -> Optional[d
         config["_id"] = str(config["_id"])
     return config
 
-async def update_config(db: AsyncIOMotorClient, user_id: str, config: ConfigUpdate) -> Optional[dict]:
+async def get_configs_by_users(db: AsyncIOMotorClient, user_ids: List[str]) -> List[dict]:
+    configs = await db.backup_db.configs.find({"user_id": {"$in": user_ids}}).to_list(length=len(user_ids))
+    for config in configs:
+        config["_id"] = str(config["_id"])
+    return configs
+
+async def update_config(db: AsyncIOMotorClient, user_id: str, config: ConfigUpdate) -> dict:
     update_data = {k: v for k, v in config.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow()
+    now = datetime.utcnow()
+    update_data["updated_at"] = now
     result = await db.backup_db.configs.find_one_and_update(
         {"user_id": user_id},
-        {"$set": update_data},
-        return_document=True
+        {"$set": update_data, "$inc": {"version": 1}, "$setOnInsert": {"created_at": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
-    if result:
-        result["_id"] = str(result["_id"])
+    result["_id"] = str(result["_id"])
     return result
+
+async def delete_config(db: AsyncIOMotorClient, user_id: str) -> Optional[dict]:
+    return await db.backup_db.configs.find_one_and_delete({"user_id": user_id}, projection={"version": 1})
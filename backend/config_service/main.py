@@ -1,16 +1,18 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-import sys
-
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from shared.database import connect_to_mongo, close_mongo_connection, get_database
-from auth_service.dependencies import get_current_user
-from .schemas import ConfigCreate, ConfigUpdate, ConfigResponse
+from shared.redis_client import connect_to_redis, close_redis_connection
+from shared.config_events import publish_config_change
+from shared.dependencies import get_current_user, verify_internal_token
+from shared.log_handler import install_log_handler
+from shared.instrumentation import instrument_app
+from shared.cache import response_cache, CONFIG_TAG
+from . import crud
+from .schemas import ConfigCreate, ConfigUpdate, ConfigResponse, ConfigBatchRequest, ConfigBatchResponse
 
 app = FastAPI(title="Config Service", version="1.0.0")
+instrument_app(app, "config_service")
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,25 +24,35 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
+    install_log_handler("config_service")
     await connect_to_mongo()
+    await connect_to_redis()
+    db = await get_database()
+    await db.backup_db.configs.create_index("user_id", unique=True)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     await close_mongo_connection()
+    await close_redis_connection()
 
 @app.get("/")
 async def root():
     return {"service": "Config Service", "status": "работает"}
 
+get_cached_config = response_cache.cached("config.get", key=("user_id",), tags=(CONFIG_TAG,))(crud.get_config_by_user)
+
+async def config_changed(user_id: str, version: int, action: str):
+    await response_cache.invalidate(CONFIG_TAG.format(user_id=user_id))
+    await publish_config_change(user_id, version, action)
+
 @app.get("/config", response_model=ConfigResponse)
 async def get_config(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    config = await db.backup_db.configs.find_one({"user_id": current_user["user_id"]})
+    config = await get_cached_config(db, current_user["user_id"])
     if not config:
         raise HTTPException(status_code=404, detail="Конфигурация не найдена")
-    config["_id"] = str(config["_id"])
     return config
 
 @app.post("/config", response_model=ConfigResponse)
@@ -49,14 +61,11 @@ async def create_config(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    existing_config = await db.backup_db.configs.find_one({"user_id": current_user["user_id"]})
-    if existing_config:
+    config = await crud.create_config(db, current_user["user_id"], config_data)
+    if not config:
         raise HTTPException(status_code=400, detail="Конфигурация уже существует. Используйте PUT для обновления")
-    config_dict = config_data.dict()
-    config_dict["user_id"] = current_user["user_id"]
-    result = await db.backup_db.configs.insert_one(config_dict)
-    config_dict["_id"] = str(result.inserted_id)
-    return config_dict
+    await config_changed(current_user["user_id"], config["version"], "create")
+    return config
 
 @app.put("/config", response_model=ConfigResponse)
 async def update_config(
@@ -64,32 +73,34 @@ async def update_config(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    existing_config = await db.backup_db.configs.find_one({"user_id": current_user["user_id"]})
-    if not existing_config:
-        config_dict = config_data.dict()
-        config_dict["user_id"] = current_user["user_id"]
-        result = await db.backup_db.configs.insert_one(config_dict)
-        config_dict["_id"] = str(result.inserted_id)
-        return config_dict
-    update_data = {k: v for k, v in config_data.dict().items() if v is not None}
-    await db.backup_db.configs.update_one(
-        {"user_id": current_user["user_id"]},
-        {"$set": update_data}
-    )
-    updated_config = await db.backup_db.configs.find_one({"user_id": current_user["user_id"]})
-    updated_config["_id"] = str(updated_config["_id"])
-    return updated_config
+    config = await crud.update_config(db, current_user["user_id"], config_data)
+    await config_changed(current_user["user_id"], config["version"], "update")
+    return config
 
 @app.delete("/config")
 async def delete_config(
     current_user: dict = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    result = await db.backup_db.configs.delete_one({"user_id": current_user["user_id"]})
-    if result.deleted_count == 0:
+    deleted = await crud.delete_config(db, current_user["user_id"])
+    if not deleted:
         raise HTTPException(status_code=404, detail="Конфигурация не найдена")
+    await config_changed(current_user["user_id"], deleted.get("version", 0) + 1, "delete")
     return {"message": "Конфигурация успешно удалена"}
 
+@app.post("/configs/batch", response_model=ConfigBatchResponse, dependencies=[Depends(verify_internal_token)])
+async def get_configs_batch(
+    request: ConfigBatchRequest,
+    db = Depends(get_database)
+):
+    user_ids = list(dict.fromkeys(request.user_ids))
+    configs = await crud.get_configs_by_users(db, user_ids)
+    found = {config["user_id"] for config in configs}
+    return ConfigBatchResponse(
+        configs=configs,
+        missing=[user_id for user_id in user_ids if user_id not in found]
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8003)
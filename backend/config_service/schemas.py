@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional
 
 class ConfigBase(BaseModel):
     default_provider: str = "local"
@@ -34,6 +34,14 @@ class ConfigUpdate(ConfigBase):
 
 class ConfigResponse(ConfigBase):
     user_id: str
+    version: int = 0
     
     class Config:
         from_attributes = True
+
+class ConfigBatchRequest(BaseModel):
+    user_ids: List[str] = Field(..., max_length=1000)
+
+class ConfigBatchResponse(BaseModel):
+    configs: List[ConfigResponse]
+    missing: List[str]
@@ -0,0 +1,77 @@
+from collections import OrderedDict
+from prometheus_client import Counter
+from typing import List, Optional, Tuple
+import os
+import time
+
+edge_cache_requests = Counter('gateway_cache_requests_total', 'Обращения к кешу шлюза', ['result'])
+
+CACHE_TTL = float(os.getenv("GATEWAY_CACHE_TTL", "5"))
+CACHE_SIZE = int(os.getenv("GATEWAY_CACHE_SIZE", "1000"))
+CACHE_MAX_BODY = int(os.getenv("GATEWAY_CACHE_MAX_BODY", str(256 * 1024)))
+
+CACHEABLE_TYPES = ("application/json",)
+
+class CachedResponse:
+    def __init__(self, status_code: int, headers: List[Tuple[str, str]], body: bytes, expires_at: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+
+class EdgeCache:
+    """Short-lived LRU of upstream GET responses, keyed per user.
+
+    Entries belong to (user, upstream); any successful write by that user to
+    that upstream drops them, so a user always sees their own changes.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, max_size: int = CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    @staticmethod
+    def key(user_id: str, upstream: str, path: str, query: str, accept: str) -> tuple:
+        return (user_id, upstream, path, query, accept)
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            edge_cache_requests.labels(result="miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        edge_cache_requests.labels(result="hit").inc()
+        return entry
+
+    @staticmethod
+    def storable(status_code: int, headers: dict) -> bool:
+        if status_code != 200:
+            return False
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or "private" in cache_control:
+            return False
+        length = headers.get("content-length")
+        return (
+            length is not None and int(length) <= CACHE_MAX_BODY
+            and headers.get("content-type", "").split(";")[0].strip() in CACHEABLE_TYPES
+        )
+
+    def put(self, key: tuple, status_code: int, headers: List[Tuple[str, str]], body: bytes):
+        self._entries[key] = CachedResponse(status_code, headers, body, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str, upstream: str):
+        stale = [key for key in self._entries if key[0] == user_id and key[1] == upstream]
+        for key in stale:
+            del self._entries[key]
+
+edge_cache = EdgeCache()
@@ -0,0 +1,204 @@
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import Histogram
+from starlette.background import BackgroundTask
+from typing import AsyncIterator, List, Optional, Tuple
+import gzip
+import os
+import time
+import zlib
+import httpx
+
+from shared.auth_utils import verify_token
+from shared.dependencies import GATEWAY_TOKEN
+from shared.log_handler import install_log_handler
+from shared.instrumentation import instrument_app
+from shared.tracing import set_attributes
+from .edge_cache import edge_cache
+from .upstreams import upstream_pool
+
+COMPRESS_MIN_SIZE = int(os.getenv("GATEWAY_COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.getenv("GATEWAY_COMPRESS_LEVEL", "6"))
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/javascript", "application/xml", "text/"
+)
+
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade"
+}
+# Never accepted from clients: identity is asserted by the gateway itself
+IDENTITY_HEADERS = {"x-gateway-token", "x-internal-token", "x-user-id", "x-user-email", "x-user-superuser"}
+DROPPED_REQUEST_HEADERS = HOP_BY_HOP | IDENTITY_HEADERS | {"host", "accept-encoding"}
+DROPPED_RESPONSE_HEADERS = HOP_BY_HOP | {"content-length"}
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+upstream_duration = Histogram(
+    'gateway_upstream_duration_seconds', 'Время до заголовков ответа вышестоящего сервиса', ['upstream', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+app = FastAPI(title="API Gateway", version="1.0.0")
+instrument_app(app, "gateway_service")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.on_event("startup")
+async def startup_event():
+    install_log_handler("gateway_service")
+    upstream_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await upstream_pool.stop()
+
+@app.get("/")
+async def root():
+    return {"service": "API Gateway", "status": "running", "routes": sorted(upstream_pool.upstreams)}
+
+@app.get("/health")
+async def health_check():
+    return {"status": "здоровый", "service": "gateway_service"}
+
+def authenticate(request: Request) -> Optional[dict]:
+    """Verify the bearer token once at the edge.
+
+    An invalid token is not rejected here: the request goes on without
+    identity headers and the upstream answers exactly as it would directly.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = verify_token(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+    return payload
+
+def forward_headers(request: Request, service: str, identity: Optional[dict]) -> List[Tuple[str, str]]:
+    headers = [
+        (name, value) for name, value in request.headers.items()
+        if name not in DROPPED_REQUEST_HEADERS and not name.startswith("x-forwarded-")
+    ]
+    client_host = request.client.host if request.client else ""
+    forwarded_for = request.headers.get("x-forwarded-for")
+    headers += [
+        ("x-forwarded-for", f"{forwarded_for}, {client_host}" if forwarded_for else client_host),
+        ("x-forwarded-proto", request.url.scheme),
+        ("x-forwarded-prefix", f"/{service}"),
+    ]
+    if not GATEWAY_TOKEN:
+        return headers
+    # Sent on every request so upstreams trust X-Forwarded-For, also for anonymous callers
+    headers.append(("x-gateway-token", GATEWAY_TOKEN))
+    if identity is not None:
+        headers += [
+            ("x-user-id", str(identity["sub"])),
+            ("x-user-email", str(identity.get("email") or "")),
+            ("x-user-superuser", "1" if identity.get("is_superuser") else "0"),
+        ]
+    return headers
+
+def response_headers(upstream: httpx.Response) -> List[Tuple[str, str]]:
+    return [
+        (name, value) for name, value in upstream.headers.multi_items()
+        if name not in DROPPED_RESPONSE_HEADERS and not name.startswith("access-control-")
+    ]
+
+def should_compress(request: Request, headers: List[Tuple[str, str]], length: Optional[int]) -> bool:
+    if "gzip" not in request.headers.get("accept-encoding", "").lower():
+        return False
+    if any(name == "content-encoding" for name, _ in headers):
+        return False
+    if length is not None and length < COMPRESS_MIN_SIZE:
+        return False
+    content_type = next((value for name, value in headers if name == "content-type"), "")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+def raw_headers(headers: List[Tuple[str, str]], compressed: bool, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+    if compressed:
+        headers = headers + [("content-encoding", "gzip"), ("vary", "Accept-Encoding")]
+    if length is not None:
+        headers = headers + [("content-length", str(length))]
+    return [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+def buffered_response(request: Request, status_code: int, headers: List[Tuple[str, str]], body: bytes) -> Response:
+    compressed = should_compress(request, headers, len(body))
+    if compressed:
+        body = gzip.compress(body, compresslevel=COMPRESS_LEVEL)
+    response = Response(content=body, status_code=status_code)
+    response.raw_headers = raw_headers(headers, compressed, len(body))
+    return response
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.api_route("/{service}/{path:path}", methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+async def proxy(service: str, path: str, request: Request):
+    client = upstream_pool.get(service)
+    if client is None:
+        raise HTTPException(status_code=404, detail="Сервис не найден")
+    identity = authenticate(request)
+    user_id = str(identity["sub"]) if identity else ""
+    set_attributes({"gateway.upstream": service, "enduser.id": user_id or None})
+
+    query = request.url.query
+    cache_key = None
+    if request.method == "GET" and edge_cache.enabled:
+        cache_key = edge_cache.key(user_id, service, path, query, request.headers.get("accept", ""))
+        cached = edge_cache.get(cache_key)
+        if cached is not None:
+            response = buffered_response(request, cached.status_code, cached.headers, cached.body)
+            response.headers["x-cache"] = "HIT"
+            return response
+
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    upstream_request = client.build_request(
+        request.method,
+        httpx.URL(path="/" + path, query=query.encode("latin-1")),
+        headers=forward_headers(request, service, identity),
+        content=request.stream() if has_body else None
+    )
+    started = time.perf_counter()
+    try:
+        upstream = await client.send(upstream_request, stream=True)
+    except httpx.TimeoutException:
+        upstream_duration.labels(upstream=service, status="timeout").observe(time.perf_counter() - started)
+        raise HTTPException(status_code=504, detail="Сервис не ответил вовремя")
+    except httpx.TransportError:
+        upstream_duration.labels(upstream=service, status="error").observe(time.perf_counter() - started)
+        raise HTTPException(status_code=502, detail="Сервис недоступен")
+    upstream_duration.labels(upstream=service, status=str(upstream.status_code)).observe(time.perf_counter() - started)
+
+    if request.method not in SAFE_METHODS and upstream.status_code < 400 and user_id:
+        edge_cache.invalidate(user_id, service)
+
+    headers = response_headers(upstream)
+    if cache_key is not None and edge_cache.storable(upstream.status_code, upstream.headers):
+        try:
+            body = await upstream.aread()
+        finally:
+            await upstream.aclose()
+        edge_cache.put(cache_key, upstream.status_code, headers, body)
+        response = buffered_response(request, upstream.status_code, headers, body)
+        response.headers["x-cache"] = "MISS"
+        return response
+
+    length = upstream.headers.get("content-length")
+    length = int(length) if length is not None else None
+    compressed = should_compress(request, headers, length)
+    body = gzip_stream(upstream.aiter_raw()) if compressed else upstream.aiter_raw()
+    response = StreamingResponse(body, status_code=upstream.status_code, background=BackgroundTask(upstream.aclose))
+    response.raw_headers = raw_headers(headers, compressed, None if compressed else length)
+    return response
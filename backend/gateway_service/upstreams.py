@@ -0,0 +1,49 @@
+from typing import Dict, Optional
+import httpx
+import os
+
+UPSTREAMS = {
+    "auth": os.getenv("AUTH_SERVICE_URL", "http://auth_service:8001"),
+    "backup": os.getenv("BACKUP_SERVICE_URL", "http://backup_service:8002"),
+    "config": os.getenv("CONFIG_SERVICE_URL", "http://config_service:8003"),
+    "alert": os.getenv("ALERT_SERVICE_URL", "http://alert_service:8004"),
+    "monitor": os.getenv("MONITOR_SERVICE_URL", "http://monitor_service:8005"),
+}
+
+MAX_CONNECTIONS = int(os.getenv("GATEWAY_UPSTREAM_MAX_CONNECTIONS", "200"))
+MAX_KEEPALIVE = int(os.getenv("GATEWAY_UPSTREAM_MAX_KEEPALIVE", "50"))
+KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+# Large transfers stream through, so the read timeout is per chunk rather than per request
+READ_TIMEOUT = float(os.getenv("GATEWAY_UPSTREAM_READ_TIMEOUT", "300"))
+# uvicorn speaks HTTP/1.1 only; enable for upstreams behind an h2c-capable server (needs the h2 package)
+UPSTREAM_HTTP2 = os.getenv("GATEWAY_UPSTREAM_HTTP2", "false").lower() == "true"
+
+class UpstreamPool:
+    """One pooled keep-alive client per upstream service, shared by all requests"""
+
+    def __init__(self, upstreams: Dict[str, str]):
+        self.upstreams = upstreams
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def start(self):
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        )
+        timeout = httpx.Timeout(connect=5.0, read=READ_TIMEOUT, write=READ_TIMEOUT, pool=10.0)
+        for name, url in self.upstreams.items():
+            if name not in self._clients:
+                self._clients[name] = httpx.AsyncClient(
+                    base_url=url, limits=limits, timeout=timeout, http2=UPSTREAM_HTTP2, follow_redirects=False
+                )
+
+    def get(self, name: str) -> Optional[httpx.AsyncClient]:
+        return self._clients.get(name)
+
+    async def stop(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+upstream_pool = UpstreamPool(UPSTREAMS)
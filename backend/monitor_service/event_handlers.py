@@ -0,0 +1,23 @@
+from shared.event_bus import (
+    Event, EventConsumer, BACKUP_EVENTS, AUTH_EVENTS, FILE_UPLOADED, FILE_DOWNLOADED, FILE_DELETED, FILE_FAILED
+)
+from .metrics import metrics_collector
+from .rollups import record_event
+
+async def handle_backup_event(event: Event):
+    provider = event.payload.get("provider", "unknown")
+    if event.type == FILE_UPLOADED:
+        metrics_collector.record_upload(provider, True)
+    elif event.type == FILE_DOWNLOADED:
+        metrics_collector.record_download(provider, True)
+    elif event.type == FILE_DELETED:
+        metrics_collector.record_deletion(provider)
+    elif event.type == FILE_FAILED:
+        if event.payload.get("operation") == "upload":
+            metrics_collector.record_upload(provider, False)
+        elif event.payload.get("operation") == "download":
+            metrics_collector.record_download(provider, False)
+    await record_event(event)
+
+backup_events_consumer = EventConsumer(BACKUP_EVENTS, "monitor_service", handle_backup_event)
+auth_events_consumer = EventConsumer(AUTH_EVENTS, "monitor_service", record_event)
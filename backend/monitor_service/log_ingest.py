@@ -0,0 +1,142 @@
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo.errors import BulkWriteError, CollectionInvalid
+from typing import List, Optional
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+LOG_COLLECTION = os.getenv("LOG_COLLECTION", "log_entries")
+LOG_RETENTION_SECONDS = int(os.getenv("LOG_RETENTION_DAYS", "30")) * 86400
+
+# Time-series collections cannot carry text indexes, so searchable copies of
+# log entries live in a regular collection with the same _id and its own TTL.
+LOG_SEARCH_COLLECTION = os.getenv("LOG_SEARCH_COLLECTION", "log_search")
+LOG_SEARCH_ENABLED = os.getenv("LOG_SEARCH_ENABLED", "true").lower() == "true"
+
+logs_ingested = Counter('logs_ingested_total', 'Логи, записанные в хранилище')
+logs_dropped = Counter('logs_dropped_total', 'Логи, потерянные при записи', ['reason'])
+buffer_size = Gauge('log_ingest_buffer_size', 'Логи в буфере, ожидающие записи')
+flush_duration = Histogram('log_flush_duration_seconds', 'Время записи пачки логов')
+
+def to_document(entry: dict) -> dict:
+    """Time-series layout: service and level go to the meta field that buckets are grouped by"""
+    return {
+        "timestamp": entry["timestamp"],
+        "meta": {"service": entry["service"], "level": entry["level"].upper()},
+        "message": entry["message"],
+        "metadata": entry.get("metadata") or {}
+    }
+
+def from_document(document: dict) -> dict:
+    return {
+        "_id": str(document["_id"]),
+        "timestamp": document["timestamp"],
+        "service": document["meta"]["service"],
+        "level": document["meta"]["level"],
+        "message": document["message"],
+        "metadata": document.get("metadata") or None
+    }
+
+async def ensure_log_collection(db):
+    database = db.backup_db
+    try:
+        await database.create_collection(
+            LOG_COLLECTION,
+            timeseries={"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"},
+            expireAfterSeconds=LOG_RETENTION_SECONDS
+        )
+    except CollectionInvalid:
+        await database.command("collMod", LOG_COLLECTION, expireAfterSeconds=LOG_RETENTION_SECONDS)
+
+class LogIngestBuffer:
+    """Collects log documents and writes them with insert_many when the batch is full or the interval passes"""
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("LOG_FLUSH_BATCH", "1000"))
+        self.flush_interval = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+        self.max_buffer = int(os.getenv("LOG_MAX_BUFFER", "100000"))
+        self.retry_after = int(os.getenv("LOG_RETRY_AFTER", "2"))
+        self._buffer: List[dict] = []
+        self._collection = None
+        self._search_collection = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, entries: List[dict]):
+        if len(self._buffer) + len(entries) > self.max_buffer:
+            logs_dropped.labels(reason="buffer_full").inc(len(entries))
+            raise HTTPException(
+                status_code=503,
+                detail="Буфер логов переполнен, повторите попытку позже",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        self._buffer.extend(to_document(entry) for entry in entries)
+        buffer_size.set(len(self._buffer))
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self):
+        while self._buffer:
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:self.batch_size]
+            buffer_size.set(len(self._buffer))
+            started = time.perf_counter()
+            try:
+                await self._collection.insert_many(batch, ordered=False)
+                logs_ingested.inc(len(batch))
+                await self._index_for_search(batch)
+            except BulkWriteError as e:
+                written = e.details.get("nInserted", 0)
+                logs_ingested.inc(written)
+                logs_dropped.labels(reason="write_error").inc(len(batch) - written)
+                logger.error(f"Ошибка записи логов: {len(batch) - written} из {len(batch)} не записаны")
+            except Exception as e:
+                if len(self._buffer) + len(batch) <= self.max_buffer:
+                    self._buffer[:0] = batch
+                else:
+                    logs_dropped.labels(reason="unavailable").inc(len(batch))
+                buffer_size.set(len(self._buffer))
+                logger.error(f"Хранилище логов недоступно: {e}")
+                return
+            finally:
+                flush_duration.observe(time.perf_counter() - started)
+
+    async def _index_for_search(self, batch: List[dict]):
+        if self._search_collection is None:
+            return
+        try:
+            await self._search_collection.insert_many(batch, ordered=False)
+        except Exception as e:
+            logger.error(f"Ошибка индексации логов для поиска: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка сброса буфера логов: {e}")
+
+    def start(self, db):
+        if self._task is None:
+            self._collection = db.backup_db[LOG_COLLECTION]
+            if LOG_SEARCH_ENABLED:
+                self._search_collection = db.backup_db[LOG_SEARCH_COLLECTION]
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+            await self.flush()
+
+log_buffer = LogIngestBuffer()
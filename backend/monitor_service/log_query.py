@@ -0,0 +1,93 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+import base64
+
+from .log_ingest import LOG_COLLECTION, LOG_RETENTION_SECONDS, LOG_SEARCH_COLLECTION, LOG_SEARCH_ENABLED
+
+# Time-series collections can only stream in timeField order, so there is no
+# index-backed tie-break: pages end on a whole timestamp instead (see page_ties).
+LOG_SORT = [("timestamp", -1)]
+
+LOG_INDEXES = [
+    [("meta.service", 1), ("meta.level", 1), ("timestamp", -1)],
+    [("meta.level", 1), ("timestamp", -1)],
+    [("timestamp", -1)],
+]
+
+def encode_cursor(document: dict) -> str:
+    return base64.urlsafe_b64encode(document["timestamp"].isoformat().encode()).decode()
+
+def decode_cursor(cursor: str) -> datetime:
+    try:
+        # cursors issued before the tie-break was dropped carry "|<_id>"
+        timestamp = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")[0]
+        return datetime.fromisoformat(timestamp)
+    except ValueError:
+        raise ValueError("Некорректный курсор")
+
+def parse_metadata_filters(filters: List[str]) -> Dict[str, object]:
+    parsed = {}
+    for item in filters:
+        key, sep, value = item.partition(":")
+        if not sep or not key or "$" in key:
+            raise ValueError(f"Фильтр метаданных должен иметь вид ключ:значение: {item}")
+        parsed[f"metadata.{key}"] = {"$in": [value, int(value)]} if value.lstrip("-").isdigit() else value
+    return parsed
+
+def build_log_query(
+    service: Optional[str] = None,
+    levels: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    metadata: Optional[Dict[str, object]] = None,
+    search: Optional[str] = None,
+    after: Optional[datetime] = None
+) -> dict:
+    query: dict = {}
+    if service:
+        query["meta.service"] = service
+    if levels:
+        query["meta.level"] = levels[0] if len(levels) == 1 else {"$in": levels}
+    if after:
+        until = min(until, after) if until else after
+    if since or until:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if until:
+            query["timestamp"]["$lt"] = until
+    if metadata:
+        query.update(metadata)
+    if search:
+        query["$text"] = {"$search": search}
+    return query
+
+def tie_query(query: dict, timestamp: datetime) -> dict:
+    """Entries matching `query` at exactly `timestamp`, an equality lookup on the timestamp indexes"""
+    tie = {key: value for key, value in query.items() if key != "timestamp"}
+    tie["timestamp"] = timestamp
+    return tie
+
+async def page_ties(collection, query: dict, page: List[dict]) -> List[dict]:
+    """Entries sharing the last timestamp of a full page that the page did not include.
+
+    The next page starts strictly before that timestamp, so a page is always
+    extended to the end of its last timestamp instead of splitting it.
+    """
+    boundary = page[-1]["timestamp"]
+    seen = {document["_id"] for document in page if document["timestamp"] == boundary}
+    ties = await collection.find(tie_query(query, boundary)).to_list(length=None)
+    return [document for document in ties if document["_id"] not in seen]
+
+def log_collection(db, search: bool = False):
+    return db.backup_db[LOG_SEARCH_COLLECTION if search else LOG_COLLECTION]
+
+async def ensure_log_indexes(db):
+    logs = db.backup_db[LOG_COLLECTION]
+    for keys in LOG_INDEXES:
+        await logs.create_index(keys)
+    if LOG_SEARCH_ENABLED:
+        search = db.backup_db[LOG_SEARCH_COLLECTION]
+        await search.create_index([("message", "text"), ("timestamp", -1)])
+        await search.create_index([("timestamp", -1), ("_id", -1)])
+        await search.create_index("timestamp", expireAfterSeconds=LOG_RETENTION_SECONDS)
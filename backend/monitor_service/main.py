@@ -1,17 +1,33 @@
-from fastapi import FastAPI, HTTPException, Depends, Response
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
-import time
-import sys
+from typing import List, Optional
+from pydantic import ValidationError
+import json
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import time
 
 from shared.database import connect_to_mongo, close_mongo_connection, get_database
-from auth_service.dependencies import get_current_user
-from .metrics import metrics_collector, get_metrics
-from .schemas import HealthCheck, LogEntry, MetricsSnapshot
+from shared.redis_client import connect_to_redis, close_redis_connection
+from shared.dependencies import get_current_user, verify_internal_token
+from shared.event_bus import replay, dead_letter_stream, BACKUP_EVENTS
+from shared.instrumentation import instrument_app
+from shared.responses import dumps, negotiate
+from .event_handlers import backup_events_consumer, auth_events_consumer
+from .rollups import (
+    rollup_job, read_totals, split_totals, read_history, pick_resolution, bootstrap_totals,
+    ensure_rollup_collections, as_naive_utc
+)
+from .log_ingest import log_buffer, ensure_log_collection, from_document, LOG_SEARCH_ENABLED
+from .log_query import (
+    build_log_query, parse_metadata_filters, decode_cursor, encode_cursor, log_collection,
+    ensure_log_indexes, page_ties, LOG_SORT
+)
+from .schemas import HealthCheck, LogEntry, LogBulkResponse, MetricsSnapshot, MetricsHistoryResponse
 
 app = FastAPI(title="Monitor Service", version="1.0.0")
+instrument_app(app, "monitor_service")
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,13 +39,32 @@ app.add_middleware(
 
 start_time = time.time()
 
+LOG_BULK_MAX_ENTRIES = int(os.getenv("LOG_BULK_MAX_ENTRIES", "10000"))
+LOG_PAGE_MAX = 1000
+LOG_EXPORT_MAX = int(os.getenv("LOG_EXPORT_MAX", "1000000"))
+
 @app.on_event("startup")
 async def startup_event():
     await connect_to_mongo()
+    await connect_to_redis()
+    db = await get_database()
+    await ensure_log_collection(db)
+    await ensure_log_indexes(db)
+    log_buffer.start(db)
+    await ensure_rollup_collections(db)
+    await bootstrap_totals(db)
+    backup_events_consumer.start()
+    auth_events_consumer.start()
+    rollup_job.start(db)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await rollup_job.stop()
+    await auth_events_consumer.stop()
+    await backup_events_consumer.stop()
+    await log_buffer.stop()
     await close_mongo_connection()
+    await close_redis_connection()
 
 @app.get("/")
 async def root():
@@ -44,49 +79,125 @@ async def health_check():
         timestamp=datetime.utcnow()
     )
 
-@app.get("/metrics")
-async def prometheus_metrics():
-    return Response(content=get_metrics(), media_type="text/plain")
-
 @app.post("/logs", status_code=201)
-async def create_log(
-    log: LogEntry,
-    db = Depends(get_database)
-):
-    log_dict = log.dict()
-    await db.backup_db.logs.insert_one(log_dict)
+async def create_log(log: LogEntry):
+    log_buffer.add([log.model_dump()])
     return {"message": "Лог успешно создан"}
 
+def parse_log_batch(body: bytes, content_type: str) -> list:
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [line for line in body.decode().splitlines() if line.strip()]
+    items = json.loads(body)
+    if not isinstance(items, list):
+        raise ValueError("Ожидается JSON массив или NDJSON")
+    return items
+
+@app.post("/logs/bulk", response_model=LogBulkResponse, status_code=202, dependencies=[Depends(verify_internal_token)])
+async def create_logs_bulk(request: Request):
+    try:
+        items = parse_log_batch(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Некорректное тело запроса: {e}")
+    if len(items) > LOG_BULK_MAX_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"Не более {LOG_BULK_MAX_ENTRIES} записей за запрос")
+
+    entries, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, str):
+                entries.append(LogEntry.model_validate_json(item).model_dump())
+            else:
+                entries.append(LogEntry.model_validate(item).model_dump())
+        except ValidationError as e:
+            if len(errors) < 10:
+                errors.append(f"{index}: {e.errors()[0]['msg']}")
+    log_buffer.add(entries)
+    return LogBulkResponse(accepted=len(entries), rejected=len(items) - len(entries), errors=errors)
+
 @app.get("/logs")
 async def get_logs(
-    limit: int = 100,
-    service: str = None,
+    request: Request,
+    limit: int = Query(100, ge=1, le=LOG_PAGE_MAX),
+    service: Optional[str] = None,
+    level: Optional[str] = Query(None, description="Один или несколько уровней через запятую"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = Query(None, description="Полнотекстовый поиск по сообщению"),
+    metadata: List[str] = Query([], description="Фильтры по метаданным вида ключ:значение"),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     current_user: dict = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    query = {}
-    if service:
-        query["service"] = service
-    logs = await db.backup_db.logs.find(query).sort("timestamp", -1).limit(limit).to_list(length=limit)
-    for log in logs:
-        log["_id"] = str(log["_id"])
-    return {"logs": logs, "count": len(logs)}
+    if q and not LOG_SEARCH_ENABLED:
+        raise HTTPException(status_code=400, detail="Полнотекстовый поиск отключен")
+    try:
+        query = build_log_query(
+            service=service,
+            levels=[l.strip().upper() for l in level.split(",") if l.strip()] if level else None,
+            since=since,
+            until=until,
+            metadata=parse_metadata_filters(metadata),
+            search=q,
+            after=decode_cursor(cursor) if cursor else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    collection = log_collection(db, search=bool(q))
+    if format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", ""):
+        documents = collection.find(query).sort(LOG_SORT).limit(LOG_EXPORT_MAX).batch_size(1000)
+
+        async def export():
+            async for document in documents:
+                yield dumps(from_document(document)) + b"\n"
+
+        return StreamingResponse(export(), media_type="application/x-ndjson")
+
+    documents = await collection.find(query).sort(LOG_SORT).limit(limit).to_list(length=limit)
+    next_cursor = None
+    if len(documents) == limit:
+        documents += await page_ties(collection, query, documents)
+        next_cursor = encode_cursor(documents[-1])
+    logs = [from_document(document) for document in documents]
+    return negotiate(request, {"logs": logs, "count": len(logs), "next_cursor": next_cursor})
 
 @app.get("/metrics/snapshot", response_model=MetricsSnapshot)
-async def get_metrics_snapshot(
+async def get_metrics_snapshot(request: Request, current_user: dict = Depends(get_current_user)):
+    totals = split_totals(await read_totals())
+    return negotiate(request, {
+        "total_operations": totals["operations"],
+        "active_users": totals["active_users"],
+        "total_uploads": totals["uploads"],
+        "total_downloads": totals["downloads"],
+        "storage_usage": totals["storage_usage"],
+        "timestamp": datetime.utcnow()
+    })
+
+@app.get("/metrics/history", response_model=MetricsHistoryResponse)
+async def get_metrics_history(
+    request: Request,
+    since: datetime,
+    until: Optional[datetime] = None,
+    resolution: Optional[str] = Query(None, pattern="^metrics_1[mhd]$"),
     current_user: dict = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    total_uploads = await db.backup_db.files.count_documents({})
-    active_users_count = await db.backup_db.users.count_documents({"is_active": True})
-    return MetricsSnapshot(
-        total_requests=0,
-        active_users=active_users_count,
-        total_uploads=total_uploads,
-        total_downloads=0,
-        storage_usage={"s3": 0, "azure": 0, "gcs": 0},
-        timestamp=datetime.utcnow()
-    )
+    since = as_naive_utc(since)
+    until = as_naive_utc(until) if until else datetime.utcnow()
+    if since >= until:
+        raise HTTPException(status_code=400, detail="Начало интервала должно быть раньше конца")
+    resolution = resolution or pick_resolution(since, until)
+    points = await read_history(db, since, until, resolution)
+    return negotiate(request, {"resolution": resolution, "points": points})
+
+@app.get("/events/dead-letters", dependencies=[Depends(verify_internal_token)])
+async def get_dead_letters(limit: int = 100):
+    events = await replay(dead_letter_stream(BACKUP_EVENTS), count=limit)
+    return {
+        "events": [{"id": e.id, "type": e.type, "payload": e.payload, "published_at": e.published_at} for e in events],
+        "count": len(events)
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import CollectionInvalid
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+
+from shared.redis_client import redis_client
+from shared.event_bus import (
+    Event, FILE_UPLOADED, FILE_DOWNLOADED, FILE_DELETED, FILE_FAILED, FILE_TIERED, USER_REGISTERED, USER_LOGGED_IN
+)
+
+logger = logging.getLogger(__name__)
+
+TOTALS_KEY = "metrics:totals"
+STORAGE_PREFIX = "storage:"
+LOCK_PREFIX = "metrics:rollup:lock:"
+SEEN_PREFIX = "metrics:seen:"
+
+# "operations" counts user actions seen on the event streams, not HTTP requests
+COUNTERS = [
+    "operations", "uploads", "downloads", "deletions", "upload_failures", "download_failures",
+    "logins", "active_users", "bytes_uploaded", "bytes_downloaded"
+]
+
+ROLLUP_INTERVAL = int(os.getenv("METRICS_ROLLUP_INTERVAL", "60"))
+# How long a delivered event id is remembered; redeliveries within it are not counted again
+EVENT_DEDUP_TTL = int(os.getenv("METRICS_EVENT_DEDUP_TTL", "86400"))
+
+# Marks the event as seen and applies its increments in one step, only on the first delivery
+RECORD_EVENT_SCRIPT = """
+if not redis.call('SET', KEYS[2], 1, 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+# (collection, bucket seconds, $dateTrunc unit, retention seconds or None to keep forever)
+RESOLUTIONS = [
+    ("metrics_1m", 60, "minute", 86400),
+    ("metrics_1h", 3600, "hour", 31 * 86400),
+    ("metrics_1d", 86400, "day", None),
+]
+
+def storage_key(payload: dict, field: str = "storage_provider") -> str:
+    """Storage counter of where the bytes live; events published before storage_provider fall back to provider"""
+    return STORAGE_PREFIX + (payload.get(field) or payload.get("storage_provider") or payload.get("provider") or "unknown")
+
+def event_increments(event: Event) -> Dict[str, int]:
+    payload = event.payload
+    size = int(payload.get("size") or 0)
+    if event.type == FILE_UPLOADED:
+        counters = {"operations": 1, "uploads": 1, "bytes_uploaded": size, storage_key(payload): size}
+        # the replaced version may have been tiered to another provider
+        replaced = storage_key(payload, "previous_storage_provider")
+        counters[replaced] = counters.get(replaced, 0) - int(payload.get("previous_size") or 0)
+        return counters
+    if event.type == FILE_DOWNLOADED:
+        return {"operations": 1, "downloads": 1, "bytes_downloaded": size}
+    if event.type == FILE_DELETED:
+        return {"operations": 1, "deletions": 1, storage_key(payload): -size}
+    if event.type == FILE_TIERED:
+        return {storage_key(payload, "previous_storage_provider"): -size, storage_key(payload): size}
+    if event.type == FILE_FAILED:
+        operation = payload.get("operation")
+        counters = {"operations": 1}
+        if operation in ("upload", "download"):
+            counters[f"{operation}_failures"] = 1
+        return counters
+    if event.type == USER_LOGGED_IN:
+        return {"operations": 1, "logins": 1}
+    if event.type == USER_REGISTERED:
+        return {"operations": 1, "active_users": 1}
+    return {}
+
+_record_script = None
+
+async def record_event(event: Event):
+    """Apply an event to the totals once, however often the stream delivers it"""
+    global _record_script
+    increments = event_increments(event)
+    if not increments:
+        return
+    if _record_script is None:
+        _record_script = redis_client.pool.register_script(RECORD_EVENT_SCRIPT)
+    args = [EVENT_DEDUP_TTL]
+    for field, amount in increments.items():
+        if amount:
+            args += [field, amount]
+    # entry ids are per stream, the event type tells the streams apart
+    seen_key = f"{SEEN_PREFIX}{event.type}:{event.id}"
+    await _record_script(keys=[TOTALS_KEY, seen_key], args=args)
+
+async def read_totals() -> Dict[str, int]:
+    raw = await redis_client.pool.hgetall(TOTALS_KEY)
+    return {field: int(value) for field, value in raw.items()}
+
+def split_totals(totals: Dict[str, int]) -> dict:
+    document = {field: totals.get(field, 0) for field in COUNTERS}
+    document["storage_usage"] = {
+        field[len(STORAGE_PREFIX):]: value for field, value in totals.items() if field.startswith(STORAGE_PREFIX)
+    }
+    return document
+
+async def bootstrap_totals(db):
+    """Seed counters from the catalog once; afterwards they are only moved by events"""
+    if await redis_client.pool.exists(TOTALS_KEY):
+        return
+    seed = {
+        "uploads": await db.backup_db.files.estimated_document_count(),
+        "active_users": await db.backup_db.users.count_documents({"is_active": True})
+    }
+    async for row in db.backup_db.files.aggregate([
+        {"$group": {"_id": {"$ifNull": ["$storage_provider", "$provider"]}, "bytes": {"$sum": "$size"}}}
+    ]):
+        seed[STORAGE_PREFIX + str(row["_id"])] = row["bytes"]
+    pipe = redis_client.pool.pipeline(transaction=False)
+    for field, value in seed.items():
+        pipe.hsetnx(TOTALS_KEY, field, value)
+    await pipe.execute()
+
+async def ensure_rollup_collections(db):
+    for name, _, _, retention in RESOLUTIONS:
+        options = {"timeseries": {"timeField": "timestamp", "granularity": "minutes" if name == "metrics_1m" else "hours"}}
+        if retention:
+            options["expireAfterSeconds"] = retention
+        try:
+            await db.backup_db.create_collection(name, **options)
+        except CollectionInvalid:
+            pass
+
+def as_naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def pick_resolution(since: datetime, until: datetime) -> str:
+    """Finest resolution whose retention still holds data as old as `since`"""
+    now = datetime.utcnow()
+    age = (max(now, until) - since).total_seconds()
+    for name, _, _, retention in RESOLUTIONS:
+        if retention is None or age <= retention:
+            return name
+    return RESOLUTIONS[-1][0]
+
+async def read_history(db, since: datetime, until: datetime, resolution: Optional[str] = None, limit: int = 2000) -> List[dict]:
+    collection = resolution or pick_resolution(since, until)
+    cursor = db.backup_db[collection].find(
+        {"timestamp": {"$gte": since, "$lt": until}}, {"_id": 0}
+    ).sort("timestamp", 1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+class RollupJob:
+    """Writes a counter snapshot every minute and downsamples it into hourly and daily collections.
+
+    Counters are cumulative, so a coarser bucket keeps the last snapshot inside
+    it. Each step takes a Redis lock per bucket so only one replica writes it.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._db = None
+
+    async def _claim(self, name: str, boundary: int, ttl: int) -> bool:
+        return bool(await redis_client.pool.set(f"{LOCK_PREFIX}{name}:{boundary}", 1, nx=True, ex=ttl))
+
+    async def snapshot(self):
+        step = RESOLUTIONS[0][1]
+        boundary = int(time.time()) // step * step
+        if not await self._claim(RESOLUTIONS[0][0], boundary, step * 2):
+            return
+        document = split_totals(await read_totals())
+        document["timestamp"] = datetime.fromtimestamp(boundary, tz=timezone.utc)
+        await self._db.backup_db[RESOLUTIONS[0][0]].insert_one(document)
+
+    async def downsample(self, source: str, target: str, step: int, unit: str):
+        end = int(time.time()) // step * step
+        if not await self._claim(target, end, step):
+            return
+        latest = await self._db.backup_db[target].find_one({}, sort=[("timestamp", -1)])
+        if latest:
+            start = latest["timestamp"].replace(tzinfo=timezone.utc) + timedelta(seconds=step)
+        else:
+            start = datetime.fromtimestamp(end - step, tz=timezone.utc)
+        end_at = datetime.fromtimestamp(end, tz=timezone.utc)
+        if start >= end_at:
+            return
+        fields = COUNTERS + ["storage_usage"]
+        pipeline = [
+            {"$match": {"timestamp": {"$gte": start, "$lt": end_at}}},
+            {"$sort": {"timestamp": 1}},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$timestamp", "unit": unit}},
+                **{field: {"$last": f"${field}"} for field in fields}
+            }},
+            {"$sort": {"_id": 1}},
+            {"$addFields": {"timestamp": "$_id"}},
+            {"$project": {"_id": 0}},
+        ]
+        documents = await self._db.backup_db[source].aggregate(pipeline).to_list(length=None)
+        if documents:
+            await self._db.backup_db[target].insert_many(documents, ordered=False)
+
+    async def run_once(self):
+        await self.snapshot()
+        for (source, _, _, _), (target, step, unit, _) in zip(RESOLUTIONS, RESOLUTIONS[1:]):
+            await self.downsample(source, target, step, unit)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка агрегации метрик: {e}")
+            await asyncio.sleep(ROLLUP_INTERVAL - time.time() % ROLLUP_INTERVAL)
+
+    def start(self, db):
+        if self._task is None and redis_client.pool is not None:
+            self._db = db
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+rollup_job = RollupJob()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 class HealthCheck(BaseModel):
@@ -14,11 +14,34 @@ class LogEntry(BaseModel):
     timestamp: datetime
     metadata: Optional[Dict[str, Any]] = None
 
+class LogBulkResponse(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[str]
+
 class MetricsSnapshot(BaseModel):
-    total_requests: int
+    total_operations: int
     active_users: int
     total_uploads: int
     total_downloads: int
     storage_usage: Dict[str, int]
     timestamp: datetime
 
+class MetricsHistoryPoint(BaseModel):
+    timestamp: datetime
+    operations: int = 0
+    uploads: int = 0
+    downloads: int = 0
+    deletions: int = 0
+    upload_failures: int = 0
+    download_failures: int = 0
+    logins: int = 0
+    active_users: int = 0
+    bytes_uploaded: int = 0
+    bytes_downloaded: int = 0
+    storage_usage: Dict[str, int] = {}
+
+class MetricsHistoryResponse(BaseModel):
+    resolution: str
+    points: List[MetricsHistoryPoint]
+
@@ -1,8 +1,11 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-from jose import JWTError, jwt
 from passlib.context import CryptContext
+import hashlib
+import jwt
 import os
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
@@ -11,7 +14,19 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+ARGON2_SETTINGS = {
+    "ARGON2_TIME_COST": "argon2__time_cost",
+    "ARGON2_MEMORY_COST": "argon2__memory_cost",
+    "ARGON2_PARALLELISM": "argon2__parallelism",
+}
+
+def build_crypt_context() -> CryptContext:
+    # Без переменных окружения остаются параметры passlib по умолчанию,
+    # при их изменении старые хеши пересчитываются при следующем входе.
+    settings = {key: int(os.environ[env]) for env, key in ARGON2_SETTINGS.items() if os.getenv(env)}
+    return CryptContext(schemes=["argon2"], deprecated="auto", **settings)
+
+pwd_context = build_crypt_context()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -29,9 +44,44 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class VerifiedTokenCache:
+    """Bounded LRU of verified claims keyed by token digest, valid until the token's exp"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+    def get(self, digest: bytes) -> Optional[dict]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        payload, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return payload
+
+    def put(self, digest: bytes, payload: dict):
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)) or self.max_size <= 0:
+            return
+        self._entries[digest] = (payload, expires_at)
+        self._entries.move_to_end(digest)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+token_cache = VerifiedTokenCache(int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000")))
+
 def verify_token(token: str) -> Optional[dict]:
+    """Return the token's claims or None; the result is shared and must not be mutated"""
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        return None
\ No newline at end of file
+    except jwt.PyJWTError:
+        return None
+    token_cache.put(digest, payload)
+    return payload
\ No newline at end of file
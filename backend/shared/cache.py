@@ -0,0 +1,244 @@
+"""Redis read-through cache for read paths, invalidated by per-user tags.
+
+Every tag ("files:<user_id>", "config:<user_id>", ...) has a version counter
+in Redis and the versions of an entry's tags are part of its key, so
+invalidating a tag is a single INCR: entries written under the old version
+are never read again and age out with their TTL.
+
+A miss is loaded by one caller only. Concurrent callers in the same process
+share its result, and other processes wait for the value behind a short Redis
+lock instead of all hitting Mongo at once. Values are msgpack, zlib-compressed
+above CACHE_COMPRESS_MIN bytes. When Redis is unavailable the loader is called
+directly.
+"""
+from bson import ObjectId
+from datetime import date, datetime
+from functools import wraps
+from prometheus_client import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+import asyncio
+import hashlib
+import inspect
+import logging
+import msgpack
+import os
+import time
+import uuid
+import zlib
+
+from shared.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+cache_requests = Counter('cache_requests_total', 'Обращения к кешу чтения', ['endpoint', 'result'])
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "300"))
+CACHE_LOCK_TTL_MS = int(float(os.getenv("CACHE_LOCK_TTL", "10")) * 1000)
+CACHE_LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", "2"))
+CACHE_COMPRESS_MIN = int(os.getenv("CACHE_COMPRESS_MIN", "1024"))
+
+KEY_PREFIX = "cache:"
+TAG_PREFIX = "cache:tag:"
+
+# Tag templates, formatted with the cached function's arguments or with user_id= on invalidation
+FILES_TAG = "files:{user_id}"
+CONFIG_TAG = "config:{user_id}"
+USER_TAG = "user:{user_id}"
+
+RAW = b"m"
+COMPRESSED = b"z"
+
+EXT_DATETIME = 1
+EXT_DATE = 2
+EXT_OBJECT_ID = 3
+
+# Handed to coalesced callers when the leading load was cancelled
+ABANDONED = object()
+
+# Delete the lock only if it is still ours
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def _pack_default(value: Any):
+    if isinstance(value, datetime):
+        return msgpack.ExtType(EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, date):
+        return msgpack.ExtType(EXT_DATE, value.isoformat().encode())
+    if isinstance(value, ObjectId):
+        return msgpack.ExtType(EXT_OBJECT_ID, value.binary)
+    raise TypeError(f"Type is not cacheable: {type(value).__name__}")
+
+def _ext_hook(code: int, data: bytes):
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == EXT_DATE:
+        return date.fromisoformat(data.decode())
+    if code == EXT_OBJECT_ID:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+def encode(value: Any) -> bytes:
+    packed = msgpack.packb(value, default=_pack_default, use_bin_type=True)
+    if len(packed) >= CACHE_COMPRESS_MIN:
+        return COMPRESSED + zlib.compress(packed)
+    return RAW + packed
+
+def decode(raw: bytes) -> Any:
+    packed = zlib.decompress(raw[1:]) if raw[:1] == COMPRESSED else raw[1:]
+    return msgpack.unpackb(packed, ext_hook=_ext_hook, raw=False)
+
+class ResponseCache:
+    def __init__(self):
+        self.enabled = CACHE_ENABLED
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._release = None
+
+    @property
+    def redis(self):
+        return redis_client.binary
+
+    def _key(self, name: str, parts: Sequence[Any], tags: List[str], versions: List[Optional[bytes]]) -> str:
+        digest = hashlib.sha1(repr(tuple(parts)).encode()).hexdigest()
+        stamp = ".".join((version or b"0").decode() for version in versions)
+        return f"{KEY_PREFIX}{name}:{digest}:{stamp}"
+
+    async def get_or_load(
+        self,
+        name: str,
+        parts: Sequence[Any],
+        tags: Iterable[str],
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = CACHE_DEFAULT_TTL
+    ) -> Any:
+        if not self.enabled or self.redis is None:
+            return await loader()
+        tags = list(tags)
+        while True:
+            value = await self._get_or_load(name, parts, tags, loader, ttl)
+            if value is not ABANDONED:
+                return value
+
+    async def _get_or_load(
+        self,
+        name: str,
+        parts: Sequence[Any],
+        tags: List[str],
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int
+    ) -> Any:
+        try:
+            versions = await self.redis.mget([TAG_PREFIX + tag for tag in tags]) if tags else []
+            key = self._key(name, parts, tags, versions)
+            raw = await self.redis.get(key)
+        except Exception as e:
+            logger.warning(f"Кеш {name} недоступен: {e}")
+            cache_requests.labels(endpoint=name, result="error").inc()
+            return await loader()
+        if raw is not None:
+            cache_requests.labels(endpoint=name, result="hit").inc()
+            return decode(raw)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            cache_requests.labels(endpoint=name, result="coalesced").inc()
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(name, key, loader, ttl)
+        except asyncio.CancelledError:
+            # the leader's client went away: followers retry instead of failing with it
+            future.set_result(ABANDONED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _load(self, name: str, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+        lock_key = key + ":lock"
+        token = uuid.uuid4().hex.encode()
+        try:
+            locked = await self.redis.set(lock_key, token, nx=True, px=CACHE_LOCK_TTL_MS)
+        except Exception as e:
+            logger.warning(f"Кеш {name} недоступен: {e}")
+            cache_requests.labels(endpoint=name, result="error").inc()
+            return await loader()
+
+        if not locked:
+            # another process is loading the same entry: wait for its result
+            deadline = time.monotonic() + CACHE_LOCK_WAIT
+            delay = 0.01
+            while time.monotonic() < deadline:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.2)
+                try:
+                    raw = await self.redis.get(key)
+                except Exception:
+                    break
+                if raw is not None:
+                    cache_requests.labels(endpoint=name, result="wait").inc()
+                    return decode(raw)
+            cache_requests.labels(endpoint=name, result="lock_timeout").inc()
+            return await loader()
+
+        cache_requests.labels(endpoint=name, result="miss").inc()
+        try:
+            value = await loader()
+            await self.redis.set(key, encode(value), ex=ttl)
+            return value
+        finally:
+            if self._release is None:
+                self._release = self.redis.register_script(RELEASE_SCRIPT)
+            try:
+                await self._release(keys=[lock_key], args=[token])
+            except Exception as e:
+                logger.warning(f"Не удалось снять блокировку кеша {name}: {e}")
+
+    async def invalidate(self, *tags: str):
+        if not tags or self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(TAG_PREFIX + tag)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Ошибка инвалидации кеша {', '.join(tags)}: {e}")
+
+    def cached(self, name: str, key: Sequence[str], tags: Sequence[str] = (), ttl: int = CACHE_DEFAULT_TTL):
+        """Cache an async read function.
+
+        `key` names the arguments the result depends on; `tags` are templates
+        formatted with the arguments, e.g. "files:{user_id}".
+        """
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = bound.arguments
+                return await self.get_or_load(
+                    name,
+                    [arguments[param] for param in key],
+                    [template.format(**arguments) for template in tags],
+                    lambda: func(*args, **kwargs),
+                    ttl
+                )
+
+            return wrapper
+        return decorator
+
+response_cache = ResponseCache()
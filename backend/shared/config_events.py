@@ -0,0 +1,75 @@
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import time
+
+from shared.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+CONFIG_CHANNEL = "config_changes"
+
+async def publish_config_change(user_id: str, version: int, operation: str):
+    if redis_client.pool is None:
+        return
+    message = json.dumps({"user_id": user_id, "version": version, "operation": operation})
+    try:
+        await redis_client.pool.publish(CONFIG_CHANNEL, message)
+    except Exception as e:
+        logger.error(f"Ошибка публикации изменения конфигурации: {e}")
+
+class ConfigCache:
+    """Per-process config cache dropped by config_service change notifications.
+
+    The TTL only matters when notifications are lost; on a subscription error
+    the whole cache is cleared because changes may have been missed.
+    """
+
+    def __init__(self, loader: Callable[[str], Awaitable[Optional[dict]]]):
+        self.loader = loader
+        self.ttl = float(os.getenv("CONFIG_CACHE_TTL", "300"))
+        self._entries: Dict[str, Tuple[dict, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        config = await self.loader(user_id)
+        if config is not None:
+            self._entries[user_id] = (config, time.monotonic() + self.ttl)
+        return config
+
+    def invalidate(self, user_id: Optional[str] = None):
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = redis_client.pool.pubsub()
+                await pubsub.subscribe(CONFIG_CHANNEL)
+                self.invalidate()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    self.invalidate(json.loads(message["data"])["user_id"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на изменения конфигурации: {e}")
+                self.invalidate()
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self._task is None and redis_client.pool is not None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,70 @@
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from typing import Optional
+import hmac
+import os
+
+from shared.auth_utils import verify_token
+from shared.tracing import span, set_attributes
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+
+# Shared with gateway_service; requests carrying it were authenticated at the edge
+GATEWAY_TOKEN = os.getenv("GATEWAY_TOKEN", "")
+
+def from_gateway(request: Request) -> bool:
+    gateway_token = request.headers.get("x-gateway-token")
+    return bool(GATEWAY_TOKEN and gateway_token and hmac.compare_digest(gateway_token, GATEWAY_TOKEN))
+
+def client_ip(request: Request) -> str:
+    """Caller address: the one the gateway appended to X-Forwarded-For, else the socket peer"""
+    if from_gateway(request):
+        forwarded_for = request.headers.get("x-forwarded-for", "")
+        address = forwarded_for.rsplit(",", 1)[-1].strip()
+        if address:
+            return address
+    return request.client.host if request.client else "unknown"
+
+def trusted_identity(request: Request) -> Optional[dict]:
+    """Identity forwarded by the gateway, or None when the request did not come through it"""
+    user_id = request.headers.get("x-user-id")
+    if not user_id or not from_gateway(request):
+        return None
+    return {
+        "user_id": user_id,
+        "email": request.headers.get("x-user-email") or None,
+        "is_superuser": request.headers.get("x-user-superuser") == "1"
+    }
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
+    user = trusted_identity(request)
+    if user is not None:
+        set_attributes({"enduser.id": user["user_id"]})
+        return user
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    with span("auth.verify_token"):
+        payload = verify_token(token)
+    if payload is None:
+        raise credentials_exception
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise credentials_exception
+    set_attributes({"enduser.id": user_id})
+    return {"user_id": user_id, "email": payload.get("email"), "is_superuser": bool(payload.get("is_superuser"))}
+
+async def require_admin(current_user: dict = Depends(get_current_user)):
+    if not current_user["is_superuser"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Требуются права администратора")
+    return current_user
+
+INTERNAL_SERVICE_TOKEN = os.getenv("INTERNAL_SERVICE_TOKEN", "")
+
+async def verify_internal_token(x_internal_token: Optional[str] = Header(None)):
+    """Guard for service-to-service endpoints that act on behalf of many users"""
+    if not INTERNAL_SERVICE_TOKEN or not x_internal_token \
+            or not hmac.compare_digest(x_internal_token, INTERNAL_SERVICE_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Доступ только для внутренних сервисов")
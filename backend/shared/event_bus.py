@@ -0,0 +1,168 @@
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import json
+import logging
+import os
+import socket
+
+from shared.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+BACKUP_EVENTS = "backup_events"
+AUTH_EVENTS = "auth_events"
+
+FILE_UPLOADED = "file.uploaded"
+FILE_DOWNLOADED = "file.downloaded"
+FILE_DELETED = "file.deleted"
+FILE_FAILED = "file.failed"
+# moved to other storage by the lifecycle engine, not a user operation
+FILE_TIERED = "file.tiered"
+USER_REGISTERED = "user.registered"
+USER_LOGGED_IN = "user.logged_in"
+
+STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "100000"))
+
+class Event:
+    def __init__(self, id: str, type: str, payload: dict, published_at: str):
+        self.id = id
+        self.type = type
+        self.payload = payload
+        self.published_at = published_at
+
+    @classmethod
+    def from_fields(cls, id: str, fields: dict) -> "Event":
+        return cls(id, fields.get("type", ""), json.loads(fields.get("payload", "{}")), fields.get("published_at", ""))
+
+def dead_letter_stream(stream: str) -> str:
+    return f"{stream}:dead"
+
+async def publish(stream: str, event_type: str, payload: dict) -> Optional[str]:
+    """Append an event to the stream; never raises so callers on a request path are not affected"""
+    if redis_client.pool is None:
+        return None
+    fields = {
+        "type": event_type,
+        "payload": json.dumps(payload, default=str),
+        "published_at": datetime.now(timezone.utc).isoformat()
+    }
+    try:
+        return await redis_client.pool.xadd(stream, fields, maxlen=STREAM_MAXLEN, approximate=True)
+    except Exception as e:
+        logger.error(f"Ошибка публикации события {event_type}: {e}")
+        return None
+
+async def replay(stream: str, start: str = "-", end: str = "+", count: int = 1000) -> List[Event]:
+    """Read events straight from the stream, ignoring consumer group state"""
+    entries = await redis_client.pool.xrange(stream, min=start, max=end, count=count)
+    return [Event.from_fields(entry_id, fields) for entry_id, fields in entries]
+
+class EventConsumer:
+    """Consumer group member: acks handled events, retries failures, dead-letters poison events.
+
+    A failed event stays pending and is reclaimed once it has been idle for
+    claim_idle_ms; after max_deliveries attempts it is moved to <stream>:dead.
+    """
+
+    def __init__(
+        self,
+        stream: str,
+        group: str,
+        handler: Callable[[Event], Awaitable[None]],
+        batch_size: int = 50,
+        block_ms: int = 5000,
+        claim_idle_ms: int = 60000,
+        max_deliveries: int = 5
+    ):
+        self.stream = stream
+        self.group = group
+        self.handler = handler
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self._task: Optional[asyncio.Task] = None
+
+    async def _ensure_group(self):
+        try:
+            await redis_client.pool.xgroup_create(self.stream, self.group, id="$", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _handle(self, entry_id: str, fields: dict):
+        try:
+            await self.handler(Event.from_fields(entry_id, fields))
+        except Exception as e:
+            logger.error(f"Ошибка обработки события {entry_id} в группе {self.group}: {e}")
+            return
+        await redis_client.pool.xack(self.stream, self.group, entry_id)
+
+    async def _dead_letter(self, entry_id: str, deliveries: int):
+        redis = redis_client.pool
+        entries = await redis.xrange(self.stream, min=entry_id, max=entry_id)
+        fields = dict(entries[0][1]) if entries else {}
+        fields.update({"original_id": entry_id, "group": self.group, "deliveries": deliveries})
+        await redis.xadd(dead_letter_stream(self.stream), fields, maxlen=STREAM_MAXLEN, approximate=True)
+        await redis.xack(self.stream, self.group, entry_id)
+        logger.error(f"Событие {entry_id} перемещено в {dead_letter_stream(self.stream)} после {deliveries} попыток")
+
+    async def reclaim(self):
+        redis = redis_client.pool
+        pending = await redis.xpending_range(
+            self.stream, self.group, min="-", max="+", count=self.batch_size, idle=self.claim_idle_ms
+        )
+        retry_ids = []
+        for entry in pending:
+            if entry["times_delivered"] >= self.max_deliveries:
+                await self._dead_letter(entry["message_id"], entry["times_delivered"])
+            else:
+                retry_ids.append(entry["message_id"])
+        if not retry_ids:
+            return
+        claimed = await redis.xclaim(self.stream, self.group, self.consumer, self.claim_idle_ms, retry_ids)
+        for entry_id, fields in claimed:
+            if fields:
+                await self._handle(entry_id, fields)
+            else:
+                # trimmed from the stream while pending, nothing left to process
+                await redis.xack(self.stream, self.group, entry_id)
+
+    async def _run(self):
+        await self._ensure_group()
+        loop = asyncio.get_running_loop()
+        next_reclaim = 0.0
+        while True:
+            try:
+                if loop.time() >= next_reclaim:
+                    await self.reclaim()
+                    next_reclaim = loop.time() + self.claim_idle_ms / 1000
+                response = await redis_client.pool.xreadgroup(
+                    self.group, self.consumer, {self.stream: ">"}, count=self.batch_size, block=self.block_ms
+                )
+                for _, entries in response or []:
+                    for entry_id, fields in entries:
+                        await self._handle(entry_id, fields)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка чтения потока {self.stream}: {e}")
+                await asyncio.sleep(1)
+
+    async def replay(self, start: str = "-", end: str = "+", count: int = 1000) -> int:
+        """Feed historical events to the handler without touching group state"""
+        events = await replay(self.stream, start, end, count)
+        for event in events:
+            await self.handler(event)
+        return len(events)
+
+    def start(self):
+        if self._task is None and redis_client.pool is not None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
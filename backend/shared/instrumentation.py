@@ -0,0 +1,47 @@
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+import asyncio
+
+from shared.dependencies import require_admin
+from shared.loop_watchdog import loop_watchdog
+from shared.metrics import PrometheusMiddleware, metrics_payload, mark_process_dead
+from shared.profiler import profiler, ProfilerBusy, to_collapsed, to_speedscope
+from shared.tracing import setup_tracing, shutdown_tracing
+
+def instrument_app(app: FastAPI, service: str):
+    """Common observability hooks; call once right after the FastAPI app is created"""
+    app.add_middleware(PrometheusMiddleware, service=service)
+    setup_tracing(app, service)
+
+    async def prometheus_metrics():
+        return Response(content=metrics_payload(), media_type=CONTENT_TYPE_LATEST)
+
+    async def profile(
+        seconds: float = Query(10, gt=0, le=60),
+        mode: str = Query("threads", pattern="^(threads|tasks)$"),
+        format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+        interval_ms: float = Query(10, ge=1, le=1000),
+        current_user: dict = Depends(require_admin)
+    ):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await asyncio.to_thread(profiler.record, seconds, interval_ms / 1000, mode, loop)
+        except ProfilerBusy:
+            raise HTTPException(status_code=409, detail="Профилирование уже выполняется")
+        if format == "speedscope":
+            return JSONResponse(to_speedscope(result, service))
+        return PlainTextResponse(to_collapsed(result))
+
+    app.add_api_route("/metrics", prometheus_metrics, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/debug/profile", profile, methods=["GET"], include_in_schema=False)
+
+    @app.on_event("startup")
+    async def observability_startup():
+        loop_watchdog.start(service)
+
+    @app.on_event("shutdown")
+    async def observability_shutdown():
+        await loop_watchdog.stop()
+        mark_process_dead()
+        shutdown_tracing()
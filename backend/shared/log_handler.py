@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+import json
+import logging
+import os
+import queue
+import threading
+import urllib.request
+
+from shared.tracing import current_trace_id
+
+class BatchingLogHandler(logging.Handler):
+    """Ships log records to monitor_service /logs/bulk as NDJSON from a background thread.
+
+    emit() only enqueues, so logging never blocks the event loop; when the
+    queue is full records are dropped and counted instead.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        service: str,
+        token: str = "",
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        max_queue: int = 10000,
+        timeout: float = 5.0
+    ):
+        super().__init__()
+        self.url = url
+        self.service = service
+        self.token = token
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord):
+        if record.name == __name__:
+            return
+        try:
+            entry = {
+                "level": record.levelname,
+                "service": self.service,
+                "message": self.format(record),
+                "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+                "metadata": {"logger": record.name, "module": record.module, "line": record.lineno}
+            }
+            trace_id = current_trace_id()
+            if trace_id:
+                entry["metadata"]["trace_id"] = trace_id
+            self._queue.put_nowait(json.dumps(entry, default=str))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _take_batch(self) -> List[str]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch: List[str]):
+        request = urllib.request.Request(
+            self.url,
+            data="\n".join(batch).encode(),
+            headers={"Content-Type": "application/x-ndjson", "X-Internal-Token": self.token},
+            method="POST"
+        )
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except Exception as e:
+            self.dropped += len(batch)
+            logging.getLogger(__name__).warning(f"Не удалось отправить {len(batch)} записей лога: {e}")
+
+    def _run(self):
+        while not self._stopped.is_set() or not self._queue.empty():
+            batch = self._take_batch()
+            if batch:
+                self._send(batch)
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join(timeout=self.timeout + self.flush_interval)
+        super().close()
+
+def install_log_handler(service: str, level: int = logging.INFO) -> Optional[BatchingLogHandler]:
+    """Attach the shipping handler to the root logger when LOG_SHIPPING_URL is set"""
+    url = os.getenv("LOG_SHIPPING_URL")
+    if not url:
+        return None
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, BatchingLogHandler):
+            return handler
+    handler = BatchingLogHandler(
+        url,
+        service,
+        token=os.getenv("INTERNAL_SERVICE_TOKEN", ""),
+        batch_size=int(os.getenv("LOG_SHIPPING_BATCH", "500")),
+        flush_interval=float(os.getenv("LOG_SHIPPING_INTERVAL", "2.0"))
+    )
+    handler.setLevel(level)
+    root.addHandler(handler)
+    if root.level > level:
+        root.setLevel(level)
+    return handler
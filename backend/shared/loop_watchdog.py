@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+loop_lag = Histogram(
+    'event_loop_lag_seconds', 'Задержка срабатывания таймеров event loop', ['service'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+loop_blocked = Counter('event_loop_blocked_total', 'Случаи блокировки event loop', ['service', 'route'])
+
+class LoopWatchdog:
+    """Measures event-loop lag and reports callbacks that block the loop.
+
+    A heartbeat coroutine stamps the time every `interval`; a separate thread
+    notices when the stamp goes stale for longer than `threshold` and logs the
+    loop thread's stack at that moment, i.e. the code that is blocking, together
+    with the route of the request whose task is running.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() == "true"
+        self.interval = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+        self.threshold = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25"))
+        self.service = ""
+        self._beat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._routes: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @contextmanager
+    def route_scope(self, route: str):
+        """Remember which route the current task serves so a report can name it"""
+        key = id(asyncio.current_task())
+        self._routes[key] = route
+        try:
+            yield
+        finally:
+            self._routes.pop(key, None)
+
+    async def _heartbeat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            loop_lag.labels(service=self.service).observe(max(0.0, now - started - self.interval))
+            self._beat = now
+
+    def _report(self, stalled: float):
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<нет стека>"
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        route = self._routes.get(id(task), "-") if task is not None else "-"
+        task_name = task.get_name() if task is not None else "-"
+        loop_blocked.labels(service=self.service, route=route).inc()
+        logger.warning(
+            f"Event loop заблокирован дольше {stalled:.3f} с: маршрут {route}, задача {task_name}\n{stack}"
+        )
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled > self.threshold and reported_beat != beat:
+                reported_beat = beat
+                self._report(stalled)
+
+    def start(self, service: str):
+        if not self.enabled or self._task is not None:
+            return
+        self.service = service
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._stopped.set()
+        self._thread = None
+
+loop_watchdog = LoopWatchdog()
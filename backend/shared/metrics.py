@@ -0,0 +1,125 @@
+"""Request and provider metrics shared by every service.
+
+With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory before the process starts; /metrics then aggregates the
+samples of all workers instead of returning only the one that answered.
+"""
+from contextlib import contextmanager
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from starlette.routing import Match
+from typing import Callable
+import functools
+import os
+import time
+
+from shared.loop_watchdog import loop_watchdog
+from shared.tracing import span
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+request_count = Counter(
+    'http_requests_total', 'Общее число HTTP запросов', ['service', 'method', 'route', 'status']
+)
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP запроса', ['service', 'method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+requests_in_progress = Gauge(
+    'http_requests_in_progress', 'HTTP запросы в обработке', ['service', 'method'],
+    multiprocess_mode='livesum'
+)
+response_size = Histogram(
+    'http_response_size_bytes', 'Размер тела HTTP ответа', ['service', 'route'],
+    buckets=(100, 1000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+)
+provider_duration = Histogram(
+    'provider_operation_seconds', 'Время операций с хранилищем', ['provider', 'operation', 'status'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+
+def route_template(app, scope) -> str:
+    """Path template of the matching route so labels stay bounded, e.g. /download/{filename}"""
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+class PrometheusMiddleware:
+    """Plain ASGI middleware, so streaming responses are measured until the last chunk is sent"""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope["app"], scope) if "app" in scope else UNMATCHED_ROUTE
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = requests_in_progress.labels(service=self.service, method=method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            with loop_watchdog.route_scope(f"{method} {route}"):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            request_duration.labels(service=self.service, method=method, route=route).observe(
+                time.perf_counter() - started
+            )
+            request_count.labels(service=self.service, method=method, route=route, status=str(status)).inc()
+            response_size.labels(service=self.service, route=route).observe(size)
+
+@contextmanager
+def provider_operation(provider: str, operation: str):
+    started = time.perf_counter()
+    status = "success"
+    try:
+        with span(f"provider.{operation}", {"storage.provider": provider, "storage.operation": operation}):
+            yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        provider_duration.labels(provider=provider, operation=operation, status=status).observe(
+            time.perf_counter() - started
+        )
+
+def timed_provider_operation(operation: str) -> Callable:
+    """Decorator for provider methods; the provider label comes from the instance's `name`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with provider_operation(self.name, operation):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def metrics_payload() -> bytes:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+def mark_process_dead():
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,87 @@
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+from prometheus_client import Counter, Gauge, Histogram
+from typing import Optional, Tuple
+import asyncio
+import multiprocessing
+import os
+import time
+
+from shared.auth_utils import build_crypt_context
+
+hash_duration = Histogram(
+    'password_hash_duration_seconds',
+    'Время хеширования и проверки паролей, включая ожидание в очереди',
+    ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+hash_pending = Gauge('password_hash_pending', 'Операции хеширования в очереди и в работе')
+hash_rejected = Counter('password_hash_rejected_total', 'Операции хеширования, отклоненные из-за перегрузки')
+
+class HasherOverloaded(Exception):
+    pass
+
+_worker_context: Optional[CryptContext] = None
+
+def _context() -> CryptContext:
+    global _worker_context
+    if _worker_context is None:
+        _worker_context = build_crypt_context()
+    return _worker_context
+
+def _hash_password(password: str) -> str:
+    return _context().hash(password)
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return _context().verify_and_update(password, hashed_password)
+
+def available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+class PasswordHasher:
+    """Runs Argon2 in a process pool so logins never block the event loop"""
+
+    def __init__(self):
+        self.workers = int(os.getenv("PASSWORD_HASH_WORKERS", "0")) or available_cores()
+        self.max_pending = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(self.workers * 4)))
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_context
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _submit(self, operation: str, func, *args):
+        if self.pending >= self.max_pending:
+            hash_rejected.inc()
+            raise HasherOverloaded()
+        self.start()
+        self.pending += 1
+        hash_pending.set(self.pending)
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            hash_pending.set(self.pending)
+            hash_duration.labels(operation=operation).observe(time.perf_counter() - started)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", _hash_password, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; the second value is a new hash when parameters changed"""
+        return await self._submit("verify", _verify_and_update, password, hashed_password)
+
+password_hasher = PasswordHasher()
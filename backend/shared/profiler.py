@@ -0,0 +1,138 @@
+"""On-demand statistical profiler.
+
+Nothing runs between sessions: a sampling thread exists only while a profile
+is being recorded. Two modes are available:
+
+- "threads" samples the Python stack of every thread (CPU and blocking work,
+  including SDK calls and hashing that run on the event loop thread);
+- "tasks" samples the await chain of every asyncio task, which shows where
+  each request spends wall time while suspended.
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import sys
+import threading
+import time
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+Frame = Tuple[str, str, int]
+
+class ProfilerBusy(Exception):
+    pass
+
+def _frame_stack(frame) -> List[Frame]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, frame.f_lineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+def _await_chain(coro) -> List[Frame]:
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, frame.f_lineno))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return stack
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def _sample_threads(self, own_ident: int) -> List[Tuple[str, List[Frame]]]:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        return [
+            (f"thread:{names.get(ident, ident)}", _frame_stack(frame))
+            for ident, frame in sys._current_frames().items()
+            if ident != own_ident
+        ]
+
+    def _sample_tasks(self, loop: asyncio.AbstractEventLoop) -> List[Tuple[str, List[Frame]]]:
+        try:
+            tasks = list(asyncio.all_tasks(loop))
+        except RuntimeError:
+            return []
+        return [(f"task:{task.get_name()}", _await_chain(task.get_coro())) for task in tasks if not task.done()]
+
+    def record(self, seconds: float, interval: float, mode: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> dict:
+        """Blocking; run it in a worker thread. Returns folded stacks with sample counts"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            own_ident = threading.get_ident()
+            samples: Counter = Counter()
+            started = time.perf_counter()
+            deadline = started + min(seconds, PROFILE_MAX_SECONDS)
+            count = 0
+            while time.perf_counter() < deadline:
+                stacks = self._sample_tasks(loop) if mode == "tasks" else self._sample_threads(own_ident)
+                for root, stack in stacks:
+                    samples[(root,) + tuple(stack)] += 1
+                count += 1
+                time.sleep(interval)
+            return {
+                "samples": samples,
+                "sample_count": count,
+                "interval": interval,
+                "duration": time.perf_counter() - started,
+                "mode": mode
+            }
+        finally:
+            self._lock.release()
+
+def _frame_name(frame) -> str:
+    if isinstance(frame, str):
+        return frame
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+def to_collapsed(profile: dict) -> str:
+    """Brendan Gregg folded format, readable by flamegraph.pl and speedscope"""
+    lines = [
+        ";".join(_frame_name(frame) for frame in stack) + f" {count}"
+        for stack, count in profile["samples"].most_common()
+    ]
+    return "\n".join(lines) + "\n"
+
+def to_speedscope(profile: dict, name: str) -> dict:
+    frames: List[dict] = []
+    index: Dict[object, int] = {}
+
+    def frame_id(frame) -> int:
+        if frame not in index:
+            index[frame] = len(frames)
+            if isinstance(frame, str):
+                frames.append({"name": frame})
+            else:
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+        return index[frame]
+
+    samples, weights = [], []
+    for stack, count in profile["samples"].items():
+        samples.append([frame_id(frame) for frame in stack])
+        weights.append(count * profile["interval"])
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "backup-shared profiler",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": f"{name} ({profile['mode']})",
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights
+        }]
+    }
+
+profiler = SamplingProfiler()
@@ -0,0 +1,168 @@
+import functools
+import logging
+import math
+import os
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from redis.exceptions import RedisError
+
+from shared.auth_utils import verify_token
+from shared.dependencies import client_ip
+from shared.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PLAN = "free"
+
+PLAN_MULTIPLIERS = {
+    "free": 1,
+    "pro": 5,
+    "enterprise": 20,
+}
+
+PERIODS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+# Атомарный token bucket: пополнение, списание и выдача аренды за один вызов.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+local retry_after = 0
+if granted == 0 then
+    retry_after = (1 - tokens) / rate
+end
+return {granted, tostring(retry_after)}
+"""
+
+def parse_limit(limit_value: str) -> Tuple[int, int]:
+    count, _, period = limit_value.partition("/")
+    period = period.strip().lower().rstrip("s")
+    if period not in PERIODS:
+        raise ValueError(f"Неизвестный период лимита: {limit_value}")
+    return int(count), PERIODS[period]
+
+def get_user_or_ip(request: Request) -> Tuple[str, str]:
+    """Identify the caller by JWT subject, falling back to the client IP"""
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = verify_token(token)
+        if payload and payload.get("sub"):
+            return f"user:{payload['sub']}", payload.get("plan", DEFAULT_PLAN)
+    return f"ip:{client_ip(request)}", DEFAULT_PLAN
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at")
+
+    def __init__(self, tokens: int, expires_at: float):
+        self.tokens = tokens
+        self.expires_at = expires_at
+
+class RateLimiter:
+    def __init__(
+        self,
+        namespace: str,
+        key_func: Callable[[Request], Tuple[str, str]] = get_user_or_ip,
+        lease_size: Optional[int] = None,
+        lease_ttl: Optional[float] = None,
+        max_leases: int = 10000,
+    ):
+        self.namespace = namespace
+        self.key_func = key_func
+        self.lease_size = lease_size or int(os.getenv("RATE_LIMIT_LEASE_SIZE", "10"))
+        self.lease_ttl = lease_ttl or float(os.getenv("RATE_LIMIT_LEASE_TTL", "1.0"))
+        self.max_leases = max_leases
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self._leases: Dict[str, _Lease] = {}
+        self._script = None
+
+    def _resolve_limit(self, limit_value: str, plan: str, plans: Optional[Dict[str, str]]) -> Tuple[int, int]:
+        if plans and plan in plans:
+            return parse_limit(plans[plan])
+        count, period = parse_limit(limit_value)
+        return count * PLAN_MULTIPLIERS.get(plan, 1), period
+
+    def _take_local(self, key: str, now: float) -> bool:
+        lease = self._leases.get(key)
+        if lease is None or lease.tokens <= 0 or lease.expires_at <= now:
+            return False
+        lease.tokens -= 1
+        return True
+
+    def _store_lease(self, key: str, tokens: int, now: float):
+        if len(self._leases) >= self.max_leases:
+            self._leases = {k: v for k, v in self._leases.items() if v.expires_at > now and v.tokens > 0}
+        if tokens > 0:
+            self._leases[key] = _Lease(tokens, now + self.lease_ttl)
+        else:
+            self._leases.pop(key, None)
+
+    async def _acquire_from_redis(self, key: str, capacity: int, rate: float, requested: int) -> Tuple[int, float]:
+        if self._script is None:
+            self._script = redis_client.pool.register_script(TOKEN_BUCKET_SCRIPT)
+        granted, retry_after = await self._script(keys=[key], args=[capacity, rate, requested])
+        return int(granted), float(retry_after)
+
+    async def hit(self, request: Request, route: str, limit_value: str, plans: Optional[Dict[str, str]] = None):
+        if not self.enabled:
+            return
+        identity, plan = self.key_func(request)
+        capacity, period = self._resolve_limit(limit_value, plan, plans)
+        key = f"ratelimit:{self.namespace}:{route}:{identity}"
+        now = time.monotonic()
+        if self._take_local(key, now):
+            return
+        if redis_client.pool is None:
+            logger.warning("Redis недоступен, лимит запросов не применяется")
+            return
+        # Маленькие лимиты требуют точности, поэтому аренда не больше десятой части ёмкости.
+        requested = max(1, min(self.lease_size, capacity // 10))
+        try:
+            granted, retry_after = await self._acquire_from_redis(key, capacity, capacity / period, requested)
+        except RedisError as e:
+            logger.warning(f"Ошибка Redis при проверке лимита: {e}")
+            return
+        if granted == 0:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Превышен лимит запросов: {limit_value}",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+        self._store_lease(key, granted - 1, now)
+
+    def limit(self, limit_value: str, plans: Optional[Dict[str, str]] = None):
+        parse_limit(limit_value)
+
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs.get("request")
+                if request is None:
+                    request = next((arg for arg in args if isinstance(arg, Request)), None)
+                if request is None:
+                    raise RuntimeError(f"Эндпоинт {func.__name__} должен принимать параметр request")
+                await self.hit(request, func.__name__, limit_value, plans)
+                return await func(*args, **kwargs)
+            return wrapper
+        return decorator
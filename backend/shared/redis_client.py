@@ -4,6 +4,8 @@ import os
 
 class RedisClient:
     pool: Optional[redis.Redis] = None
+    # Same server without response decoding, for binary values such as shared.cache entries
+    binary: Optional[redis.Redis] = None
 
 redis_client = RedisClient()
 
@@ -16,9 +18,12 @@ async def connect_to_redis():
         encoding="utf-8",
         decode_responses=True
     )
+    redis_client.binary = await redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379"))
     print("Подключение к Redis установлено")
 
 async def close_redis_connection():
+    if redis_client.binary:
+        await redis_client.binary.close()
     if redis_client.pool:
         await redis_client.pool.close()
         print("Подключение к Redis закрыто")
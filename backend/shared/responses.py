@@ -0,0 +1,70 @@
+"""Fast response serialization with content negotiation.
+
+List-heavy read handlers return `negotiate(request, content)` with plain dicts
+built from documents that were validated on the way in, so no Pydantic models
+are constructed and FastAPI's jsonable_encoder is skipped. JSON is rendered
+with orjson (the standard library is used when it is not installed) and
+MessagePack is served to clients that send `Accept: application/x-msgpack`.
+Declare the model in `response_model` anyway to keep the OpenAPI schema.
+"""
+from bson import ObjectId
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+from typing import Any
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    media_type = JSON_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_default, use_bin_type=True)
+
+def wants_msgpack(request: Request) -> bool:
+    return msgpack is not None and MSGPACK_MEDIA_TYPE in request.headers.get("accept", "")
+
+def negotiate(request: Request, content: Any, status_code: int = 200) -> Response:
+    response_class = MsgPackResponse if wants_msgpack(request) else FastJSONResponse
+    return response_class(content, status_code=status_code, headers={"Vary": "Accept"})
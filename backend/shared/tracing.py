@@ -0,0 +1,118 @@
+"""OpenTelemetry tracing, enabled when OTEL_EXPORTER_OTLP_ENDPOINT is set.
+
+The SDK is an optional dependency (`pip install .[tracing]`); without it, or
+without an endpoint, span() and set_attributes() are no-ops.
+"""
+from contextlib import contextmanager
+from typing import Optional
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.instrumentation.botocore import BotocoreInstrumentor
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+    from opentelemetry.instrumentation.pymongo import PymongoInstrumentor
+    from opentelemetry.instrumentation.redis import RedisInstrumentor
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import Decision, ParentBased, Sampler, SamplingResult
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+TRACING_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+TRACES_PER_SECOND = float(os.getenv("TRACING_TARGET_PER_SEC", "10"))
+MIN_SAMPLE_RATIO = float(os.getenv("TRACING_MIN_RATIO", "0.001"))
+
+_tracer = None
+
+if OTEL_AVAILABLE:
+    class AdaptiveSampler(Sampler):
+        """Samples root spans so that about `target` traces per second are kept.
+
+        The ratio is recomputed once per second from the number of root spans
+        seen in the previous second, so quiet services keep every trace and
+        busy ones stay within budget.
+        """
+
+        def __init__(self, target: float, min_ratio: float):
+            self.target = target
+            self.min_ratio = min_ratio
+            self.ratio = 1.0
+            self._seen = 0
+            self._window_start = time.monotonic()
+            self._lock = threading.Lock()
+
+        def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None):
+            with self._lock:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    rate = self._seen / (now - self._window_start)
+                    self.ratio = 1.0 if rate <= self.target else max(self.min_ratio, self.target / rate)
+                    self._seen = 0
+                    self._window_start = now
+                self._seen += 1
+                ratio = self.ratio
+            decision = Decision.RECORD_AND_SAMPLE if random.random() < ratio else Decision.DROP
+            return SamplingResult(decision, attributes if decision == Decision.RECORD_AND_SAMPLE else None, trace_state)
+
+        def get_description(self) -> str:
+            return f"AdaptiveSampler(target={self.target}/s)"
+
+def setup_tracing(app, service: str):
+    global _tracer
+    if not TRACING_ENDPOINT:
+        return
+    if not OTEL_AVAILABLE:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT задан, но пакеты opentelemetry не установлены")
+        return
+    if _tracer is None:
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": service}),
+            sampler=ParentBased(AdaptiveSampler(TRACES_PER_SECOND, MIN_SAMPLE_RATIO))
+        )
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(provider)
+        HTTPXClientInstrumentor().instrument()
+        PymongoInstrumentor().instrument()
+        RedisInstrumentor().instrument()
+        BotocoreInstrumentor().instrument()
+        _tracer = trace.get_tracer(service)
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics,health")
+
+def shutdown_tracing():
+    if _tracer is not None:
+        trace.get_tracer_provider().shutdown()
+
+@contextmanager
+def span(name: str, attributes: Optional[dict] = None):
+    if _tracer is None:
+        yield None
+        return
+    clean = {key: value for key, value in (attributes or {}).items() if value is not None}
+    with _tracer.start_as_current_span(name, attributes=clean) as current:
+        yield current
+
+def set_attributes(attributes: dict):
+    """Attach attributes to the active span, usually the server span of the request"""
+    if _tracer is None:
+        return
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, value)
+
+def current_trace_id() -> Optional[str]:
+    if _tracer is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    return format(context.trace_id, "032x") if context.is_valid else None
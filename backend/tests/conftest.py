@@ -0,0 +1,4 @@
+import os
+
+# shared.auth_utils refuses to import without a signing key
+os.environ.setdefault("SECRET_KEY", "test-secret-key-0123456789abcdef0123456789")
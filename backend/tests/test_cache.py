@@ -0,0 +1,161 @@
+"""shared.cache: miss coalescing, leader cancellation, tag invalidation, lock wait.
+
+Runs against fakeredis (pip install -e .[test]); two ResponseCache instances
+on one fake server stand in for two service processes.
+"""
+from datetime import datetime
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from shared.cache import ResponseCache, FILES_TAG, encode, decode, COMPRESSED, CACHE_COMPRESS_MIN
+from shared.redis_client import redis_client
+
+def run(scenario):
+    """Run `scenario(cache)` with redis_client.binary on a fresh fake server"""
+    async def main():
+        server = fakeredis.FakeServer()
+        redis_client.binary = fakeredis.FakeAsyncRedis(server=server)
+        try:
+            cache = ResponseCache()
+            cache.enabled = True
+            return await scenario(cache)
+        finally:
+            await redis_client.binary.aclose()
+            redis_client.binary = None
+
+    return asyncio.run(main())
+
+class Loader:
+    """Counts calls and, when given a gate, holds every call until it opens"""
+
+    def __init__(self, value, gate: asyncio.Event = None, delay: float = 0):
+        self.value = value
+        self.gate = gate
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.value
+
+def test_encode_round_trip():
+    value = {"id": ObjectId(), "at": datetime(2024, 5, 1, 12, 30), "files": [{"name": "a.txt", "size": 3}]}
+    assert decode(encode(value)) == value
+    large = {"blob": "x" * CACHE_COMPRESS_MIN}
+    assert encode(large)[:1] == COMPRESSED
+    assert decode(encode(large)) == large
+
+def test_concurrent_misses_load_once():
+    async def scenario(cache):
+        gate = asyncio.Event()
+        loader = Loader({"files": [1, 2, 3]}, gate)
+        callers = [
+            asyncio.create_task(cache.get_or_load("files", ["u1"], [FILES_TAG.format(user_id="u1")], loader))
+            for _ in range(20)
+        ]
+        await asyncio.sleep(0.05)
+        gate.set()
+        results = await asyncio.gather(*callers)
+        assert results == [{"files": [1, 2, 3]}] * 20
+        assert loader.calls == 1
+        assert await cache.get_or_load("files", ["u1"], [FILES_TAG.format(user_id="u1")], loader) == {"files": [1, 2, 3]}
+        assert loader.calls == 1
+        assert cache._inflight == {}
+
+    run(scenario)
+
+def test_cancelled_leader_does_not_fail_followers():
+    async def scenario(cache):
+        gate = asyncio.Event()
+        loader = Loader("value", gate)
+
+        def call():
+            return asyncio.create_task(cache.get_or_load("files", ["u1"], [], loader))
+
+        leader = call()
+        await asyncio.sleep(0.01)
+        followers = [call() for _ in range(5)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        gate.set()
+        assert await asyncio.gather(*followers) == ["value"] * 5
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # the cancelled load and one retry by a follower that took over
+        assert loader.calls == 2
+        assert cache._inflight == {}
+
+    run(scenario)
+
+def test_loader_error_reaches_followers_and_is_not_cached():
+    async def scenario(cache):
+        gate = asyncio.Event()
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await gate.wait()
+            raise RuntimeError("mongo down")
+
+        callers = [asyncio.create_task(cache.get_or_load("files", ["u1"], [], failing)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        gate.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert calls == 1
+        assert await cache.get_or_load("files", ["u1"], [], Loader("ok")) == "ok"
+
+    run(scenario)
+
+def test_invalidation_is_per_user():
+    async def scenario(cache):
+        loads = []
+
+        @cache.cached("list_files", key=["user_id", "page"], tags=[FILES_TAG])
+        async def list_files(user_id: str, page: int = 1):
+            loads.append(user_id)
+            return {"user": user_id, "version": loads.count(user_id)}
+
+        assert await list_files("u1") == {"user": "u1", "version": 1}
+        assert await list_files("u2") == {"user": "u2", "version": 1}
+        assert await list_files("u1") == {"user": "u1", "version": 1}
+
+        await cache.invalidate(FILES_TAG.format(user_id="u1"))
+        assert await list_files("u1") == {"user": "u1", "version": 2}
+        assert await list_files("u2") == {"user": "u2", "version": 1}
+        assert await list_files(user_id="u1", page=1) == {"user": "u1", "version": 2}
+        assert loads == ["u1", "u2", "u1"]
+
+    run(scenario)
+
+def test_other_process_waits_for_lock_holder():
+    async def scenario(cache):
+        other = ResponseCache()
+        other.enabled = True
+        loader = Loader({"total": 42}, delay=0.2)
+        results = await asyncio.gather(
+            cache.get_or_load("stats", ["u1"], [], loader),
+            other.get_or_load("stats", ["u1"], [], loader),
+        )
+        assert results == [{"total": 42}] * 2
+        assert loader.calls == 1
+
+    run(scenario)
+
+def test_without_redis_loader_is_called_directly():
+    cache = ResponseCache()
+    loader = Loader("direct")
+    assert asyncio.run(cache.get_or_load("files", ["u1"], [], loader)) == "direct"
+    assert asyncio.run(cache.get_or_load("files", ["u1"], [], loader)) == "direct"
+    assert loader.calls == 2
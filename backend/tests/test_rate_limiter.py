@@ -0,0 +1,216 @@
+"""shared.rate_limiter: limit parsing, local leases and hit() against a token bucket.
+
+The hit() tests run the real Lua script on fakeredis when it is installed
+(pip install -e .[test]); the rest stub _acquire_from_redis and need nothing.
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from shared.auth_utils import create_access_token
+from shared.rate_limiter import RateLimiter, parse_limit, get_user_or_ip
+from shared.redis_client import redis_client
+
+def make_request(token: str = None, ip: str = "10.0.0.1") -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "client": (ip, 5000)})
+
+@pytest.fixture
+def redis_pool(monkeypatch):
+    """Point redis_client at a placeholder so hit() reaches _acquire_from_redis"""
+    monkeypatch.setattr(redis_client, "pool", object())
+
+class StubBucket:
+    """Stands in for the Redis token bucket: grants what is left, records every call"""
+
+    def __init__(self, tokens: int, retry_after: float = 0.0):
+        self.tokens = tokens
+        self.retry_after = retry_after
+        self.calls = []
+
+    async def __call__(self, key, capacity, rate, requested):
+        self.calls.append((key, capacity, rate, requested))
+        granted = min(requested, self.tokens)
+        self.tokens -= granted
+        return granted, 0.0 if granted else self.retry_after
+
+def stubbed(limiter: RateLimiter, bucket: StubBucket) -> RateLimiter:
+    limiter._acquire_from_redis = bucket
+    return limiter
+
+def hit(limiter: RateLimiter, limit_value: str = "100/minute", request: Request = None, **kwargs):
+    asyncio.run(limiter.hit(request or make_request(), "route", limit_value, **kwargs))
+
+@pytest.mark.parametrize("limit_value, expected", [
+    ("10/second", (10, 1)),
+    ("100/minute", (100, 60)),
+    ("100/minutes", (100, 60)),
+    ("5 / Hour", (5, 3600)),
+    ("1000/day", (1000, 86400)),
+])
+def test_parse_limit(limit_value, expected):
+    assert parse_limit(limit_value) == expected
+
+@pytest.mark.parametrize("limit_value", ["10/week", "10", "many/minute"])
+def test_parse_limit_rejects_garbage(limit_value):
+    with pytest.raises(ValueError):
+        parse_limit(limit_value)
+
+def test_limit_is_validated_at_decoration():
+    with pytest.raises(ValueError):
+        RateLimiter("test").limit("10/fortnight")
+
+def test_resolve_limit_scales_by_plan():
+    limiter = RateLimiter("test")
+    assert limiter._resolve_limit("10/minute", "free", None) == (10, 60)
+    assert limiter._resolve_limit("10/minute", "pro", None) == (50, 60)
+    assert limiter._resolve_limit("10/minute", "enterprise", None) == (200, 60)
+    assert limiter._resolve_limit("10/minute", "unknown", None) == (10, 60)
+
+def test_resolve_limit_prefers_explicit_plan_limit():
+    limiter = RateLimiter("test")
+    plans = {"pro": "30/second"}
+    assert limiter._resolve_limit("10/minute", "pro", plans) == (30, 1)
+    assert limiter._resolve_limit("10/minute", "enterprise", plans) == (200, 60)
+
+def test_key_func_uses_token_subject_and_plan():
+    token = create_access_token({"sub": "alice", "plan": "pro"})
+    assert get_user_or_ip(make_request(token)) == ("user:alice", "pro")
+    assert get_user_or_ip(make_request("not-a-jwt", ip="10.1.2.3")) == ("ip:10.1.2.3", "free")
+
+def test_lease_is_spent_then_empty():
+    limiter = RateLimiter("test", lease_ttl=1.0)
+    limiter._store_lease("k", 2, now=100.0)
+    assert limiter._take_local("k", 100.1)
+    assert limiter._take_local("k", 100.2)
+    assert not limiter._take_local("k", 100.3)
+    assert not limiter._take_local("other", 100.3)
+
+def test_lease_expires():
+    limiter = RateLimiter("test", lease_ttl=1.0)
+    limiter._store_lease("k", 5, now=100.0)
+    assert limiter._take_local("k", 100.5)
+    assert not limiter._take_local("k", 101.0)
+
+def test_empty_grant_drops_lease():
+    limiter = RateLimiter("test")
+    limiter._store_lease("k", 3, now=100.0)
+    limiter._store_lease("k", 0, now=100.1)
+    assert "k" not in limiter._leases
+
+def test_full_lease_table_evicts_expired_and_spent():
+    limiter = RateLimiter("test", lease_ttl=1.0, max_leases=3)
+    limiter._store_lease("expired", 5, now=100.0)
+    limiter._store_lease("spent", 1, now=100.5)
+    limiter._store_lease("live", 5, now=100.5)
+    assert limiter._take_local("spent", 100.6)
+    limiter._store_lease("new", 5, now=101.2)
+    assert set(limiter._leases) == {"live", "new"}
+
+@pytest.mark.parametrize("capacity, lease_size, requested", [
+    (1000, 10, 10),   # lease_size caps the batch
+    (50, 10, 5),      # a tenth of the capacity
+    (5, 10, 1),       # at least one token
+    (1, 10, 1),
+])
+def test_lease_sizing(redis_pool, capacity, lease_size, requested):
+    bucket = StubBucket(tokens=capacity)
+    hit(stubbed(RateLimiter("test", lease_size=lease_size), bucket), f"{capacity}/minute")
+    [(key, called_capacity, rate, called_requested)] = bucket.calls
+    assert key == "ratelimit:test:route:ip:10.0.0.1"
+    assert (called_capacity, called_requested) == (capacity, requested)
+    assert rate == pytest.approx(capacity / 60)
+
+def test_lease_serves_requests_locally(redis_pool):
+    bucket = StubBucket(tokens=1000)
+    limiter = stubbed(RateLimiter("test", lease_size=10, lease_ttl=60), bucket)
+    for _ in range(10):
+        hit(limiter, "1000/minute")
+    assert len(bucket.calls) == 1
+    hit(limiter, "1000/minute")
+    assert len(bucket.calls) == 2
+
+def test_partial_grant_leases_only_what_was_granted(redis_pool):
+    bucket = StubBucket(tokens=3)
+    limiter = stubbed(RateLimiter("test", lease_size=10, lease_ttl=60), bucket)
+    hit(limiter, "1000/minute")
+    assert limiter._leases["ratelimit:test:route:ip:10.0.0.1"].tokens == 2
+    hit(limiter, "1000/minute")
+    hit(limiter, "1000/minute")
+    assert len(bucket.calls) == 1
+    with pytest.raises(HTTPException):
+        hit(limiter, "1000/minute")
+    assert len(bucket.calls) == 2
+
+def test_exhausted_bucket_raises_429_with_retry_after(redis_pool):
+    bucket = StubBucket(tokens=0, retry_after=2.3)
+    limiter = stubbed(RateLimiter("test"), bucket)
+    with pytest.raises(HTTPException) as error:
+        hit(limiter, "10/minute")
+    assert error.value.status_code == 429
+    assert error.value.headers == {"Retry-After": "3"}
+
+def test_retry_after_is_at_least_one_second(redis_pool):
+    limiter = stubbed(RateLimiter("test"), StubBucket(tokens=0, retry_after=0.01))
+    with pytest.raises(HTTPException) as error:
+        hit(limiter, "10/second")
+    assert error.value.headers == {"Retry-After": "1"}
+
+def test_without_redis_requests_pass(monkeypatch):
+    monkeypatch.setattr(redis_client, "pool", None)
+    bucket = StubBucket(tokens=0)
+    hit(stubbed(RateLimiter("test"), bucket))
+    assert bucket.calls == []
+
+def test_disabled_limiter_skips_everything(redis_pool):
+    bucket = StubBucket(tokens=0)
+    limiter = stubbed(RateLimiter("test"), bucket)
+    limiter.enabled = False
+    hit(limiter)
+    assert bucket.calls == []
+
+def test_plan_multiplier_applies_to_bucket(redis_pool):
+    token = create_access_token({"sub": "bob", "plan": "pro"})
+    bucket = StubBucket(tokens=1000)
+    hit(stubbed(RateLimiter("test"), bucket), "10/minute", request=make_request(token))
+    [(key, capacity, _, requested)] = bucket.calls
+    assert key == "ratelimit:test:route:user:bob"
+    assert (capacity, requested) == (50, 5)
+
+def test_token_bucket_script():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+
+    async def scenario():
+        redis_client.pool = fakeredis.FakeAsyncRedis(decode_responses=True)
+        try:
+            limiter = RateLimiter("test", lease_size=4, lease_ttl=60)
+            # 12/hour: a tenth of the capacity is one token, every request goes to Redis
+            for _ in range(12):
+                await limiter.hit(make_request(), "script", "12/hour")
+            with pytest.raises(HTTPException) as error:
+                await limiter.hit(make_request(), "script", "12/hour")
+            assert error.value.headers["Retry-After"] == "300"
+            # another caller has a bucket of their own
+            await limiter.hit(make_request(ip="10.0.0.2"), "script", "12/hour")
+
+            # partial grant: 6 tokens left, a lease of 4 then a lease of 2
+            bucket = "ratelimit:test:partial:ip:10.0.0.1"
+            limiter = RateLimiter("test", lease_size=4, lease_ttl=60)
+            granted, _ = await limiter._acquire_from_redis(bucket, 100, 100 / 3600, 94)
+            assert granted == 94
+            await limiter.hit(make_request(), "partial", "100/hour")
+            assert limiter._leases[bucket].tokens == 3
+            limiter._leases.clear()
+            await limiter.hit(make_request(), "partial", "100/hour")
+            assert limiter._leases[bucket].tokens == 1
+            limiter._leases.clear()
+            with pytest.raises(HTTPException):
+                await limiter.hit(make_request(), "partial", "100/hour")
+        finally:
+            await redis_client.pool.aclose()
+            redis_client.pool = None
+
+    asyncio.run(scenario())
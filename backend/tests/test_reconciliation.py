@@ -0,0 +1,123 @@
+"""backup_service.reconciliation against LocalProvider and a seeded in-memory catalog.
+
+The catalog is mongomock-motor (pip install -e .[test]).
+"""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from backup_service.cloud_providers import LocalProvider
+from backup_service.reconciliation import reconcile, backfill_storage_provider
+
+USER = "u1"
+
+@pytest.fixture
+def provider(tmp_path):
+    provider = LocalProvider({"local_path": str(tmp_path / "storage")})
+    for name, content in {"a.txt": b"a", "b.txt": b"bb", "d.txt": b"dddd", "e.txt": b"eeeee"}.items():
+        (provider.root / name).write_bytes(content)
+    # a partial upload, never reported as an orphan
+    (provider.root / ".e.txt.tmp").write_bytes(b"e")
+    return provider
+
+def entry(filename: str, user_id: str = USER, storage_provider: str = "local", **extra) -> dict:
+    return {
+        "filename": filename,
+        "user_id": user_id,
+        "provider": storage_provider,
+        "storage_provider": storage_provider,
+        "size": 1,
+        "uploaded_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        **extra
+    }
+
+def seed(files):
+    return files.insert_many([
+        entry("a.txt"),
+        entry("b.txt"),
+        entry("b.txt"),
+        entry("c.txt"),
+        entry("e.txt"),
+        entry("x.txt"),
+        # other users and other providers are not part of the listing
+        entry("d.txt", user_id="u2"),
+        entry("d.txt", storage_provider="s3"),
+        # tiered to s3 from local: catalogued under its current location only
+        entry("e.txt", provider="local", storage_provider="s3"),
+    ])
+
+def run(scenario):
+    async def main():
+        db = SimpleNamespace(backup_db=mongomock_motor.AsyncMongoMockClient()["backup_test_reconcile"])
+        await seed(db.backup_db.files)
+        return await scenario(db)
+
+    return asyncio.run(main())
+
+def test_report(provider):
+    async def scenario(db):
+        report = await reconcile(db, USER, "local", provider)
+        assert report["missing"] == 2
+        assert report["orphans"] == 1
+        assert report["duplicates"] == 1
+        assert report["repaired"] == 0
+        assert report["checked"] == 7
+        assert report["samples"] == {"orphans": ["d.txt"], "missing": ["c.txt", "x.txt"], "duplicates": ["b.txt"]}
+        assert await db.backup_db.files.count_documents({}) == 9
+
+    run(scenario)
+
+def test_sample_limit(provider):
+    async def scenario(db):
+        report = await reconcile(db, USER, "local", provider, sample_limit=1)
+        assert report["missing"] == 2
+        assert report["samples"]["missing"] == ["c.txt"]
+
+    run(scenario)
+
+def test_repair(provider):
+    async def scenario(db):
+        files = db.backup_db.files
+        report = await reconcile(db, USER, "local", provider, repair=True)
+        assert report["repaired"] == 4
+
+        catalog = [doc async for doc in files.find({"user_id": USER, "storage_provider": "local"}).sort("filename", 1)]
+        assert [doc["filename"] for doc in catalog] == ["a.txt", "b.txt", "d.txt", "e.txt"]
+        orphan = catalog[2]
+        assert orphan["reconciled"] is True
+        assert orphan["size"] == 4
+        assert orphan["provider"] == "local"
+        assert orphan["storage_path"] == provider.storage_path("d.txt")
+        # entries outside the listing are untouched
+        assert await files.count_documents({"user_id": "u2"}) == 1
+        assert await files.count_documents({"storage_provider": "s3"}) == 2
+
+        again = await reconcile(db, USER, "local", provider)
+        assert (again["missing"], again["orphans"], again["duplicates"]) == (0, 0, 0)
+        assert again["checked"] == 4
+
+    run(scenario)
+
+def test_empty_storage_reports_everything_missing(tmp_path):
+    async def scenario(db):
+        report = await reconcile(db, USER, "local", LocalProvider({"local_path": str(tmp_path / "empty")}))
+        # a repeated entry only counts as a duplicate of an object that exists
+        assert report["missing"] == 6
+        assert report["duplicates"] == 0
+        assert report["orphans"] == 0
+
+    run(scenario)
+
+def test_backfill_storage_provider(provider):
+    async def scenario(db):
+        files = db.backup_db.files
+        await files.insert_one({"filename": "legacy.txt", "user_id": USER, "provider": "local"})
+        assert await backfill_storage_provider(db) == 1
+        assert (await files.find_one({"filename": "legacy.txt"}))["storage_provider"] == "local"
+        assert await backfill_storage_provider(db) == 0
+
+    run(scenario)
@@ -0,0 +1,53 @@
+"""monitor_service.rollups: storage counters follow where the bytes live."""
+from collections import Counter
+
+from shared.event_bus import Event, FILE_UPLOADED, FILE_DELETED, FILE_TIERED, FILE_DOWNLOADED
+from monitor_service.rollups import event_increments, split_totals
+
+def apply(*events) -> dict:
+    totals = Counter()
+    for index, (event_type, payload) in enumerate(events):
+        totals.update(event_increments(Event(f"{index}-0", event_type, payload, "")))
+    return split_totals(totals)
+
+def test_upload_tier_and_delete():
+    totals = apply(
+        (FILE_UPLOADED, {"provider": "local", "storage_provider": "local", "size": 100}),
+        (FILE_TIERED, {"provider": "local", "storage_provider": "s3", "previous_storage_provider": "local", "size": 100}),
+        (FILE_DOWNLOADED, {"provider": "local", "size": 100}),
+        (FILE_DELETED, {"provider": "local", "storage_provider": "s3", "size": 100}),
+    )
+    assert totals["storage_usage"] == {"local": 0, "s3": 0}
+    assert (totals["uploads"], totals["downloads"], totals["deletions"]) == (1, 1, 1)
+    # tiering is not a user operation
+    assert totals["operations"] == 3
+
+def test_reupload_replaces_tiered_copy():
+    totals = apply(
+        (FILE_UPLOADED, {"provider": "local", "storage_provider": "local", "size": 100}),
+        (FILE_TIERED, {"provider": "local", "storage_provider": "s3", "previous_storage_provider": "local", "size": 100}),
+        (FILE_UPLOADED, {
+            "provider": "local", "storage_provider": "local", "size": 30,
+            "previous_size": 100, "previous_storage_provider": "s3"
+        }),
+    )
+    assert totals["storage_usage"] == {"local": 30, "s3": 0}
+    assert totals["bytes_uploaded"] == 130
+
+def test_overwrite_in_place():
+    totals = apply(
+        (FILE_UPLOADED, {"provider": "s3", "storage_provider": "s3", "size": 100}),
+        (FILE_UPLOADED, {
+            "provider": "s3", "storage_provider": "s3", "size": 40,
+            "previous_size": 100, "previous_storage_provider": "s3"
+        }),
+    )
+    assert totals["storage_usage"] == {"s3": 40}
+
+def test_events_without_storage_provider_use_provider():
+    totals = apply(
+        (FILE_UPLOADED, {"provider": "azure", "size": 10, "previous_size": 0}),
+        (FILE_UPLOADED, {"provider": "azure", "size": 15, "previous_size": 10}),
+        (FILE_DELETED, {"provider": "gcs", "size": 5}),
+    )
+    assert totals["storage_usage"] == {"azure": 15, "gcs": -5}
@@ -0,0 +1,44 @@
+"""Cold start of backup_service: no cloud SDK is imported until a provider is used.
+
+Each check runs in a fresh interpreter so modules imported by other tests do
+not leak in. STARTUP_IMPORT_BUDGET (seconds) bounds the import of
+backup_service.main; benchmarks/bench_startup.py gives the full breakdown.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+SDKS = ("boto3", "azure.storage.blob", "google.cloud.storage")
+IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", "2.0"))
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import backup_service.main
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "sdks": [name for name in json.loads(sys.argv[1]) if name in sys.modules]
+}))
+"""
+
+def import_backup_service() -> dict:
+    env = {key: value for key, value in os.environ.items() if not key.startswith("OTEL_")}
+    env.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    env.setdefault("SECRET_KEY", "test-startup-secret-key-0123456789abcdef")
+    child = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps(SDKS)],
+        cwd=BACKEND, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert child.returncode == 0, child.stderr
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+def test_import_does_not_load_cloud_sdks():
+    assert import_backup_service()["sdks"] == []
+
+def test_import_within_budget():
+    # best of three, the first run also pays for a cold filesystem cache
+    seconds = min(import_backup_service()["seconds"] for _ in range(3))
+    assert seconds <= IMPORT_BUDGET, f"{seconds:.3f} s > {IMPORT_BUDGET} s"
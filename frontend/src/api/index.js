@@ -1,12 +1,13 @@
 import axios from 'axios';
 
-const API_BASE_URL = 'http://localhost';
-
-const AUTH_SERVICE = `${API_BASE_URL}:8001`;
-const BACKUP_SERVICE = `${API_BASE_URL}:8002`;
-const CONFIG_SERVICE = `${API_BASE_URL}:8003`;
-const ALERT_SERVICE = `${API_BASE_URL}:8004`;
-const MONITOR_SERVICE = `${API_BASE_URL}:8005`;
+// All services are reached through gateway_service, routed by path prefix
+const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
+
+const AUTH_SERVICE = `${API_BASE_URL}/auth`;
+const BACKUP_SERVICE = `${API_BASE_URL}/backup`;
+const CONFIG_SERVICE = `${API_BASE_URL}/config`;
+const ALERT_SERVICE = `${API_BASE_URL}/alert`;
+const MONITOR_SERVICE = `${API_BASE_URL}/monitor`;
 
 const getToken = () => localStorage.getItem('token');
 